@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class SetGameConfig(AppConfig):
     default_auto_field: str = "django.db.models.BigAutoField"
     name: str = "set_game"
+
+    def ready(self) -> None:
+        from .db import configure_sqlite_connection, install_query_recorder
+
+        connection_created.connect(
+            configure_sqlite_connection, dispatch_uid="set_game_sqlite_pragmas"
+        )
+        connection_created.connect(
+            install_query_recorder, dispatch_uid="set_game_query_recorder"
+        )
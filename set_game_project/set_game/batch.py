@@ -0,0 +1,138 @@
+"""Vectorised set evaluation over many boards at once.
+
+Boards are held as one ``(boards, board_size)`` uint8 array of card codes (see
+``catalog.encode_card``) and every triple of every board is checked in a single
+NumPy pass. This is meant for offline analysis such as deal simulation and
+balancing; live games use ``set_engine``.
+
+NumPy is an optional dependency, the ``batch`` extra, and is only needed by
+this module.
+"""
+
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional, Sequence, Tuple
+from itertools import combinations
+from .catalog import NO_CARD_CODES, CardCatalog, get_card_catalog
+from .set_engine import THIRD_CARD
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None  # type: ignore[assignment]
+
+# Code used to pad short boards; it never completes a set.
+PAD_CODE = NO_CARD_CODES
+# Boards are evaluated in chunks of about CHUNK_MEMORY bytes of temporaries,
+# which take roughly BYTES_PER_TRIPLE bytes per triple of each board: 19k
+# boards of 12 cards, but only 49 of 81.
+CHUNK_MEMORY = 32 * 1024 * 1024
+BYTES_PER_TRIPLE = 8
+
+
+class BatchResult(NamedTuple):
+    counts: Any  # (boards,) number of sets on each board
+    board_index: Any  # (sets,) board each set was found on
+    triples: Any  # (sets, 3) board positions of the cards in each set
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("numpy is required for batch set evaluation")
+
+
+@lru_cache(maxsize=None)
+def _third_card_table() -> Any:
+    """Flattened (82 x 82) THIRD_CARD table; any pair with padding maps to 255."""
+    size = NO_CARD_CODES + 1
+    table = np.full((size, size), 255, dtype=np.uint8)
+    table[:NO_CARD_CODES, :NO_CARD_CODES] = np.array(THIRD_CARD, dtype=np.uint8)
+    return table.ravel()
+
+
+@lru_cache(maxsize=None)
+def _triple_positions(board_size: int) -> Tuple[Any, Any, Any]:
+    positions = np.array(
+        list(combinations(range(board_size), 3)), dtype=np.intp
+    ).reshape(-1, 3)
+    return positions[:, 0], positions[:, 1], positions[:, 2]
+
+
+def chunk_size_for(board_size: int) -> int:
+    """Boards per chunk that keeps one chunk's temporaries near CHUNK_MEMORY."""
+    triples = len(_triple_positions(board_size)[0])
+    return max(1, CHUNK_MEMORY // (BYTES_PER_TRIPLE * max(triples, 1)))
+
+
+def _set_mask(codes: Any) -> Any:
+    """Boolean (boards, triples) mask of which triples are sets."""
+    first, second, third = _triple_positions(codes.shape[1])
+    pair_index = codes[:, first].astype(np.uint16) * (NO_CARD_CODES + 1)
+    pair_index += codes[:, second]
+    return _third_card_table()[pair_index] == codes[:, third]
+
+
+def encode_boards(
+    boards: Sequence[Sequence[Any]], catalog: Optional[CardCatalog] = None
+) -> Any:
+    """Convert boards of card ids into a padded array of card codes."""
+    _require_numpy()
+    catalog = catalog or get_card_catalog()
+    width = max((len(board) for board in boards), default=0)
+    codes = np.full((len(boards), width), PAD_CODE, dtype=np.uint8)
+    for row, board in enumerate(boards):
+        for column, card_id in enumerate(board):
+            code = catalog.code(card_id)
+            if code is not None:
+                codes[row, column] = code
+    return codes
+
+
+def deal_boards(num_boards: int, board_size: int, seed: Optional[int] = None) -> Any:
+    """Deal ``num_boards`` random boards from independently shuffled decks."""
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    # The board_size smallest of 81 uniform keys pick a uniform random board.
+    keys = rng.random((num_boards, NO_CARD_CODES), dtype=np.float32)
+    return np.argpartition(keys, board_size - 1, axis=1)[:, :board_size].astype(
+        np.uint8
+    )
+
+
+def count_sets_batch(codes: Any, chunk_size: Optional[int] = None) -> Any:
+    """Return the number of sets on each board of a code array."""
+    _require_numpy()
+    codes = np.asarray(codes, dtype=np.uint8)
+    counts = np.zeros(len(codes), dtype=np.int32)
+    if codes.ndim != 2 or codes.shape[1] < 3:
+        return counts
+    chunk_size = chunk_size or chunk_size_for(codes.shape[1])
+    for start in range(0, len(codes), chunk_size):
+        chunk = codes[start : start + chunk_size]
+        counts[start : start + len(chunk)] = _set_mask(chunk).sum(axis=1)
+    return counts
+
+
+def find_sets_batch(codes: Any, chunk_size: Optional[int] = None) -> BatchResult:
+    """Return per-board set counts plus the position triple of every set."""
+    _require_numpy()
+    codes = np.asarray(codes, dtype=np.uint8)
+    counts = np.zeros(len(codes), dtype=np.int32)
+    empty = BatchResult(
+        counts, np.zeros(0, dtype=np.intp), np.zeros((0, 3), dtype=np.intp)
+    )
+    if codes.ndim != 2 or codes.shape[1] < 3:
+        return empty
+    positions = np.stack(_triple_positions(codes.shape[1]), axis=1)
+    chunk_size = chunk_size or chunk_size_for(codes.shape[1])
+    board_indexes = []
+    triples = []
+    for start in range(0, len(codes), chunk_size):
+        chunk = codes[start : start + chunk_size]
+        mask = _set_mask(chunk)
+        counts[start : start + len(chunk)] = mask.sum(axis=1)
+        boards, triple_ids = np.nonzero(mask)
+        board_indexes.append(boards + start)
+        triples.append(positions[triple_ids])
+    if not board_indexes:
+        return empty
+    return BatchResult(counts, np.concatenate(board_indexes), np.concatenate(triples))
@@ -0,0 +1,168 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from threading import Lock
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+CARD_ATTRIBUTES: Tuple[str, ...] = ("number", "symbol", "shading", "color")
+CARD_VALUES: Dict[str, Tuple[Any, ...]] = {
+    "number": (1, 2, 3),
+    "symbol": ("diamond", "squiggle", "oval"),
+    "shading": ("solid", "striped", "open"),
+    "color": ("red", "green", "purple"),
+}
+NO_CARD_CODES = 3 ** len(CARD_ATTRIBUTES)
+
+
+def encode_card(card: Any) -> Optional[int]:
+    """Pack a card's attributes into a base-3 code in range(81).
+
+    Each attribute contributes one trit (number is the most significant).
+    Returns None for cards whose attributes are not part of the standard deck.
+    """
+    code = 0
+    for attribute in CARD_ATTRIBUTES:
+        try:
+            trit = CARD_VALUES[attribute].index(getattr(card, attribute))
+        except ValueError:
+            return None
+        code = code * 3 + trit
+    return code
+
+
+@dataclass(frozen=True)
+class CatalogCard:
+    """Immutable snapshot of a Card row."""
+
+    id: int
+    number: int
+    symbol: str
+    shading: str
+    color: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "number": self.number,
+            "symbol": self.symbol,
+            "shading": self.shading,
+            "color": self.color,
+        }
+
+
+class CardCatalog:
+    """Read-only, process-wide view of every card, keyed by card id."""
+
+    def __init__(self, cards: Iterable[CatalogCard]) -> None:
+        self._cards: Mapping[int, CatalogCard] = MappingProxyType(
+            {card.id: card for card in cards}
+        )
+        codes = {}
+        for card in self._cards.values():
+            code = encode_card(card)
+            if code is not None:
+                codes[card.id] = code
+        self._codes: Mapping[int, int] = MappingProxyType(codes)
+        # Plain dict behind code_map(): its __getitem__ is quicker to map().
+        self._code_dict = codes
+        ids_by_code: List[Optional[int]] = [None] * NO_CARD_CODES
+        for card_id, code in codes.items():
+            ids_by_code[code] = card_id
+        # Card id for each code, or None where the catalog lacks that card.
+        self.ids_by_code: Tuple[Optional[int], ...] = tuple(ids_by_code)
+        self.version = hashlib.sha256(
+            json.dumps(self.manifest(), sort_keys=True).encode()
+        ).hexdigest()[:12]
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def __contains__(self, card_id: object) -> bool:
+        try:
+            return int(card_id) in self._cards  # type: ignore[call-overload]
+        except (TypeError, ValueError):
+            return False
+
+    def get(self, card_id: Any) -> Optional[CatalogCard]:
+        """Return the card for an int or numeric string id, or None."""
+        try:
+            return self._cards.get(int(card_id))
+        except (TypeError, ValueError):
+            return None
+
+    def code(self, card_id: Any) -> Optional[int]:
+        """Return the base-3 code for a card id, or None if unknown."""
+        try:
+            return self._codes.get(int(card_id))
+        except (TypeError, ValueError):
+            return None
+
+    def code_map(self) -> Mapping[int, int]:
+        """Read-only map of int card id to code, for bulk conversions."""
+        return self._code_dict
+
+    def lookup(self, card_ids: Iterable[Any]) -> Optional[List[CatalogCard]]:
+        """Return the cards for the given ids, or None if any id is unknown."""
+        cards = []
+        for card_id in card_ids:
+            card = self.get(card_id)
+            if card is None:
+                return None
+            cards.append(card)
+        return cards
+
+    def all(self) -> List[CatalogCard]:
+        """Return every card in Card.Meta.ordering order."""
+        return list(self._cards.values())
+
+    def manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Attributes of every card, keyed by card id, for the static manifest."""
+        return self.serialize(self._cards)
+
+    def serialize(self, card_ids: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """Map each known card id to its attributes, as sent to clients."""
+        serialized = {}
+        for card_id in card_ids:
+            card = self.get(card_id)
+            if card is not None:
+                serialized[str(card.id)] = card.to_dict()
+        return serialized
+
+
+_catalog: Optional[CardCatalog] = None
+_catalog_lock = Lock()
+
+
+def load_card_catalog() -> CardCatalog:
+    """Build a fresh catalog from the Card table."""
+    Card = apps.get_model("set_game", "Card")
+    rows = Card.objects.values_list("id", *CARD_ATTRIBUTES)
+    return CardCatalog(CatalogCard(*row) for row in rows)
+
+
+def get_card_catalog() -> CardCatalog:
+    """Return the cached catalog, loading it from the database on first use."""
+    global _catalog
+    catalog = _catalog
+    if catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = load_card_catalog()
+            catalog = _catalog
+    return catalog
+
+
+def invalidate_card_catalog() -> None:
+    """Drop the cached catalog so the next access reloads it."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+
+
+@receiver(post_save, sender="set_game.Card")
+@receiver(post_delete, sender="set_game.Card")
+def _invalidate_on_card_change(**kwargs: Any) -> None:
+    invalidate_card_catalog()
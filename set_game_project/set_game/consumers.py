@@ -1,31 +1,216 @@
+import hashlib
 import json
-from typing import Dict, Any, List
+import logging
+from collections import Counter
+from functools import partial
+from typing import Counter as CounterType, Dict, Any, List, Optional
 from channels.generic.websocket import AsyncWebsocketConsumer  # type: ignore
-from asgiref.sync import sync_to_async
-from .models import GameSession, Card, Lobby, User
+from channels.layers import get_channel_layer  # type: ignore
+from asgiref.sync import async_to_sync, sync_to_async
+from . import metrics
+from .models import GameSession, Lobby, LobbyPlayer, User
+from .executor import ExecutorSaturated, game_executor, game_key, lobby_key
+from .game_actor import GameActor, game_actors
+from .move_log import move_log
+from .query_budget import query_budget
+from django.conf import settings
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import (
+    Count,
+    Max,
+    Prefetch,
+    Q,
+    QuerySet,
+    prefetch_related_objects,
+)
+
+logger = logging.getLogger(__name__)
+
+# Sockets in each game group on this worker, one entry per game being played.
+game_group_sockets: CounterType[str] = Counter()
+
+metrics.Gauge(
+    "set_game_active_games",
+    "Games with at least one socket connected to this worker",
+    function=lambda: len(game_group_sockets),
+)
+
+
+def game_group_name(session_id: Any) -> str:
+    """Channel layer group shared by every socket playing one GameSession."""
+    return f"game_{session_id}"
+
+
+def lobby_group_name(lobby_id: Any) -> str:
+    """Channel layer group shared by every socket waiting in one Lobby."""
+    return f"lobby_{lobby_id}"
+
+
+def lobby_status_queryset() -> QuerySet[Lobby]:
+    """Lobbies with everything their status needs but the player list.
+
+    One query: the game state is joined and the player and ready counts are
+    annotated, along with the latest player activity used by lobby_etag().
+    """
+    return Lobby.objects.select_related("game_state").annotate(
+        player_count=Count("lobbyplayer"),
+        ready_count=Count("lobbyplayer", filter=Q(lobbyplayer__ready=True)),
+        players_last_activity=Max("lobbyplayer__last_activity"),
+    )
+
+
+def lobby_etag(lobby: Lobby) -> str:
+    """ETag for a lobby from lobby_status_queryset().
+
+    It changes whenever a player joins or gets ready, or the game starts.
+    """
+    game_state = getattr(lobby, "game_state", None)
+    parts = [
+        lobby.id,
+        lobby.last_activity.isoformat(),
+        getattr(lobby, "players_last_activity", None),
+        getattr(lobby, "player_count", None),
+        getattr(lobby, "ready_count", None),
+        game_state.id if game_state else None,
+    ]
+    return hashlib.sha256(":".join(map(str, parts)).encode()).hexdigest()[:16]
+
+
+def serialize_lobby(lobby: Lobby) -> Dict[str, Any]:
+    """Lobby status as sent to its players, over HTTP or the lobby socket.
+
+    Expects a lobby from lobby_status_queryset(); the players are fetched
+    with one more query.
+    """
+    prefetch_related_objects(
+        [lobby],
+        Prefetch(
+            "lobbyplayer_set",
+            queryset=LobbyPlayer.objects.select_related("player").order_by("id"),
+        ),
+    )
+    players = [
+        {"username": lp.player.username, "ready": lp.ready}
+        for lp in lobby.lobbyplayer_set.all()
+    ]
+    game_state = getattr(lobby, "game_state", None)
+    return {
+        "players": players,
+        "is_full": lobby.is_full(),
+        "all_ready": lobby.all_ready(),
+        "game_state_id": game_state.id if game_state else None,
+        "lobby_id": lobby.id,
+    }
+
+
+def broadcast_lobby_status(lobby: Lobby, event: str) -> Dict[str, Any]:
+    """Push a lobby's current status to its sockets after a join/ready/start.
+
+    Returns the status that was sent. Failures to send are logged rather
+    than raised; clients fall back to polling.
+    """
+    status = serialize_lobby(lobby_status_queryset().get(pk=lobby.pk))
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return status
+    try:
+        with metrics.group_send_seconds.time(type="lobby_status"):
+            async_to_sync(channel_layer.group_send)(
+                lobby_group_name(lobby.id),
+                {"type": "lobby_status", "event": event, "status": status},
+            )
+    except Exception:
+        logger.exception("Failed to broadcast %s for lobby %s", event, lobby.id)
+    return status
 
 
 class GameConsumer(AsyncWebsocketConsumer):
+    # Client message types and the methods handling them. Other types are
+    # ignored, and are counted in the message metrics as "other".
+    message_handlers = {
+        "start_game": "start_game",
+        "make_move": "make_move",
+        "request_rematch": "request_rematch",
+        "resync": "resync_game",
+        "request_hint": "request_hint",
+    }
+
+    @query_budget(0)
     async def connect(self) -> None:
-        self.room_group_name = "game_room"
-        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        self.room_group_name: Optional[str] = None
+        self.game_actor: Optional[GameActor] = None
         await self.accept()
+        metrics.websocket_connections.inc(consumer="game")
 
+    # Writing back the game's in-memory state when its last socket leaves.
+    @query_budget(1)
     async def disconnect(self, close_code: int) -> None:
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        metrics.websocket_connections.dec(consumer="game")
+        await self.leave_game_group()
+
+    async def join_game_group(
+        self, session_id: Any, game_session: Optional[GameSession] = None
+    ) -> None:
+        """Subscribe this socket to one game's broadcasts, leaving any other.
+
+        With GAME_ACTORS_ENABLED this also attaches the socket to the game's
+        in-memory actor, raising GameSession.DoesNotExist for unknown games.
+        """
+        group_name = game_group_name(session_id)
+        if group_name == self.room_group_name:
+            return
+        await self.leave_game_group()
+        if settings.GAME_ACTORS_ENABLED:
+            self.game_actor = await game_actors.acquire(session_id, game_session)
+        await self.channel_layer.group_add(group_name, self.channel_name)
+        self.room_group_name = group_name
+        game_group_sockets[group_name] += 1
+
+    async def leave_game_group(self) -> None:
+        if self.room_group_name is not None:
+            await self.channel_layer.group_discard(
+                self.room_group_name, self.channel_name
+            )
+            game_group_sockets[self.room_group_name] -= 1
+            if game_group_sockets[self.room_group_name] <= 0:
+                del game_group_sockets[self.room_group_name]
+            self.room_group_name = None
+        if self.game_actor is not None:
+            actor, self.game_actor = self.game_actor, None
+            await game_actors.release(actor)
 
     async def receive(self, text_data: str) -> None:
         data = json.loads(text_data)
-        if data["type"] == "start_game":
-            await self.start_game(data)
-        elif data["type"] == "make_move":
-            await self.make_move(data)
-        elif data["type"] == "request_rematch":
-            await self.request_rematch(data)
-
+        if not metrics.enabled():
+            return await self.dispatch_message(data)
+        # The type comes from the client, so only known ones become labels.
+        message_type = data.get("type")
+        if (
+            not isinstance(message_type, str)
+            or message_type not in self.message_handlers
+        ):
+            message_type = "other"
+        with metrics.measure_message(message_type):
+            await self.dispatch_message(data)
+
+    async def dispatch_message(self, data: Dict[str, Any]) -> None:
+        """Hand a client message to the handler for its type."""
+        try:
+            await self.handle_message(data)
+        except ExecutorSaturated as e:
+            await self.send_error(str(e))
+
+    async def handle_message(self, data: Dict[str, Any]) -> None:
+        message_type = data["type"]
+        if isinstance(message_type, str) and message_type in self.message_handlers:
+            await getattr(self, self.message_handlers[message_type])(data)
+
+    # The lobby, its session (looked up again before creating it when the
+    # first lookup used the async ORM), the four queries creating it, and the
+    # players' usernames and ids.
+    @query_budget(9)
     async def start_game(self, data: Dict[str, Any]) -> None:
         """Handle game initialization."""
         lobby_id = data.get("lobby_id")
@@ -33,85 +218,138 @@ class GameConsumer(AsyncWebsocketConsumer):
             return await self.send_error("Lobby ID is required")
 
         try:
-            lobby = await sync_to_async(Lobby.objects.get)(id=lobby_id)
+            if settings.GAME_ASYNC_ORM_READS:
+                lobby = await Lobby.objects.aget(id=lobby_id)
+            else:
+                lobby = await game_executor.run(
+                    partial(Lobby.objects.get, id=lobby_id), key=lobby_key(lobby_id)
+                )
         except Lobby.DoesNotExist:
             return await self.send_error("Lobby not found")
 
         game_session = await self.get_or_create_game_session(lobby)
-        player_ids = await sync_to_async(
-            lambda: list(game_session.players.values_list("id", flat=True))
-        )()
+        await self.join_game_group(game_session.id, game_session)
+        if self.game_actor is not None:
+            game_session = self.game_actor.session
+        player_ids_query = game_session.players.values_list("id", flat=True)
+        if settings.GAME_ASYNC_ORM_READS:
+            player_ids = [player_id async for player_id in player_ids_query]
+        else:
+            player_ids = await game_executor.run(
+                lambda: list(player_ids_query), key=game_key(game_session.id)
+            )
 
         await self.send_game_started(game_session.id, player_ids, game_session)
         # await self.broadcast_game_state(game_session)
 
     async def get_or_create_game_session(self, lobby: Lobby) -> GameSession:
-        """Get or create a GameSession for the given lobby."""
-        game_session = await sync_to_async(
-            GameSession.objects.filter(players__in=lobby.players.all()).first
-        )()
-        return game_session or await sync_to_async(self.create_game_session)(lobby)
+        """Get or create a GameSession for the given lobby.
+
+        The lookup and the create run as one call keyed by the lobby, so
+        sockets starting the same lobby at once get the same session. With
+        GAME_ASYNC_ORM_READS the async ORM looks first, and the executor is
+        only used when there is no session yet.
+        """
+        if settings.GAME_ASYNC_ORM_READS:
+            game_session = await self.lobby_game_sessions(lobby).afirst()
+            if game_session is not None:
+                return game_session
+        return await game_executor.run(
+            self.get_or_create_game_session_sync, lobby, key=lobby_key(lobby.id)
+        )
+
+    def lobby_game_sessions(self, lobby: Lobby) -> QuerySet[GameSession]:
+        return GameSession.objects.filter(players__in=lobby.players.all())
+
+    def get_or_create_game_session_sync(self, lobby: Lobby) -> GameSession:
+        game_session = self.lobby_game_sessions(lobby).first()
+        return game_session or self.create_game_session(lobby)
 
     def create_game_session(self, lobby: Lobby) -> GameSession:
         """Create and initialize a new game session."""
-        game_session = GameSession.objects.create(
+        players = [
+            lobby_player.player
+            for lobby_player in lobby.lobbyplayer_set.select_related("player").order_by(
+                "player_id"
+            )
+        ]
+        game_session = GameSession(
             name=f"Lobby-{lobby.id}-{timezone.now().strftime('%H%M%S')}"
         )
-        for lobby_player in lobby.lobbyplayer_set.all():
-            game_session.players.add(lobby_player.player)
-
-        game_session.initialize_game()
-        game_session.state.update(
-            {
-                "player_ids": [player.id for player in game_session.players.all()],
-                "scores": {
-                    str(player.username): 0 for player in game_session.players.all()
-                },
-            }
-        )
+        game_session.reset_state([str(player.username) for player in players])
+        game_session.state["player_ids"] = [player.id for player in players]
         game_session.save()
+        game_session.players.add(*players)
         return game_session
 
+    @query_budget(3)
     async def make_move(self, data: Dict[str, Any]) -> None:
         """Process a player's move"""
         try:
-            result = await sync_to_async(self._process_move)(data)
+            if settings.GAME_ACTORS_ENABLED:
+                result = await self._process_move_in_memory(data)
+            else:
+                result = await game_executor.run(
+                    self._process_move, data, key=game_key(data["session_id"])
+                )
 
             if result["success"]:
-                await self.broadcast_game_state(result["game_session"])
+                await self.join_game_group(result["game_session"].id)
+                await self.broadcast_game_delta(result["delta"])
                 if result["game_session"].state.get("game_over", False):
                     await self.broadcast_game_over()
             else:
                 await self.send_error(result["error"])
 
+        except ExecutorSaturated:
+            raise
         except Exception as e:
             await self.send_error(f"Error processing move: {str(e)}")
 
-    @transaction.atomic
+    async def _process_move_in_memory(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply a move to the game's in-memory actor."""
+        try:
+            await self.join_game_group(data["session_id"])
+        except GameSession.DoesNotExist:
+            return {"success": False, "error": "Game session not found"}
+        assert self.game_actor is not None
+        return await self.game_actor.make_move(data["username"], data["card_ids"])
+
     def _process_move(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Synchronous method to process move"""
+        with (
+            metrics.move_transaction_seconds.time(path="database"),
+            transaction.atomic(),
+        ):
+            return self._apply_move(data)
+
+    def _apply_move(self, data: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            game_session = GameSession.objects.select_for_update().get(
-                pk=data["session_id"]
-            )
+            with metrics.move_lock_wait_seconds.time(path="database"):
+                game_session = GameSession.objects.select_for_update().get(
+                    pk=data["session_id"]
+                )
             player = User.objects.get(username=data["username"])
 
-            if not self.validate_card_ids(
-                data["card_ids"], game_session.state["board"].values()
-            ):
-                return {"success": False, "error": "Cards not on board"}
-
-            game_session.validate_and_process_move(player, data["card_ids"])
-            game_session.save()
+            delta = game_session.apply_move(str(player.username), data["card_ids"])
+            game_session.save_state()
+            transaction.on_commit(
+                partial(
+                    move_log.record,
+                    game_session.id,
+                    str(player.username),
+                    data["card_ids"],
+                )
+            )
 
-            return {"success": True, "game_session": game_session}
+            return {"success": True, "game_session": game_session, "delta": delta}
 
         except GameSession.DoesNotExist:
             return {"success": False, "error": "Game session not found"}
         except User.DoesNotExist:
             return {"success": False, "error": "Player not found"}
         except ValidationError as e:
-            return {"success": False, "error": str(e)}
+            return {"success": False, "error": "; ".join(e.messages)}
 
     async def game_state(self, event: Dict[str, Any]) -> None:
         """Send game state update to client."""
@@ -122,6 +360,80 @@ class GameConsumer(AsyncWebsocketConsumer):
             }
         )
 
+    async def game_delta(self, event: Dict[str, Any]) -> None:
+        """Send an incremental game state update to client."""
+        await self.send_json(
+            {
+                "type": "game_delta",
+                "delta": event["delta"],
+            }
+        )
+
+    @query_budget(2)
+    async def resync_game(self, data: Dict[str, Any]) -> None:
+        """Send a full snapshot to a client that missed a state version."""
+        game_session = await self.get_game_session(data)
+        if game_session is None:
+            return
+
+        await self.send_json(
+            {
+                "type": "game_state",
+                "state": await self.get_serialized_state(game_session),
+            }
+        )
+
+    @query_budget(2)
+    async def request_hint(self, data: Dict[str, Any]) -> None:
+        """Send this player one set on the board, or one card of it.
+
+        ``reveal`` is "set" (the default) or "card". The set comes from the
+        session's set index, so no board scan is needed.
+        """
+        game_session = await self.get_game_session(data)
+        if game_session is None:
+            return
+
+        if self.game_actor is not None:
+            card_set = game_session.hint()
+        else:
+            card_set = await game_executor.run(
+                game_session.hint, key=game_key(game_session.id)
+            )
+        card_ids = list(card_set or ())
+        if data.get("reveal") == "card":
+            card_ids = card_ids[:1]
+        await self.send_json(
+            {
+                "type": "hint",
+                "version": game_session.state_version,
+                "card_ids": card_ids,
+            }
+        )
+
+    async def get_game_session(self, data: Dict[str, Any]) -> Optional[GameSession]:
+        """Load the game named by a message, sending an error if it is unknown.
+
+        With GAME_ACTORS_ENABLED this is the live in-memory session.
+        """
+        session_id = data.get("session_id")
+        if not session_id:
+            await self.send_error("Session ID is required")
+            return None
+
+        try:
+            if settings.GAME_ACTORS_ENABLED:
+                await self.join_game_group(session_id)
+                assert self.game_actor is not None
+                return self.game_actor.session
+            return await game_executor.run(
+                partial(GameSession.objects.get, pk=session_id),
+                key=game_key(session_id),
+            )
+        except GameSession.DoesNotExist:
+            await self.send_error("Game session not found")
+            return None
+
     async def game_over(self, event: Dict[str, Any]) -> None:
         """Notify client that game has ended."""
         await self.send_json(
@@ -131,19 +443,39 @@ class GameConsumer(AsyncWebsocketConsumer):
             }
         )
 
+    @query_budget(5)
     async def request_rematch(self, data: Dict[str, Any]) -> None:
         """Handle a player's rematch request."""
         try:
-            result = await sync_to_async(self._process_rematch_request)(data)
+            if settings.GAME_ACTORS_ENABLED:
+                result = await self._process_rematch_in_memory(data)
+            else:
+                result = await game_executor.run(
+                    self._process_rematch_request,
+                    data,
+                    key=game_key(data["session_id"]),
+                )
             if result["success"]:
+                await self.join_game_group(result["game_session"].id)
                 await self.broadcast_rematch_status(result["rematch_status"])
                 if result["all_players_ready"]:
                     await self.start_new_game(result["game_session"])
             else:
                 await self.send_error(result["error"])
+        except ExecutorSaturated:
+            raise
         except Exception as e:
             await self.send_error(f"Error processing rematch request: {str(e)}")
 
+    async def _process_rematch_in_memory(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a rematch request on the game's in-memory actor."""
+        try:
+            await self.join_game_group(data["session_id"])
+        except GameSession.DoesNotExist:
+            return {"success": False, "error": "Game session not found"}
+        assert self.game_actor is not None
+        return await self.game_actor.request_rematch(data["username"])
+
     @transaction.atomic
     def _process_rematch_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Process a rematch request."""
@@ -159,22 +491,24 @@ class GameConsumer(AsyncWebsocketConsumer):
 
             # Mark the player as ready for rematch
             game_session.state["rematch_status"][str(player.username)] = True
-            game_session.save()
 
             # Get all players in the game session
-            all_players = list(game_session.players.all())
+            usernames = [
+                str(username)
+                for username in game_session.players.values_list("username", flat=True)
+            ]
 
             # Check if all players are ready for rematch
             all_players_ready = all(
-                game_session.state["rematch_status"].get(str(p.username), False)
-                for p in all_players
-            ) and len(game_session.state["rematch_status"]) == len(all_players)
+                game_session.state["rematch_status"].get(username, False)
+                for username in usernames
+            ) and len(game_session.state["rematch_status"]) == len(usernames)
 
             if all_players_ready:
                 # Reset the game state for a new game
-                game_session.initialize_game()
+                game_session.reset_state(usernames)
                 game_session.state["rematch_status"] = {}
-                game_session.save()
+            game_session.save()
 
             return {
                 "success": True,
@@ -189,9 +523,8 @@ class GameConsumer(AsyncWebsocketConsumer):
             return {"success": False, "error": "Player not found"}
 
     async def broadcast_rematch_status(self, rematch_status: Dict[str, bool]) -> None:
-        """Broadcast rematch status to all clients."""
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        """Broadcast rematch status to the players of this game."""
+        await self.group_send(
             {
                 "type": "rematch_status",
                 "rematch_status": rematch_status,
@@ -220,42 +553,66 @@ class GameConsumer(AsyncWebsocketConsumer):
                 "type": "game_started",
                 "session_id": session_id,
                 "player_ids": player_ids,
-                "state": await sync_to_async(self.serialize_game_state)(game_session),
+                "state": await self.get_serialized_state(game_session),
             }
         )
 
     async def broadcast_game_state(self, game_session: GameSession) -> None:
-        """Broadcast current game state to all clients."""
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        """Broadcast current game state to the players of this game."""
+        await self.group_send(
             {
                 "type": "game_state",
-                "state": await sync_to_async(self.serialize_game_state)(game_session),
+                "state": await self.get_serialized_state(game_session),
+            },
+        )
+
+    async def broadcast_game_delta(self, delta: Dict[str, Any]) -> None:
+        """Broadcast the changes made by one move to the players of this game."""
+        await self.group_send(
+            {
+                "type": "game_delta",
+                "delta": delta,
             },
         )
 
-    def serialize_game_state(self, session: GameSession) -> Dict[str, Any]:
+    async def group_send(self, message: Dict[str, Any]) -> None:
+        """Send a message to every socket in this game's group."""
+        with metrics.group_send_seconds.time(type=message["type"]):
+            await self.channel_layer.group_send(self.room_group_name, message)
+
+    async def get_serialized_state(self, game_session: GameSession) -> Dict[str, Any]:
+        """Serialize a session.
+
+        Actor-owned sessions are serialized on the event loop; otherwise the
+        players are read through the async ORM or the game executor.
+        """
+        actor = self.game_actor
+        if actor is not None and actor.session is game_session:
+            # Live state is only mutated on the loop, so read it there too.
+            return self.serialize_game_state(game_session, actor.player_usernames)
+        if settings.GAME_ASYNC_ORM_READS:
+            players = game_session.players.values_list("username", flat=True)
+            return self.serialize_game_state(
+                game_session, [str(username) async for username in players]
+            )
+        return await game_executor.run(
+            self.serialize_game_state, game_session, key=game_key(game_session.id)
+        )
+
+    def serialize_game_state(
+        self, session: GameSession, players: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """Prepare game state for serialization."""
+        if players is None:
+            players = [player.username for player in session.players.all()]
         return {
             "session": session.name,
-            "players": [player.username for player in session.players.all()],
+            "version": session.state_version,
+            "players": players,
             "board": session.state["board"],
             "scores": session.state["scores"],
-            "cards": {
-                str(card.id): {
-                    "number": card.number,
-                    "symbol": card.symbol,
-                    "shading": card.shading,
-                    "color": card.color,
-                }
-                for card in Card.objects.filter(id__in=session.state["board"].values())
-            },
         }
 
-    def validate_card_ids(self, card_ids: List[int], board_card_ids: List[int]) -> bool:
-        """Verify all card IDs exist on the board."""
-        return all(card_id in board_card_ids for card_id in card_ids)
-
     async def send_error(self, message: str) -> None:
         """Send error message to client."""
         await self.send_json(
@@ -266,9 +623,8 @@ class GameConsumer(AsyncWebsocketConsumer):
         )
 
     async def broadcast_game_over(self) -> None:
-        """Notify all clients that game has ended."""
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        """Notify the players of this game that it has ended."""
+        await self.group_send(
             {
                 "type": "game_over",
                 "message": "Game over! No more sets are possible.",
@@ -278,3 +634,57 @@ class GameConsumer(AsyncWebsocketConsumer):
     async def send_json(self, data: Dict[str, Any]) -> None:
         """Helper method to send JSON data."""
         await self.send(text_data=json.dumps(data))
+
+
+class LobbyConsumer(AsyncWebsocketConsumer):
+    """Pushes a lobby's status to its players as they join and get ready."""
+
+    # The session and user behind a lazy scope user, and the lobby status.
+    @query_budget(4)
+    async def connect(self) -> None:
+        self.group_name: Optional[str] = None
+        lobby_id = self.scope["url_route"]["kwargs"]["lobby_id"]
+        # Subscribe before reading the status, so no change made in between
+        # is missed; the client stops polling once the socket is open.
+        group_name = lobby_group_name(lobby_id)
+        await self.channel_layer.group_add(group_name, self.channel_name)
+        status = await sync_to_async(self.get_lobby_status)(lobby_id)
+        if status is None:
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+            await self.close()
+            return
+
+        self.group_name = group_name
+        await self.accept()
+        metrics.websocket_connections.inc(consumer="lobby")
+        await self.lobby_status({"event": "connected", "status": status})
+
+    async def disconnect(self, close_code: int) -> None:
+        if self.group_name is not None:
+            metrics.websocket_connections.dec(consumer="lobby")
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            self.group_name = None
+
+    def get_lobby_status(self, lobby_id: Any) -> Optional[Dict[str, Any]]:
+        """Status of the lobby, or None unless the user is one of its players."""
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            return None
+        lobby = (
+            lobby_status_queryset()
+            .filter(id=lobby_id, lobbyplayer__player=user)
+            .first()
+        )
+        return serialize_lobby(lobby) if lobby else None
+
+    async def lobby_status(self, event: Dict[str, Any]) -> None:
+        """Send a lobby status update to client."""
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "lobby_status",
+                    "event": event["event"],
+                    "status": event["status"],
+                }
+            )
+        )
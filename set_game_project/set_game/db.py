@@ -0,0 +1,98 @@
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, List, Tuple
+from django.conf import settings
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+
+def configure_sqlite_connection(
+    sender: Any, connection: BaseDatabaseWrapper, **kwargs: Any
+) -> None:
+    """Apply settings.SQLITE_PRAGMAS to each new SQLite connection."""
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if not pragmas:
+        return
+    # On the driver's connection, so the pragmas are not counted as queries
+    # of whatever handler happened to open it.
+    cursor = connection.connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+class QueryRecorder:
+    """Queries made while a track_queries() block runs.
+
+    With ``details`` the SQL of each query is kept, and with ``stacks`` the
+    project frames that made it too.
+    """
+
+    def __init__(self, details: bool = False, stacks: bool = False) -> None:
+        self.count = 0
+        self.details = details or stacks
+        self.stacks = stacks
+        self.queries: List[Tuple[str, List[str]]] = []
+
+    def record(self, sql: str) -> None:
+        self.count += 1
+        if self.details:
+            stack = _project_frames() if self.stacks else []
+            self.queries.append((sql, stack))
+
+
+def _project_frames() -> List[str]:
+    """The calling stack, limited to frames in this project's source."""
+    base = str(settings.BASE_DIR)
+    return [
+        f"{frame.filename}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base) and "site-packages" not in frame.filename
+    ]
+
+
+# Transaction control, which tests (savepoints) and production (BEGIN) issue
+# differently, is not counted.
+TRANSACTION_STATEMENTS = ("BEGIN", "SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO")
+
+# Recorders of the code running now. The tuple is copied into tasks and
+# sync_to_async threads with the context, so queries made there count too.
+_recorders: ContextVar[Tuple[QueryRecorder, ...]] = ContextVar(
+    "set_game_query_recorders", default=()
+)
+
+
+@contextmanager
+def track_queries(
+    details: bool = False, stacks: bool = False
+) -> Iterator[QueryRecorder]:
+    """Record the queries made, on any connection, until the block exits."""
+    recorder = QueryRecorder(details, stacks)
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+def record_query(
+    execute: Callable[..., Any], sql: str, params: Any, many: bool, context: Any
+) -> Any:
+    """Database execute wrapper feeding the active QueryRecorders."""
+    recorders = _recorders.get()
+    if recorders and not sql.startswith(TRANSACTION_STATEMENTS):
+        for recorder in recorders:
+            recorder.record(sql)
+    return execute(sql, params, many, context)
+
+
+def install_query_recorder(
+    sender: Any, connection: BaseDatabaseWrapper, **kwargs: Any
+) -> None:
+    """Add record_query() to each new connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
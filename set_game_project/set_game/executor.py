@@ -0,0 +1,160 @@
+"""Bounded thread pool for GameConsumer's database work.
+
+sync_to_async runs every call on one shared thread, so a slow move holds up
+``start_game`` on every other socket. Game operations run on a pool of
+``GAME_EXECUTOR_THREADS`` threads instead:
+
+- calls with the same key (one game, or one lobby) run one at a time, in the
+  order they were made;
+- once ``GAME_EXECUTOR_MAX_PENDING`` calls are queued or running, further ones
+  raise ExecutorSaturated at once rather than queueing without bound, and the
+  consumer tells the client the server is busy;
+- queue depth, running calls, queueing time and refusals are exported as
+  metrics.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, TypeVar
+from django.conf import settings
+from django.db import close_old_connections
+from . import metrics
+
+T = TypeVar("T")
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+def game_key(session_id: Any) -> str:
+    """Ordering key for work on one GameSession."""
+    return f"session:{session_id}"
+
+
+def lobby_key(lobby_id: Any) -> str:
+    """Ordering key for work on one Lobby."""
+    return f"lobby:{lobby_id}"
+
+
+class GameExecutor:
+    """Runs blocking ORM calls off the event loop, in order per key."""
+
+    def __init__(self) -> None:
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0  # admitted and not yet finished
+        self._running = 0
+        # Per key: its lock, and how many calls hold or wait for it.
+        self._keys: Dict[Hashable, List[Any]] = {}
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def queued(self) -> int:
+        return self._pending - self._running
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    async def run(
+        self,
+        func: Callable[..., T],
+        *args: Any,
+        key: Optional[Hashable] = None,
+        wait: bool = False,
+    ) -> T:
+        """Call ``func(*args)`` on the pool after earlier calls with ``key``.
+
+        Raises ExecutorSaturated if the pool is full, unless ``wait`` is set:
+        work that must not be lost, such as persisting a game, always queues.
+        """
+        with self._lock:
+            if not wait and self._pending >= settings.GAME_EXECUTOR_MAX_PENDING:
+                metrics.executor_rejections.inc()
+                raise ExecutorSaturated("Server is busy; try again shortly")
+            self._pending += 1
+        submitted = time.perf_counter()
+        try:
+            if key is None:
+                return await self._submit(func, args, submitted)
+            lock = self._acquire_key(key)
+            try:
+                async with lock:
+                    return await self._submit(func, args, submitted)
+            finally:
+                self._release_key(key)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def _submit(self, func: Callable[..., T], args: Any, submitted: float) -> T:
+        # Carry the caller's context, so queries still count against its
+        # query budget and metrics.
+        context = contextvars.copy_context()
+
+        def call() -> T:
+            metrics.executor_wait_seconds.observe(time.perf_counter() - submitted)
+            with self._lock:
+                self._running += 1
+            # Like the request signals for views and channels'
+            # database_sync_to_async: drop connections that are past
+            # CONN_MAX_AGE, fail their health check or were broken by an error.
+            close_old_connections()
+            try:
+                return context.run(func, *args)
+            finally:
+                close_old_connections()
+                with self._lock:
+                    self._running -= 1
+
+        return await asyncio.wrap_future(self._get_pool().submit(call))
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=settings.GAME_EXECUTOR_THREADS,
+                    thread_name_prefix="game-db",
+                )
+            return self._pool
+
+    def _acquire_key(self, key: Hashable) -> asyncio.Lock:
+        entry = self._keys.get(key)
+        if entry is None:
+            entry = self._keys[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release_key(self, key: Hashable) -> None:
+        entry = self._keys[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._keys[key]
+
+    def shutdown(self) -> None:
+        """Finish running calls and stop the threads; the pool restarts on use."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+game_executor = GameExecutor()
+
+metrics.Gauge(
+    "set_game_executor_queued",
+    "Game database calls waiting for their game or for a thread",
+    function=lambda: game_executor.queued,
+)
+metrics.Gauge(
+    "set_game_executor_running",
+    "Game database calls running on the executor's threads",
+    function=lambda: game_executor.running,
+)
@@ -0,0 +1,194 @@
+"""Authoritative in-memory game state with write-behind persistence.
+
+Each live GameSession is owned by one GameActor in the consumer process. Moves
+and rematch requests run against the actor's in-memory state one at a time,
+and the state is written back to the database in the background: at most
+``GAME_ACTOR_FLUSH_INTERVAL`` seconds after a change, straight away when a game
+ends, and when the last socket of the game disconnects.
+"""
+
+import asyncio
+import copy
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from . import metrics
+from .executor import game_executor, game_key
+from .models import GameSession
+from .move_log import move_log
+
+logger = logging.getLogger(__name__)
+
+
+class GameActor:
+    """Owns the live state of one GameSession and serialises changes to it."""
+
+    def __init__(self, session: GameSession, player_usernames: List[str]) -> None:
+        self.session = session
+        self.player_usernames = player_usernames
+        self.connections = 0
+        self.dirty = False
+        self._lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._flush_timer: Optional["asyncio.Future[None]"] = None
+        self._flushes: Set["asyncio.Future[None]"] = set()
+
+    @property
+    def session_id(self) -> int:
+        return self.session.id
+
+    async def make_move(self, username: str, card_ids: List[Any]) -> Dict[str, Any]:
+        """Validate and apply a move in memory."""
+        waiting = time.perf_counter()
+        async with self._lock:
+            metrics.move_lock_wait_seconds.observe(
+                time.perf_counter() - waiting, path="actor"
+            )
+            with metrics.move_transaction_seconds.time(path="actor"):
+                return self._apply_move(username, card_ids)
+
+    def _apply_move(self, username: str, card_ids: List[Any]) -> Dict[str, Any]:
+        if username not in self.player_usernames:
+            return {"success": False, "error": "Player not found"}
+        try:
+            delta = self.session.apply_move(username, card_ids)
+        except ValidationError as e:
+            return {"success": False, "error": "; ".join(e.messages)}
+
+        move_log.record(self.session_id, username, card_ids)
+        self._mark_dirty(flush_now=self.session.state.get("game_over", False))
+        return {"success": True, "game_session": self.session, "delta": delta}
+
+    async def request_rematch(self, username: str) -> Dict[str, Any]:
+        """Record a rematch request and deal a new game once everyone agrees."""
+        async with self._lock:
+            if username not in self.player_usernames:
+                return {"success": False, "error": "Player not found"}
+            rematch_status = self.session.state.setdefault("rematch_status", {})
+            rematch_status[username] = True
+
+            all_players_ready = all(
+                rematch_status.get(player, False) for player in self.player_usernames
+            ) and len(rematch_status) == len(self.player_usernames)
+
+            if all_players_ready:
+                self.session.reset_state(self.player_usernames)
+                self.session.state["rematch_status"] = {}
+
+            self._mark_dirty(flush_now=all_players_ready)
+            return {
+                "success": True,
+                "rematch_status": dict(self.session.state["rematch_status"]),
+                "all_players_ready": all_players_ready,
+                "game_session": self.session,
+            }
+
+    def _mark_dirty(self, flush_now: bool = False) -> None:
+        self.dirty = True
+        if flush_now:
+            flush = asyncio.ensure_future(self.flush())
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+        elif self._flush_timer is None or self._flush_timer.done():
+            self._flush_timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(settings.GAME_ACTOR_FLUSH_INTERVAL)
+        # Shielded so close() cancelling the timer never abandons a write.
+        await asyncio.shield(self.flush())
+
+    async def flush(self) -> None:
+        """Write the current state to the database if it has changed."""
+        async with self._flush_lock:
+            if not self.dirty:
+                return
+            # Snapshot on the event loop so later moves cannot race the write.
+            snapshot = copy.deepcopy(self.session.state)
+            self.dirty = False
+            try:
+                # Never refused when busy: on close this is the last write.
+                updated = await game_executor.run(
+                    self._write_snapshot,
+                    snapshot,
+                    key=game_key(self.session_id),
+                    wait=True,
+                )
+            except Exception:
+                self.dirty = True
+                logger.exception("Failed to persist game session %s", self.session_id)
+                return
+            if not updated:
+                logger.warning(
+                    "Game session %s no longer exists; state not saved",
+                    self.session_id,
+                )
+
+    def _write_snapshot(self, snapshot: Dict[str, Any]) -> bool:
+        return bool(
+            GameSession.objects.filter(pk=self.session_id).update(
+                state=snapshot, last_activity=timezone.now()
+            )
+        )
+
+    async def close(self) -> None:
+        """Cancel any pending timed flush and persist outstanding changes."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        await self.flush()
+
+
+class GameActorRegistry:
+    """Process-wide map of session id to the actor that owns it."""
+
+    def __init__(self) -> None:
+        self._actors: Dict[int, GameActor] = {}
+
+    def __len__(self) -> int:
+        return len(self._actors)
+
+    def get(self, session_id: Any) -> Optional[GameActor]:
+        return self._actors.get(int(session_id))
+
+    async def acquire(
+        self, session_id: Any, session: Optional[GameSession] = None
+    ) -> GameActor:
+        """Return the actor for a session, loading it on first use.
+
+        Raises GameSession.DoesNotExist if the session is unknown.
+        """
+        session_id = int(session_id)
+        actor = self._actors.get(session_id)
+        if actor is None:
+            session, usernames = await game_executor.run(
+                self._load, session_id, session, key=game_key(session_id)
+            )
+            # Another socket may have loaded the same session meanwhile.
+            actor = self._actors.setdefault(session_id, GameActor(session, usernames))
+        actor.connections += 1
+        return actor
+
+    def _load(self, session_id: int, session: Optional[GameSession]) -> Any:
+        if session is None:
+            session = GameSession.objects.get(pk=session_id)
+        usernames = list(session.players.values_list("username", flat=True))
+        return session, usernames
+
+    async def release(self, actor: GameActor) -> None:
+        """Drop a socket's hold on an actor, persisting it once unused."""
+        actor.connections -= 1
+        if actor.connections > 0:
+            return
+        await actor.close()
+        # Keep the actor if a socket picked it up again while it was flushing.
+        if actor.connections == 0 and self._actors.get(actor.session_id) is actor:
+            del self._actors[actor.session_id]
+
+    def clear(self) -> None:
+        self._actors.clear()
+
+
+game_actors = GameActorRegistry()
@@ -0,0 +1,348 @@
+"""Load generator for GameConsumer.
+
+Opens game sockets, seats them in lobbies, starts each game and plays it with
+scripted players: the player to move asks for a hint and sends it as a move.
+For every move it measures
+
+    round trip  make_move sent until the mover receives its game_delta
+    fan-out     make_move sent until every player in the game has it
+
+and counts error replies and timeouts. Sockets are either in-process
+WebsocketCommunicators, as used by the consumer tests, or real connections to
+a running server such as daphne.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import struct
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Counter as CounterType, Dict, List
+from typing import Optional, Sequence
+from urllib.parse import urlparse
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from .consumers import GameConsumer
+from .models import GameSession, Lobby, LobbyPlayer
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+}
+
+
+def game_socket_path(lobby_id: Optional[int] = None) -> str:
+    """Game socket path; the lobby id is what nginx routes a game's sockets by."""
+    return "/ws/game/" if lobby_id is None else f"/ws/game/?lobby={lobby_id}"
+
+
+def game_communicator(lobby_id: Optional[int] = None) -> WebsocketCommunicator:
+    """An unconnected in-process socket to GameConsumer."""
+    return WebsocketCommunicator(GameConsumer.as_asgi(), game_socket_path(lobby_id))
+
+
+def redis_available(timeout: float = 0.5) -> bool:
+    """Whether the Redis server behind the channel layer answers a ping."""
+    import redis
+
+    try:
+        client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            socket_connect_timeout=timeout,
+        )
+        return bool(client.ping())
+    except redis.RedisError:
+        return False
+
+
+class GameSocket(ABC):
+    """A JSON game socket, whatever its transport."""
+
+    @abstractmethod
+    async def send_json(self, data: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def receive_json(self) -> Optional[Dict[str, Any]]:
+        """Wait for the next message; None once the socket has closed."""
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+
+class CommunicatorSocket(GameSocket):
+    def __init__(self, communicator: WebsocketCommunicator) -> None:
+        self.communicator = communicator
+
+    @classmethod
+    async def connect(cls, lobby_id: Optional[int] = None) -> "CommunicatorSocket":
+        communicator = game_communicator(lobby_id)
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise ConnectionError("GameConsumer refused the connection")
+        return cls(communicator)
+
+    async def send_json(self, data: Dict[str, Any]) -> None:
+        await self.communicator.send_json_to(data)
+
+    async def receive_json(self) -> Optional[Dict[str, Any]]:
+        response = await self.communicator.receive_output(timeout=None)
+        if response["type"] == "websocket.close":
+            return None
+        return json.loads(response["text"])
+
+    async def close(self) -> None:
+        await self.communicator.disconnect()
+
+
+class RemoteSocket(GameSocket):
+    """A WebSocket connection to a running server.
+
+    A minimal RFC 6455 client on asyncio streams: text frames out, text, ping
+    and close frames in. autobahn's asyncio client cannot be used here since
+    importing daphne commits txaio to Twisted.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, url: str) -> "RemoteSocket":
+        address = urlparse(url)
+        secure = address.scheme == "wss"
+        host = address.hostname or "localhost"
+        port = address.port or (443 if secure else 80)
+        reader, writer = await asyncio.open_connection(host, port, ssl=secure or None)
+        key = base64.b64encode(os.urandom(16)).decode()
+        target = (address.path or "/") + (f"?{address.query}" if address.query else "")
+        writer.write(
+            (
+                f"GET {target} HTTP/1.1\r\n"
+                f"Host: {host}:{port}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n"
+                f"Origin: http://{host}:{port}\r\n\r\n"
+            ).encode()
+        )
+        response = await reader.readuntil(b"\r\n\r\n")
+        if not response.startswith(b"HTTP/1.1 101"):
+            writer.close()
+            raise ConnectionError(response.split(b"\r\n", 1)[0].decode())
+        return cls(reader, writer)
+
+    def _send_frame(self, opcode: int, payload: bytes) -> None:
+        mask = os.urandom(4)
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, 0x80 | length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, length)
+        masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        self.writer.write(header + mask + masked)
+
+    async def send_json(self, data: Dict[str, Any]) -> None:
+        self._send_frame(0x1, json.dumps(data).encode())
+        await self.writer.drain()
+
+    async def receive_json(self) -> Optional[Dict[str, Any]]:
+        message = b""
+        while True:
+            try:
+                first, second = await self.reader.readexactly(2)
+                length = second & 0x7F
+                if length == 126:
+                    (length,) = struct.unpack("!H", await self.reader.readexactly(2))
+                elif length == 127:
+                    (length,) = struct.unpack("!Q", await self.reader.readexactly(8))
+                payload = await self.reader.readexactly(length)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return None
+            opcode = first & 0x0F
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                self._send_frame(0xA, payload)
+                continue
+            if opcode in (0x0, 0x1):
+                message += payload
+                if first & 0x80:
+                    return json.loads(message)
+
+    async def close(self) -> None:
+        if not self.writer.is_closing():
+            self._send_frame(0x8, struct.pack("!H", 1000))
+            self.writer.close()
+
+
+@dataclass
+class LoadTestResult:
+    games: int = 0
+    moves: int = 0
+    seconds: float = 0.0
+    round_trips: List[float] = field(default_factory=list)  # seconds
+    fan_outs: List[float] = field(default_factory=list)  # seconds
+    errors: CounterType[str] = field(default_factory=Counter)
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    """Nearest-rank percentile; 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+class Player:
+    """One scripted player: a socket and the messages it has received."""
+
+    def __init__(self, username: str, socket: GameSocket) -> None:
+        self.username = username
+        self.socket = socket
+        # game_delta and error replies, stamped on arrival, in order.
+        self.moves: "asyncio.Queue[Any]" = asyncio.Queue()
+        self.hints: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self.started: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self.reader: Optional["asyncio.Task[None]"] = None
+
+    def start_reading(self) -> None:
+        self.reader = asyncio.ensure_future(self._read())
+
+    async def _read(self) -> None:
+        while (message := await self.socket.receive_json()) is not None:
+            kind = message["type"]
+            if kind in ("game_delta", "error"):
+                self.moves.put_nowait((time.perf_counter(), message))
+            elif kind == "hint":
+                self.hints.put_nowait(message)
+            elif kind == "game_started":
+                self.started.put_nowait(message)
+
+    async def close(self) -> None:
+        if self.reader is not None:
+            self.reader.cancel()
+        await self.socket.close()
+
+
+async def play_game(
+    players: List[Player],
+    lobby_id: int,
+    result: LoadTestResult,
+    max_moves: int,
+    timeout: float,
+) -> None:
+    """Start one lobby's game and play it to the end or ``max_moves``."""
+    for player in players:
+        await player.socket.send_json({"type": "start_game", "lobby_id": lobby_id})
+        started = await asyncio.wait_for(player.started.get(), timeout)
+    session_id = started["session_id"]
+    result.games += 1
+
+    for move in range(max_moves):
+        mover = players[move % len(players)]
+        await mover.socket.send_json({"type": "request_hint", "session_id": session_id})
+        hint = await asyncio.wait_for(mover.hints.get(), timeout)
+        if not hint["card_ids"]:
+            return
+
+        sent = time.perf_counter()
+        await mover.socket.send_json(
+            {
+                "type": "make_move",
+                "session_id": session_id,
+                "username": mover.username,
+                "card_ids": hint["card_ids"],
+            }
+        )
+        arrived, reply = await asyncio.wait_for(mover.moves.get(), timeout)
+        if reply["type"] == "error":
+            result.errors[reply["message"]] += 1
+            continue
+        result.moves += 1
+        result.round_trips.append(arrived - sent)
+
+        last = arrived
+        for player in players:
+            if player is not mover:
+                arrived, reply = await asyncio.wait_for(player.moves.get(), timeout)
+                last = max(last, arrived)
+        result.fan_outs.append(last - sent)
+        if reply["delta"]["game_over"]:
+            return
+
+
+def create_lobbies(games: int, players_per_game: int, prefix: str) -> List[Any]:
+    """Create full lobbies of new users; returns (lobby_id, usernames) pairs."""
+    users = User.objects.bulk_create(
+        User(username=f"{prefix}{number}") for number in range(games * players_per_game)
+    )
+    lobbies = []
+    for game in range(games):
+        members = users[game * players_per_game : (game + 1) * players_per_game]
+        lobby = Lobby.objects.create(max_players=players_per_game)
+        LobbyPlayer.objects.bulk_create(
+            LobbyPlayer(lobby=lobby, player=member, ready=True) for member in members
+        )
+        lobbies.append((lobby.id, [member.username for member in members]))
+    return lobbies
+
+
+def delete_lobbies(prefix: str) -> None:
+    """Remove the users, lobbies and games a load test created."""
+    users = User.objects.filter(username__startswith=prefix)
+    GameSession.objects.filter(players__in=users).delete()
+    Lobby.objects.filter(lobbyplayer__player__in=users).delete()
+    users.delete()
+
+
+async def run_load_test(
+    games: int,
+    players_per_game: int = 2,
+    max_moves: int = 1000,
+    connect: Optional[Callable[[int], Awaitable[GameSocket]]] = None,
+    timeout: float = 10.0,
+    prefix: str = "loadtest-",
+) -> LoadTestResult:
+    """Play ``games`` concurrent games over ``connect``ed sockets.
+
+    Sockets are in-process CommunicatorSockets unless ``connect`` is given;
+    it is called with the lobby id of the game the socket will play.
+    Users and lobbies are created up front, named with ``prefix``.
+    """
+    connect = connect or CommunicatorSocket.connect
+    lobbies = await sync_to_async(create_lobbies)(games, players_per_game, prefix)
+    result = LoadTestResult()
+    all_players: List[Player] = []
+
+    async def run_game(lobby_id: int, usernames: List[str]) -> None:
+        players: List[Player] = []
+        try:
+            for username in usernames:
+                players.append(Player(username, await connect(lobby_id)))
+                all_players.append(players[-1])
+                players[-1].start_reading()
+            await play_game(players, lobby_id, result, max_moves, timeout)
+        except asyncio.TimeoutError:
+            result.errors["timeout"] += 1
+        except ConnectionError as e:
+            result.errors[f"connection failed: {e}"] += 1
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_game(*lobby) for lobby in lobbies))
+        result.seconds = time.perf_counter() - start
+    finally:
+        await asyncio.gather(
+            *(player.close() for player in all_players), return_exceptions=True
+        )
+    return result
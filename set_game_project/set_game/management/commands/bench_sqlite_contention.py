@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import Counter
+from io import StringIO
+from typing import Any, Dict
+from django import VERSION as DJANGO_VERSION
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import RequestFactory, override_settings
+from set_game.consumers import GameConsumer
+from set_game.management.scratch import scratch_database
+from set_game.models import GameSession, Lobby, LobbyPlayer
+from set_game.move_log import move_log
+from set_game.set_engine import find_any_set
+from set_game.views import lobby_status
+
+PROFILES = ("default", "tuned")
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent moves and lobby polls against a scratch SQLite database "
+        "and report how often they hit 'database is locked'"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--moves", type=int, default=100, help="Per writer")
+        parser.add_argument("--profile", choices=PROFILES + ("both",), default="both")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark only applies to SQLite")
+        if options["writers"] < 1 or options["readers"] < 0 or options["moves"] < 1:
+            raise CommandError("Invalid --writers, --readers or --moves")
+
+        profiles = PROFILES if options["profile"] == "both" else (options["profile"],)
+        for profile in profiles:
+            results = self.run_profile(profile, options)
+            self.report(profile, results)
+
+    def run_profile(self, profile: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Play the workload on a fresh database file using the given profile."""
+        tuned = profile == "tuned"
+        settings_dict = connection.settings_dict
+        saved_options = dict(settings_dict["OPTIONS"])
+        if tuned and DJANGO_VERSION >= (5, 1):
+            settings_dict["OPTIONS"]["transaction_mode"] = "IMMEDIATE"
+        else:
+            settings_dict["OPTIONS"].pop("transaction_mode", None)
+
+        pragmas = settings.SQLITE_TUNED_PRAGMAS if tuned else {}
+        try:
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                with scratch_database(sqlite_file=True):
+                    return self.run_workload(options)
+        finally:
+            settings_dict["OPTIONS"] = saved_options
+
+    def run_workload(self, options: Dict[str, Any]) -> Dict[str, Any]:
+        call_command("populate_cards", stdout=StringIO())
+        games = []
+        for i in range(options["writers"]):
+            players = [
+                User.objects.create_user(username=f"bench_{i}_{seat}")
+                for seat in range(2)
+            ]
+            lobby = Lobby.objects.create()
+            for player in players:
+                LobbyPlayer.objects.create(lobby=lobby, player=player, ready=True)
+            session = GameSession.objects.create(name=f"Bench {i}")
+            session.players.set(players)
+            session.initialize_game()
+            games.append((session.id, players[0].username, lobby.id))
+        connection.close()
+
+        outcomes: Counter = Counter()
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def record(outcome: str) -> None:
+            with lock:
+                outcomes[outcome] += 1
+
+        def write(session_id: int, username: str) -> None:
+            consumer = GameConsumer()
+            try:
+                for _ in range(options["moves"]):
+                    try:
+                        session = GameSession.objects.get(pk=session_id)
+                        if session.state.get("game_over"):
+                            session.initialize_game()
+                            session.refresh_from_db()
+                        cards = (
+                            find_any_set(list(session.state["board"].values())) or ()
+                        )
+                        result = consumer._process_move(
+                            {
+                                "session_id": session_id,
+                                "username": username,
+                                "card_ids": list(cards),
+                            }
+                        )
+                        record("moves" if result["success"] else "rejected")
+                    except OperationalError as e:
+                        record("move_locked" if "locked" in str(e) else "move_error")
+            finally:
+                connections.close_all()
+
+        def poll(lobby_ids: list) -> None:
+            factory = RequestFactory()
+            try:
+                while not stop.is_set():
+                    for lobby_id in lobby_ids:
+                        request = factory.get(f"/lobby/{lobby_id}/status/")
+                        response = lobby_status(request, lobby_id)
+                        # lobby_status reports database errors as a 500.
+                        record(
+                            "polls" if response.status_code == 200 else "poll_failed"
+                        )
+            finally:
+                connections.close_all()
+
+        writers = [
+            threading.Thread(target=write, args=(session_id, username))
+            for session_id, username, _ in games
+        ]
+        readers = [
+            threading.Thread(
+                target=poll, args=([lobby_id for _, _, lobby_id in games],)
+            )
+            for _ in range(options["readers"])
+        ]
+        start = time.perf_counter()
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in readers:
+            thread.join()
+        # Write out the move history before the scratch database goes away.
+        move_log.stop()
+
+        return {"elapsed": elapsed, **outcomes}
+
+    def report(self, profile: str, results: Dict[str, Any]) -> None:
+        attempts = sum(
+            results.get(key, 0)
+            for key in ("moves", "rejected", "move_locked", "move_error")
+        )
+        polls = results.get("polls", 0) + results.get("poll_failed", 0)
+        locked = results.get("move_locked", 0)
+        self.stdout.write(f"Profile: {profile}")
+        self.stdout.write(
+            f"  moves:  {attempts} attempted, {results.get('moves', 0)} applied, "
+            f"{locked} locked ({locked / attempts:.2%}), "
+            f"{results.get('move_error', 0)} other errors"
+        )
+        self.stdout.write(
+            f"  polls:  {polls} made, {results.get('poll_failed', 0)} failed "
+            f"({results.get('poll_failed', 0) / max(polls, 1):.2%})"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"  {results.get('moves', 0) / results['elapsed']:,.0f} applied "
+                f"moves/s over {results['elapsed']:.2f}s"
+            )
+        )
@@ -0,0 +1,70 @@
+import json
+from io import StringIO
+import random
+import time
+from typing import Any, Callable
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from set_game.catalog import get_card_catalog, invalidate_card_catalog
+from set_game.management.scratch import scratch_database
+from set_game.state_codec import decode_state, encode_state
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the size and speed of JSON and the compact state codec "
+        "for a freshly dealt game"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20_000)
+        parser.add_argument("--players", type=int, default=4)
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1 or not 0 < options["players"] < 256:
+            raise CommandError("Invalid --iterations or --players")
+
+        with scratch_database():
+            call_command("populate_cards", stdout=StringIO())
+            invalidate_card_catalog()
+            catalog = get_card_catalog()
+            card_ids = [card.id for card in catalog.all()]
+            random.shuffle(card_ids)
+            state = {
+                "version": 1,
+                "deck": card_ids[12:],
+                "board": {str(pos): card_ids[pos] for pos in range(12)},
+                "scores": {
+                    f"player#{number:04d}": 0 for number in range(options["players"])
+                },
+            }
+            text = json.dumps(state)
+            data = encode_state(state, catalog)
+            assert decode_state(data, catalog) == state
+
+            iterations = options["iterations"]
+            self.stdout.write(f"Dealt game, {options['players']} players:")
+            self.stdout.write(
+                f"  json:    {len(text):4d} bytes, "
+                f"encode {self.measure(lambda: json.dumps(state), iterations):6.2f} us, "
+                f"decode {self.measure(lambda: json.loads(text), iterations):6.2f} us"
+            )
+            encode_us = self.measure(lambda: encode_state(state, catalog), iterations)
+            decode_us = self.measure(lambda: decode_state(data, catalog), iterations)
+            self.stdout.write(
+                f"  compact: {len(data):4d} bytes, "
+                f"encode {encode_us:6.2f} us, decode {decode_us:6.2f} us"
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Compact state is {len(text) / len(data):.1f}x smaller than JSON"
+                )
+            )
+        invalidate_card_catalog()
+
+    def measure(self, call: Callable[[], Any], times: int) -> float:
+        """Mean microseconds per call."""
+        start = time.perf_counter()
+        for _ in range(times):
+            call()
+        return (time.perf_counter() - start) / times * 1_000_000
@@ -0,0 +1,55 @@
+import json
+import os
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Query /health on each local ASGI worker started by start_daphne.sh "
+        "and fail unless every one is healthy"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=int(os.environ.get("WEB_WORKERS", 1)),
+            help="Number of workers, on consecutive ports (default: $WEB_WORKERS)",
+        )
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8000, help="Of worker 0")
+        parser.add_argument("--timeout", type=float, default=3.0)
+
+    def handle(self, *args, **options):
+        unhealthy = 0
+        for worker in range(options["workers"]):
+            url = f"http://{options['host']}:{options['port'] + worker}/health"
+            try:
+                with urlopen(url, timeout=options["timeout"]) as response:
+                    body = response.read()
+            except HTTPError as e:
+                body = e.read()  # a 503 still says which check failed
+            except (URLError, OSError) as e:
+                body = json.dumps({"error": str(e)}).encode()
+            try:
+                health = json.loads(body)
+            except ValueError:
+                health = {"error": f"unexpected response {body[:80]!r}"}
+
+            checks = health.get("checks", {})
+            if checks and all(checks.values()):
+                self.stdout.write(
+                    f"worker {worker}: ok, pid {health['pid']}, {health['games']} games"
+                )
+            else:
+                unhealthy += 1
+                failed = [name for name, ok in checks.items() if not ok]
+                self.stderr.write(
+                    f"worker {worker}: {health.get('error') or ', '.join(failed)} failing"
+                )
+
+        if unhealthy:
+            raise CommandError(f"{unhealthy} of {options['workers']} workers unhealthy")
+        self.stdout.write(self.style.SUCCESS(f"{options['workers']} workers healthy"))
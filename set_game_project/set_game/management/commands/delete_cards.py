@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from set_game.models import Card
+from set_game.catalog import invalidate_card_catalog
 
 
 class Command(BaseCommand):
@@ -7,4 +8,5 @@ class Command(BaseCommand):
 
     def handle(self, *args, **kwargs):
         Card.objects.all().delete()
+        invalidate_card_catalog()
         self.stdout.write(self.style.SUCCESS("Successfully deleted all SET game cards"))
@@ -0,0 +1,110 @@
+import asyncio
+import uuid
+from contextlib import ExitStack
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from set_game.catalog import invalidate_card_catalog
+from set_game.loadtest import (
+    IN_MEMORY_CHANNEL_LAYERS,
+    LoadTestResult,
+    RemoteSocket,
+    delete_lobbies,
+    game_socket_path,
+    percentile,
+    redis_available,
+    run_load_test,
+)
+from set_game.management.scratch import scratch_database
+from set_game.move_log import move_log
+
+
+class Command(BaseCommand):
+    help = (
+        "Play concurrent scripted games over game sockets and report move "
+        "latency percentiles, broadcast fan-out and errors"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--games", type=int, default=50)
+        parser.add_argument("--players", type=int, default=2, help="Per game")
+        parser.add_argument("--moves", type=int, default=1000, help="Most per game")
+        parser.add_argument("--timeout", type=float, default=10.0)
+        parser.add_argument(
+            "--url",
+            help=(
+                "Game socket of a running server, e.g. ws://localhost:8000/ws/game/; "
+                "each game's sockets carry its lobby id for sticky routing. "
+                "Users and lobbies are then created in the configured database "
+                "and removed afterwards. By default games run in-process "
+                "against a scratch database."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["games"] < 1 or options["players"] < 1 or options["moves"] < 1:
+            raise CommandError("Invalid --games, --players or --moves")
+
+        with ExitStack() as stack:
+            if options["url"]:
+                url = options["url"]
+                transport = url
+                prefix = f"loadtest-{uuid.uuid4().hex[:8]}-"
+                stack.callback(delete_lobbies, prefix)
+                base_url = url.split("/ws/", 1)[0]
+                connect = lambda lobby_id: RemoteSocket.connect(  # noqa: E731
+                    base_url + game_socket_path(lobby_id)
+                )
+            else:
+                stack.enter_context(scratch_database(sqlite_file=True))
+                call_command("populate_cards", stdout=StringIO())
+                invalidate_card_catalog()
+                stack.callback(invalidate_card_catalog)
+                stack.callback(move_log.stop)
+                if redis_available():
+                    transport = "in-process sockets, Redis channel layer"
+                else:
+                    stack.enter_context(
+                        override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+                    )
+                    transport = "in-process sockets, in-memory channel layer"
+                prefix = "loadtest-"
+                connect = None
+
+            result = asyncio.run(
+                run_load_test(
+                    options["games"],
+                    players_per_game=options["players"],
+                    max_moves=options["moves"],
+                    connect=connect,
+                    timeout=options["timeout"],
+                    prefix=prefix,
+                )
+            )
+        self.report(result, options, transport)
+
+    def report(self, result: LoadTestResult, options, transport: str) -> None:
+        self.stdout.write(
+            f"Played {result.games}/{options['games']} games of "
+            f"{options['players']} players over {transport}: "
+            f"{result.moves} moves in {result.seconds:.2f} s "
+            f"({result.moves / result.seconds if result.seconds else 0:,.0f} moves/s)"
+        )
+        for label, samples in (
+            ("move round trip", result.round_trips),
+            ("broadcast fan-out", result.fan_outs),
+        ):
+            self.stdout.write(
+                f"  {label:<17} "
+                + ", ".join(
+                    f"p{percent} {percentile(samples, percent) * 1000:7.2f} ms"
+                    for percent in (50, 95, 99)
+                )
+                + f", max {max(samples, default=0) * 1000:7.2f} ms"
+            )
+        for error, count in result.errors.most_common():
+            self.stderr.write(f"  error x{count}: {error}")
+        if result.errors:
+            raise CommandError(f"{sum(result.errors.values())} errors")
+        self.stdout.write(self.style.SUCCESS("No errors"))
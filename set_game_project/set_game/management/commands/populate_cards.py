@@ -1,15 +1,16 @@
 from django.core.management.base import BaseCommand
 from set_game.models import Card
+from set_game.catalog import CARD_VALUES, invalidate_card_catalog
 
 
 class Command(BaseCommand):
     help = "Populate the database with SET game cards"
 
     def handle(self, *args, **kwargs):
-        numbers = [1, 2, 3]
-        symbols = ["diamond", "squiggle", "oval"]
-        shadings = ["solid", "striped", "open"]
-        colors = ["red", "green", "purple"]
+        numbers = CARD_VALUES["number"]
+        symbols = CARD_VALUES["symbol"]
+        shadings = CARD_VALUES["shading"]
+        colors = CARD_VALUES["color"]
 
         for number in numbers:
             for symbol in symbols:
@@ -19,6 +20,7 @@ class Command(BaseCommand):
                             number=number, symbol=symbol, shading=shading, color=color
                         )
 
+        invalidate_card_catalog()
         self.stdout.write(
             self.style.SUCCESS(
                 "Successfully populated the database with SET game cards"
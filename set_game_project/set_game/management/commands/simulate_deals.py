@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from set_game.models import DEFAULT_BOARD_SIZE, NO_CARDS_IN_SET
+
+
+class Command(BaseCommand):
+    help = "Deal random boards and report how many sets they contain (needs numpy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--boards", type=int, default=1_000_000)
+        parser.add_argument("--board-size", type=int, default=DEFAULT_BOARD_SIZE)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+            from set_game.batch import count_sets_batch, deal_boards
+        except ImportError:
+            raise CommandError(
+                "numpy is required to simulate deals: poetry install --extras batch"
+            )
+
+        num_boards = options["boards"]
+        board_size = options["board_size"]
+        if num_boards < 1 or not NO_CARDS_IN_SET <= board_size <= 81:
+            raise CommandError("Invalid --boards or --board-size")
+
+        boards = deal_boards(num_boards, board_size, options["seed"])
+        start = time.perf_counter()
+        counts = count_sets_batch(boards)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"Dealt {num_boards} boards of {board_size} cards")
+        for sets, boards_with in enumerate(np.bincount(counts)):
+            if boards_with:
+                self.stdout.write(
+                    f"  {sets:>3} sets: {boards_with / num_boards:8.4%} ({boards_with})"
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"No set on {np.count_nonzero(counts == 0) / num_boards:.4%} of boards; "
+                f"evaluated {num_boards / elapsed * 60:,.0f} boards/minute"
+            )
+        )
@@ -0,0 +1,96 @@
+import time
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from set_game.catalog import invalidate_card_catalog
+from set_game.management.scratch import scratch_database
+from set_game.models import DEFAULT_BOARD_SIZE
+from set_game.simulation import (
+    STRATEGIES,
+    board_size_distribution,
+    run_digest,
+    simulate_game,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Play seeded games to the end through the real move logic and report "
+        "throughput, board sizes and rule violations, against a scratch database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--games", type=int, default=1000)
+        parser.add_argument("--players", type=int, default=2)
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the first game"
+        )
+        parser.add_argument("--strategy", choices=STRATEGIES, default="hint")
+        parser.add_argument(
+            "--mistake-rate",
+            type=float,
+            default=0.0,
+            help="Chance that a player tries an invalid move before each set",
+        )
+        parser.add_argument(
+            "--persist", action="store_true", help="Save every move to the database"
+        )
+
+    def handle(self, *args, **options):
+        games = options["games"]
+        if games < 1 or options["players"] < 1 or not 0 <= options["mistake_rate"] <= 1:
+            raise CommandError("Invalid --games, --players or --mistake-rate")
+
+        with scratch_database():
+            call_command("populate_cards", stdout=StringIO())
+            invalidate_card_catalog()
+            start = time.perf_counter()
+            reports = [
+                simulate_game(
+                    seed,
+                    players=options["players"],
+                    strategy=options["strategy"],
+                    mistake_rate=options["mistake_rate"],
+                    persist=options["persist"],
+                )
+                for seed in range(options["seed"], options["seed"] + games)
+            ]
+            elapsed = time.perf_counter() - start
+        invalidate_card_catalog()
+
+        moves = sum(report.moves for report in reports)
+        engine_seconds = sum(report.seconds for report in reports)
+        self.stdout.write(
+            f"Played {games} games (seeds {options['seed']}..{options['seed'] + games - 1}, "
+            f"{options['players']} players, {options['strategy']} strategy) "
+            f"in {elapsed:.2f} s"
+        )
+        self.stdout.write(
+            f"  {moves} moves, {moves / engine_seconds:,.0f} moves/s in the move path"
+            f"{' incl. saves' if options['persist'] else ''}"
+        )
+        if options["mistake_rate"]:
+            rejected = sum(report.rejected for report in reports)
+            self.stdout.write(f"  {rejected} invalid moves rejected")
+
+        sizes = board_size_distribution(reports)
+        self.stdout.write("  Board size after each deal and move:")
+        for size in sorted(sizes):
+            self.stdout.write(
+                f"    {size:>2} cards: {sizes[size] / sum(sizes.values()):8.4%} "
+                f"({sizes[size]})"
+            )
+        extended = [
+            report for report in reports if report.max_board_size > DEFAULT_BOARD_SIZE
+        ]
+        self.stdout.write(
+            f"  Games that needed extra cards: {len(extended) / games:.2%}"
+        )
+        self.stdout.write(f"  Run digest: {run_digest(reports)}")
+
+        violations = [problem for report in reports for problem in report.violations]
+        for problem in violations[:20]:
+            self.stderr.write(f"  {problem}")
+        if violations:
+            raise CommandError(f"{len(violations)} rule violations")
+        self.stdout.write(self.style.SUCCESS("No rule violations"))
@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from django.db import connection
+
+
+@contextmanager
+def scratch_database(sqlite_file: bool = False) -> Iterator[Optional[str]]:
+    """Run the block against a freshly migrated throwaway default database.
+
+    Benchmarks use this so they never touch real data. The database is
+    created the way the test runner does it and destroyed afterwards. With
+    ``sqlite_file`` a SQLite database is kept in a temporary file instead of
+    memory; its path is yielded.
+    """
+    settings_dict = connection.settings_dict
+    saved_test = dict(settings_dict["TEST"])
+    scratch_dir = None
+    path = None
+    if sqlite_file:
+        scratch_dir = tempfile.mkdtemp(prefix="set_game_bench_")
+        path = os.path.join(scratch_dir, "bench.sqlite3")
+        settings_dict["TEST"]["NAME"] = path
+
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield path
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        settings_dict["TEST"] = saved_test
+        if scratch_dir is not None:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
@@ -0,0 +1,170 @@
+"""Matchmaking queue that seats players in open lobbies.
+
+Every free seat of a waiting lobby is one queue entry holding the lobby id,
+kept in a separate queue per lobby size. Seating a player pops one entry, and
+a new lobby pushes one entry per seat left after its creator. Both are O(1)
+however many lobbies exist. Entries for lobbies that were deleted or have
+started are dropped when popped.
+
+Seats live in process memory by default; ``MATCHMAKING_BACKEND = "redis"``
+keeps them in Redis so every worker shares one queue. Either way the queue is
+seeded from the database the first time it is used.
+"""
+
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from threading import Lock
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from .models import Lobby, LobbyPlayer
+
+
+class MatchmakingQueue(ABC):
+    """Interface for the free-seat queue of each lobby size."""
+
+    @abstractmethod
+    def pop_seat(self, max_players: int) -> Optional[int]:
+        """Take the oldest free seat, returning its lobby id, or None."""
+
+    @abstractmethod
+    def push_seats(self, lobby_id: int, max_players: int, seats: int) -> None:
+        """Offer ``seats`` free seats of a lobby to later players."""
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    @abstractmethod
+    def seed(self, open_seats: Iterable[Tuple[int, int, int]]) -> None:
+        """Push (lobby_id, max_players, seats) rows unless already seeded."""
+
+
+class InMemoryMatchmakingQueue(MatchmakingQueue):
+    def __init__(self) -> None:
+        self._seats: Dict[int, Deque[int]] = defaultdict(deque)
+        self._lock = Lock()
+        self.seeded = False
+
+    def pop_seat(self, max_players: int) -> Optional[int]:
+        with self._lock:
+            seats = self._seats[max_players]
+            return seats.popleft() if seats else None
+
+    def push_seats(self, lobby_id: int, max_players: int, seats: int) -> None:
+        with self._lock:
+            self._seats[max_players].extend([lobby_id] * seats)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._seats.clear()
+            self.seeded = False
+
+    def seed(self, open_seats: Iterable[Tuple[int, int, int]]) -> None:
+        with self._lock:
+            if self.seeded:
+                return
+            self.seeded = True
+            for lobby_id, max_players, seats in open_seats:
+                self._seats[max_players].extend([lobby_id] * seats)
+
+
+class RedisMatchmakingQueue(MatchmakingQueue):
+    KEY_PREFIX = "set_game:matchmaking"
+
+    def __init__(self, host: str, port: int) -> None:
+        import redis
+
+        self.redis = redis.Redis(host=host, port=port)
+        self.seeded = False
+
+    def _key(self, max_players: int) -> str:
+        return f"{self.KEY_PREFIX}:seats:{max_players}"
+
+    def pop_seat(self, max_players: int) -> Optional[int]:
+        lobby_id: Any = self.redis.lpop(self._key(max_players))
+        return int(lobby_id) if lobby_id is not None else None
+
+    def push_seats(self, lobby_id: int, max_players: int, seats: int) -> None:
+        if seats > 0:
+            self.redis.rpush(self._key(max_players), *([lobby_id] * seats))
+
+    def clear(self) -> None:
+        keys = list(self.redis.scan_iter(f"{self.KEY_PREFIX}:*"))
+        if keys:
+            self.redis.delete(*keys)
+        self.seeded = False
+
+    def seed(self, open_seats: Iterable[Tuple[int, int, int]]) -> None:
+        if self.seeded:
+            return
+        self.seeded = True
+        # Only the first worker to start seeds the shared queue.
+        if self.redis.set(f"{self.KEY_PREFIX}:seeded", 1, nx=True):
+            for lobby_id, max_players, seats in open_seats:
+                self.push_seats(lobby_id, max_players, seats)
+
+
+_queue: Optional[MatchmakingQueue] = None
+_queue_lock = Lock()
+
+
+def get_matchmaking_queue() -> MatchmakingQueue:
+    """Return the process-wide queue for settings.MATCHMAKING_BACKEND."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if settings.MATCHMAKING_BACKEND == "redis":
+                _queue = RedisMatchmakingQueue(settings.REDIS_HOST, settings.REDIS_PORT)
+            else:
+                _queue = InMemoryMatchmakingQueue()
+        return _queue
+
+
+def open_lobby_seats() -> Any:
+    """(lobby_id, max_players, free seats) for every lobby still waiting."""
+    return (
+        Lobby.objects.filter(game_state__isnull=True)
+        .annotate(seats=F("max_players") - Count("lobbyplayer"))
+        .filter(seats__gt=0)
+        .order_by("id")
+        .values_list("id", "max_players", "seats")
+    )
+
+
+def join_lobby(user: User, max_players: Optional[int] = None) -> Tuple[Lobby, bool]:
+    """Seat a player in the oldest open lobby of the given size.
+
+    Creates a new lobby when none has a free seat. Returns the lobby and
+    whether the player joined an existing one.
+    """
+    max_players = max_players or settings.MAX_PLAYERS
+    queue = get_matchmaking_queue()
+    queue.seed(open_lobby_seats())
+
+    while (lobby_id := queue.pop_seat(max_players)) is not None:
+        try:
+            with transaction.atomic():
+                lobby = (
+                    Lobby.objects.select_for_update(of=("self",))
+                    .filter(id=lobby_id, game_state__isnull=True)
+                    .first()
+                )
+                if lobby is None:
+                    continue  # deleted or started since the seat was queued
+                LobbyPlayer.objects.create(lobby=lobby, player=user)
+                lobby.save(update_fields=["last_activity"])
+                return lobby, True
+        except IntegrityError:
+            # Already seated here by a concurrent request; keep the seat open.
+            queue.push_seats(lobby_id, max_players, 1)
+            return Lobby.objects.get(id=lobby_id), False
+
+    with transaction.atomic():
+        lobby = Lobby.objects.create(max_players=max_players)
+        LobbyPlayer.objects.create(lobby=lobby, player=user)
+    # Views run in autocommit, so the lobby is visible to other requests by
+    # the time its seats are offered.
+    queue.push_seats(lobby.id, max_players, max_players - 1)
+    return lobby, False
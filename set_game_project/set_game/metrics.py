@@ -0,0 +1,287 @@
+"""Process-local metrics, served in the Prometheus text format on /metrics.
+
+Collection is switched on by ``METRICS_ENABLED``. When it is off every
+instrument returns at once (``Histogram.time()`` hands back one shared no-op
+context manager), so instrumentation can stay on the hot paths. Values live in
+the worker process that recorded them; scrape each worker separately.
+"""
+
+import math
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+from typing import Sequence, Tuple
+from django.conf import settings
+from .db import track_queries
+
+LabelValues = Tuple[str, ...]
+
+# Prometheus' default buckets, extended down to half a millisecond.
+TIME_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+_NO_OP: ContextManager[None] = nullcontext()
+
+
+def enabled() -> bool:
+    return settings.METRICS_ENABLED
+
+
+class Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+        registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    @abstractmethod
+    def samples(self) -> List[str]: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        if not enabled():
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_number(v)}" for key, v in values]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    """A value that goes up and down, or is read from ``function`` on scrape."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, help, labelnames)
+        self.function = function
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            return [f"{self.name} {_number(self.function())}"]
+        return super().samples()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = TIME_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: a count per bucket (the last one is +Inf) and the sum.
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not enabled():
+            return
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            total[0] += value
+
+    def time(self, **labels: Any) -> ContextManager[Any]:
+        """Context manager observing the seconds its block takes."""
+        if not enabled():
+            return _NO_OP
+        return _Timer(self, labels)
+
+    def count(self, **labels: Any) -> int:
+        counts, _ = self._values.get(self._key(labels), ([0], [0.0]))
+        return sum(counts)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(
+                (key, list(counts), total[0])
+                for key, (counts, total) in self._values.items()
+            )
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _number(bound)
+                labels = self._labels(key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+registry: List[Metric] = []
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in registry for line in metric.render()) + "\n"
+
+
+def clear() -> None:
+    """Reset every recorded value."""
+    for metric in registry:
+        metric.clear()
+
+
+@contextmanager
+def measure_message(message_type: str) -> Iterator[None]:
+    """Time one socket message and count the queries made handling it."""
+    start = time.perf_counter()
+    with track_queries() as queries:
+        try:
+            yield
+        finally:
+            message_seconds.observe(time.perf_counter() - start, type=message_type)
+            message_queries.observe(queries.count, type=message_type)
+
+
+message_seconds = Histogram(
+    "set_game_message_seconds",
+    "Time GameConsumer.receive spends on a message, by message type",
+    ["type"],
+)
+message_queries = Histogram(
+    "set_game_message_queries",
+    "Database queries made handling a socket message, by message type",
+    ["type"],
+    buckets=QUERY_BUCKETS,
+)
+move_lock_wait_seconds = Histogram(
+    "set_game_move_lock_wait_seconds",
+    "Wait for a game's lock before applying a move (path: database or actor)",
+    ["path"],
+)
+move_transaction_seconds = Histogram(
+    "set_game_move_transaction_seconds",
+    "Time a move holds the game's lock: the transaction, or the in-memory update",
+    ["path"],
+)
+group_send_seconds = Histogram(
+    "set_game_group_send_seconds",
+    "Latency of channel layer group_send, by message type",
+    ["type"],
+)
+websocket_connections = Gauge(
+    "set_game_websocket_connections",
+    "Open WebSocket connections, by consumer",
+    ["consumer"],
+)
+lobby_status_requests = Counter(
+    "set_game_lobby_status_requests_total",
+    "lobby_status requests, by response status",
+    ["status"],
+)
+executor_wait_seconds = Histogram(
+    "set_game_executor_wait_seconds",
+    "Time a game database call waits for its game and a thread before running",
+)
+executor_rejections = Counter(
+    "set_game_executor_rejections_total",
+    "Game database calls refused because the executor was saturated",
+)
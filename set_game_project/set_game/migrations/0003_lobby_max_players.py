@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:25
+
+import set_game.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("set_game", "0002_gamesession_last_activity_lobby_last_activity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lobby",
+            name="max_players",
+            field=models.PositiveSmallIntegerField(
+                default=set_game.models.default_max_players
+            ),
+        ),
+    ]
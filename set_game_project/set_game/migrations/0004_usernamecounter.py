@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("set_game", "0003_lobby_max_players"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UsernameCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("base_username", models.CharField(max_length=150, unique=True)),
+                ("last_discriminator", models.IntegerField(default=-1)),
+            ],
+        ),
+    ]
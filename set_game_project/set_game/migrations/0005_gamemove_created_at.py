@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("set_game", "0004_usernamecounter"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="gamemove",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
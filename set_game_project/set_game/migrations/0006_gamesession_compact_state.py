@@ -0,0 +1,51 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:05
+
+from django.db import migrations
+import set_game.state_codec
+
+
+def copy_state(apps, schema_editor, source, target):
+    GameSession = apps.get_model("set_game", "GameSession")
+    sessions = list(GameSession.objects.only("id", source))
+    for session in sessions:
+        setattr(session, target, getattr(session, source))
+    GameSession.objects.bulk_update(sessions, [target], batch_size=500)
+
+
+def state_to_blob(apps, schema_editor):
+    copy_state(apps, schema_editor, "state", "state_blob")
+
+
+def blob_to_state(apps, schema_editor):
+    copy_state(apps, schema_editor, "state_blob", "state")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("set_game", "0005_gamemove_created_at"),
+    ]
+
+    # JSON columns cannot be altered to binary in place on every backend, so
+    # the state is copied into a new column that then takes the old name.
+    operations = [
+        migrations.AddField(
+            model_name="gamesession",
+            name="state_blob",
+            field=set_game.state_codec.CompactStateField(null=True),
+        ),
+        migrations.RunPython(state_to_blob, blob_to_state),
+        migrations.RemoveField(
+            model_name="gamesession",
+            name="state",
+        ),
+        migrations.RenameField(
+            model_name="gamesession",
+            old_name="state_blob",
+            new_name="state",
+        ),
+        migrations.AlterField(
+            model_name="gamesession",
+            name="state",
+            field=set_game.state_codec.CompactStateField(default=dict),
+        ),
+    ]
@@ -1,13 +1,18 @@
-from typing import List, Tuple, Optional, ClassVar
-from django.db import models
+from functools import partial
+from typing import Any, Dict, List, Sequence, Tuple, Optional, ClassVar, Union
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from random import shuffle
+from random import Random, getrandbits
 import hashlib
-from itertools import combinations
 from django.utils import timezone
+from .catalog import CatalogCard, get_card_catalog
+from .move_log import move_log
+from .set_engine import SetIndex, find_any_set, is_set_codes
+from .state_codec import CompactStateField
 
-MAX_PLAYERS = 2
 NO_CARDS_IN_SET = 3
 DEFAULT_BOARD_SIZE = 12
 
@@ -27,12 +32,36 @@ class Card(models.Model):
         ordering = ["number", "symbol", "shading", "color"]
 
 
+DeckCard = Union[Card, CatalogCard]
+
+
+def card_id_value(card_id: Any) -> Optional[int]:
+    """The card id a client sent, as an int, or None if it is malformed.
+
+    Ints and their decimal strings (older boards store string ids) are
+    accepted; bools, floats and anything else are not, so one card cannot
+    be submitted under several spellings.
+    """
+    if isinstance(card_id, bool):
+        return None
+    if isinstance(card_id, int):
+        return card_id
+    if isinstance(card_id, str) and card_id.isdigit() and str(int(card_id)) == card_id:
+        return int(card_id)
+    return None
+
+
 class GameSession(models.Model):
     name = models.CharField(max_length=100)
     players = models.ManyToManyField(User, related_name="game_sessions")
     created_at = models.DateTimeField(auto_now_add=True)
     last_activity = models.DateTimeField(auto_now=True)
-    state = models.JSONField(default=dict)
+    state = CompactStateField(default=dict)
+
+    # Sets on the current board (see board_sets()). Not saved; rebuilt when
+    # the board is replaced rather than changed by the methods below.
+    _set_index: Optional[SetIndex] = None
+    _set_index_board: Optional[Dict[str, Any]] = None
 
     def __str__(self) -> str:
         return self.name
@@ -48,29 +77,43 @@ class GameSession(models.Model):
             :8
         ]  # Use first 8 characters for readability
 
-    def initialize_game(self) -> None:
-        deck = list(Card.objects.all())
-        shuffle(deck)
+    def initialize_game(self, seed: Optional[int] = None) -> None:
+        self.reset_state(
+            [str(player.username) for player in self.players.all()], seed=seed
+        )
+        self.save()
+
+    def reset_state(self, usernames: Sequence[str], seed: Optional[int] = None) -> None:
+        """Deal a fresh game for the given players without saving it.
+
+        The deck is shuffled from ``seed`` (a random 32-bit one by default),
+        which is kept in the state so the deal can be reproduced.
+        """
+        if seed is None:
+            seed = getrandbits(32)
+        # Card.Meta.ordering does not depend on ids, so a seed deals the same
+        # cards in any database.
+        deck = get_card_catalog().all()
+        Random(seed).shuffle(deck)
         initial_board_cards, remaining_deck = self._get_initial_board_and_deck(deck)
-        scores = {str(player.username): 0 for player in self.players.all()}
 
         self.state = {
+            "version": self.state_version + 1,
+            "seed": seed,
             "deck": [card.id for card in remaining_deck],
             "board": {str(i): card.id for i, card in enumerate(initial_board_cards)},
-            "selected_sets": [],
-            "scores": scores,
+            "scores": {username: 0 for username in usernames},
         }
-        self.save()
 
     def _get_initial_board_and_deck(
-        self, deck: List[Card]
-    ) -> Tuple[List[Card], List[Card]]:
-        initial_board_cards = deck[:12]
-        has_set = self.is_set_available([card.id for card in initial_board_cards])
-        if has_set:
-            initial_no_cards = 12
-        else:
-            initial_no_cards = 15
+        self, deck: Sequence[DeckCard]
+    ) -> Tuple[Sequence[DeckCard], Sequence[DeckCard]]:
+        # Deal three more cards until there is a set, as at the table.
+        initial_no_cards = DEFAULT_BOARD_SIZE
+        while initial_no_cards < len(deck) and not self.is_set_available(
+            [card.id for card in deck[:initial_no_cards]]
+        ):
+            initial_no_cards += NO_CARDS_IN_SET
         initial_board_cards = deck[:initial_no_cards]
         remaining_deck = deck[initial_no_cards:]
         return initial_board_cards, remaining_deck
@@ -79,63 +122,127 @@ class GameSession(models.Model):
         self, player: User, selected_cards: List[int]
     ) -> None:
         self.refresh_from_db()
-
-        if not self.validate_set(selected_cards):
+        self.apply_move(str(player.username), selected_cards)
+        self.save_state()
+        transaction.on_commit(
+            partial(move_log.record, self.id, str(player.username), selected_cards)
+        )
+
+    def apply_move(self, username: str, card_ids: List[Any]) -> Dict[str, Any]:
+        """Validate a move and apply all of its changes to state, unsaved.
+
+        Raises ValidationError if the cards are not on the board or are not
+        a set. Callers persist the result once with save_state(). Returns the
+        delta from the previous state version (see state_delta()).
+        """
+        board_card_ids = list(self.state["board"].values())
+        if not all(card_id in board_card_ids for card_id in card_ids):
+            raise ValidationError("Cards not on board")
+        if not self.validate_set(card_ids):
             raise ValidationError("Invalid set selection")
+        board_before = dict(self.state["board"])
+        scores_before = dict(self.state["scores"])
+        self.apply_set(username, card_ids)
+        return self.state_delta(board_before, scores_before)
+
+    @property
+    def state_version(self) -> int:
+        """Counter bumped on every change to the board or scores."""
+        return int(self.state.get("version", 0))
+
+    def state_delta(
+        self, board_before: Dict[str, Any], scores_before: Dict[str, int]
+    ) -> Dict[str, Any]:
+        """Describe how the board and scores changed since the given copies."""
+        board = self.state["board"]
+        return {
+            "version": self.state_version,
+            "board": {
+                pos: card_id
+                for pos, card_id in board.items()
+                if board_before.get(pos) != card_id
+            },
+            "removed": [pos for pos in board_before if pos not in board],
+            "scores": {
+                username: score
+                for username, score in self.state["scores"].items()
+                if scores_before.get(username) != score
+            },
+            "game_over": self.state.get("game_over", False),
+        }
 
-        self.process_set(player, selected_cards)
-        self.save()
+    def save_state(self) -> None:
+        """Write state and last_activity in a single UPDATE."""
+        self.save(update_fields=["state", "last_activity"])
 
-    def validate_set(self, selected_cards: List[int]) -> bool:
+    def validate_set(self, selected_cards: Sequence[Any]) -> bool:
         if len(selected_cards) != NO_CARDS_IN_SET:
             return False
-        # if "selected_sets" not in self.state:
-        #     return False
-        cards = Card.objects.filter(id__in=[str(card_id) for card_id in selected_cards])
-        return self._check_set_attributes(cards)
-
-    def _check_set_attributes(self, cards: models.QuerySet) -> bool:
-        card_list = list(cards.values("number", "symbol", "shading", "color"))
-        for attribute in ["number", "symbol", "shading", "color"]:
-            if len(set([card[attribute] for card in card_list])) not in [
-                1,
-                NO_CARDS_IN_SET,
-            ]:
-                return False
-        return True
+        card_ids = [card_id_value(card_id) for card_id in selected_cards]
+        if None in card_ids or len(set(card_ids)) != NO_CARDS_IN_SET:
+            return False
+        catalog = get_card_catalog()
+        first, second, third = (catalog.code(card_id) for card_id in card_ids)
+        if first is None or second is None or third is None:
+            return False
+        return is_set_codes(first, second, third)
 
     def process_set(self, player: User, card_ids: List[int]) -> None:
-        self.state["selected_sets"].append(card_ids)
-        self.state["scores"][str(player.username)] += 1
+        self.apply_set(str(player.username), card_ids)
+        self.save_state()
+        transaction.on_commit(
+            partial(move_log.record, self.id, str(player.username), card_ids)
+        )
+
+    def apply_set(self, username: str, card_ids: List[int]) -> None:
+        """Score a validated set and refill the board, without saving."""
+        self.state["version"] = self.state_version + 1
+        # Moves are recorded in GameMove (see move_log); drop the list that
+        # older states still carry.
+        self.state.pop("selected_sets", None)
+        self.state["scores"][username] += 1
 
         self._remove_cards_from_board(card_ids)
         self.add_cards_to_board()
         self.handle_no_set_available()
         self._check_game_end()
-        self.save()
+
+    def board_sets(self) -> SetIndex:
+        """Index of every set on the board, kept in step with moves."""
+        board = self.state["board"]
+        if self._set_index is None or self._set_index_board is not board:
+            self._set_index = SetIndex(board.values())
+            self._set_index_board = board
+        return self._set_index
+
+    def hint(self) -> Optional[Tuple[Any, Any, Any]]:
+        """Return one set on the board as card ids, or None."""
+        return self.board_sets().any_set()
 
     def _remove_cards_from_board(self, card_ids: List[int]) -> None:
-        self.state["board"] = {
-            pos: card_id
-            for pos, card_id in self.state["board"].items()
-            if card_id not in card_ids
-        }
+        index = self.board_sets()
+        board = {}
+        for pos, card_id in self.state["board"].items():
+            if card_id in card_ids:
+                index.remove(card_id)
+            else:
+                board[pos] = card_id
+        self.state["board"] = self._set_index_board = board
 
     def _check_game_end(self) -> None:
         if not self.state["deck"] and not self.is_set_available():
             self.end_game()
 
     def add_cards_to_board(self) -> None:
-        if len(self.state["board"]) >= 12:
-            empty_positions = sorted(
-                list(set(str(i) for i in range(12)) - set(self.state["board"].keys())),
-                key=int,
+        board = self.state["board"]
+        if len(board) >= 12:
+            # Close the gaps: move cards past the end of the board into them.
+            empty_positions = [str(i) for i in range(len(board)) if str(i) not in board]
+            extra_positions = sorted(
+                (pos for pos in board if int(pos) >= len(board)), key=int
             )
-            extra_positions = sorted(self.state["board"].keys(), key=int)[
-                -len(empty_positions) :
-            ]
             for empty_pos, extra_pos in zip(empty_positions, extra_positions):
-                self.state["board"][empty_pos] = self.state["board"].pop(extra_pos)
+                board[empty_pos] = board.pop(extra_pos)
         else:
             empty_positions_set = set(str(i) for i in range(12)).difference(
                 set(self.state["board"].keys())
@@ -144,24 +251,21 @@ class GameSession(models.Model):
             self.add_cards_from_deck(NO_CARDS_IN_SET, empty_positions)
 
     def add_cards_from_deck(self, count: int, empty_positions: List[str]) -> None:
+        index = self.board_sets()
         new_cards = self.state["deck"][:count]
         self.state["deck"] = self.state["deck"][count:]
         for pos, card_id in zip(empty_positions, new_cards):
             self.state["board"][pos] = card_id
+            index.add(card_id)
 
-    def is_set_available(self, card_ids: Optional[List[int]] = None) -> bool:
+    def is_set_available(self, card_ids: Optional[Sequence[Any]] = None) -> bool:
+        """Whether the given cards, or else the board, contain a set."""
         if card_ids is None:
-            card_ids = list(self.state["board"].values())
-
-        if len(card_ids) < NO_CARDS_IN_SET:
-            return False
-        for combo in combinations(card_ids, NO_CARDS_IN_SET):
-            if self.validate_set(list(combo)):
-                return True
-        return False
+            return len(self.board_sets()) > 0
+        return find_any_set(card_ids) is not None
 
     def handle_no_set_available(self) -> None:
-        if not self.is_set_available():
+        while not self.is_set_available():
             if self.state["deck"]:
                 next_positions = [
                     str(i)
@@ -173,7 +277,7 @@ class GameSession(models.Model):
                 self.add_cards_from_deck(NO_CARDS_IN_SET, next_positions)
             else:
                 self.end_game()
-                self.save()
+                return
 
     def end_game(self) -> None:
         self.state["game_over"] = True
@@ -188,23 +292,36 @@ class GameMove(models.Model):
     session = models.ForeignKey(GameSession, on_delete=models.CASCADE)
     player = models.ForeignKey(User, on_delete=models.CASCADE)
     cards = models.ManyToManyField(Card, related_name="moves")
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set by the move log to when the move was accepted, not when it is saved.
+    created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self) -> str:
         return f"Move by {self.player} in {self.session}"
 
 
+def default_max_players() -> int:
+    return settings.MAX_PLAYERS
+
+
 class Lobby(models.Model):
     players: ClassVar[models.ManyToManyField] = models.ManyToManyField(
         User, through="LobbyPlayer"
     )
+    max_players = models.PositiveSmallIntegerField(default=default_max_players)
     created_at = models.DateTimeField(auto_now_add=True)
     last_activity = models.DateTimeField(auto_now=True)
 
     def is_full(self) -> bool:
-        return self.players.count() == MAX_PLAYERS
+        player_count = getattr(self, "player_count", None)
+        if player_count is None:
+            player_count = self.players.count()
+        return player_count >= self.max_players
 
     def all_ready(self) -> bool:
+        # Lobbies from lobby_status_queryset() carry both counts already.
+        ready_count = getattr(self, "ready_count", None)
+        if ready_count is not None:
+            return ready_count == getattr(self, "player_count")
         return all(lobby_player.ready for lobby_player in self.lobbyplayer_set.all())
 
     def __str__(self) -> str:
@@ -240,3 +357,49 @@ class GameState(models.Model):
     )
     state_data = models.JSONField(default=dict)
     created_at = models.DateTimeField(auto_now_add=True)
+
+
+class UsernameCounter(models.Model):
+    """Last discriminator handed out for a base username (``base#0042``)."""
+
+    base_username = models.CharField(max_length=150, unique=True)
+    last_discriminator = models.IntegerField(default=-1)
+
+    def __str__(self) -> str:
+        return f"{self.base_username}#{self.last_discriminator:04d}"
+
+    @classmethod
+    def next_discriminator(cls, base_username: str) -> int:
+        """Atomically reserve the next discriminator for a base username.
+
+        The counter row is locked by the increment until the transaction
+        commits, so concurrent callers always get distinct numbers.
+        """
+        with transaction.atomic():
+            counter = cls.objects.filter(base_username=base_username)
+            if not counter.update(last_discriminator=F("last_discriminator") + 1):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(
+                            base_username=base_username,
+                            last_discriminator=highest_discriminator(base_username) + 1,
+                        )
+                except IntegrityError:
+                    # Another request created the counter first.
+                    counter.update(last_discriminator=F("last_discriminator") + 1)
+            return counter.values_list("last_discriminator", flat=True).get()
+
+
+def highest_discriminator(base_username: str) -> int:
+    """Largest ``base#NNNN`` suffix already taken, or -1 if there is none.
+
+    Scans the matching users, so it is only used to start a new counter.
+    """
+    prefix = f"{base_username}#"
+    suffixes = (
+        username[len(prefix) :]
+        for username in User.objects.filter(username__startswith=prefix).values_list(
+            "username", flat=True
+        )
+    )
+    return max((int(suffix) for suffix in suffixes if suffix.isdigit()), default=-1)
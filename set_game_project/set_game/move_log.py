@@ -0,0 +1,171 @@
+"""Move history written to GameMove in the background.
+
+Accepted moves are handed to ``move_log.record()``, which only timestamps them
+and puts them on a queue. A daemon thread drains the queue and inserts the
+moves in batches of up to ``MOVE_LOG_BATCH_SIZE``, at most
+``MOVE_LOG_FLUSH_INTERVAL`` seconds after the oldest one was recorded, so the
+move path never waits on these writes.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MoveRecord(NamedTuple):
+    session_id: int
+    username: str
+    card_ids: List[int]
+    created_at: datetime
+
+
+class MoveLogWriter:
+    """Queue of accepted moves and the thread that persists them."""
+
+    def __init__(self, background: bool = True) -> None:
+        # With background=False nothing is written until flush() is called,
+        # which tests use to write from their own thread and transaction.
+        self.background = background
+        self._queue: "queue.Queue[Any]" = queue.Queue(
+            maxsize=settings.MOVE_LOG_MAX_PENDING
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    def record(self, session_id: int, username: str, card_ids: Sequence[Any]) -> None:
+        """Queue an accepted move; never blocks the caller."""
+        move = MoveRecord(
+            session_id, username, [int(card_id) for card_id in card_ids], timezone.now()
+        )
+        try:
+            self._queue.put_nowait(move)
+        except queue.Full:
+            logger.warning("Move log full; dropped a move in session %s", session_id)
+            return
+        if self.background:
+            self._ensure_thread()
+
+    def flush(self) -> None:
+        """Persist every move queued so far before returning."""
+        if self.background and self._thread is not None:
+            self._queue.join()
+            return
+        batch = self._drain()
+        if batch:
+            self.write(batch)
+
+    def clear(self) -> None:
+        """Discard queued moves without writing them."""
+        self._drain()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write what is queued and stop the background thread."""
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _drain(self) -> List[MoveRecord]:
+        batch: List[MoveRecord] = []
+        while True:
+            try:
+                move = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            self._queue.task_done()
+            if move is not _STOP:
+                batch.append(move)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="move-log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + settings.MOVE_LOG_FLUSH_INTERVAL
+            while len(batch) < settings.MOVE_LOG_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stopping = _STOP in batch
+            moves = [move for move in batch if move is not _STOP]
+            try:
+                if moves:
+                    close_old_connections()
+                    self.write(moves)
+            except Exception:
+                logger.exception("Failed to write %d moves to the move log", len(moves))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        close_old_connections()
+
+    def write(self, moves: Sequence[MoveRecord]) -> None:
+        """Insert a batch of moves and their cards in four queries."""
+        GameMove = apps.get_model("set_game", "GameMove")
+        GameSession = apps.get_model("set_game", "GameSession")
+        user_ids = dict(
+            User.objects.filter(
+                username__in={move.username for move in moves}
+            ).values_list("username", "id")
+        )
+        # Games may have been deleted since their moves were queued.
+        session_ids = set(
+            GameSession.objects.filter(
+                id__in={move.session_id for move in moves}
+            ).values_list("id", flat=True)
+        )
+        rows = []
+        card_ids = []
+        for move in moves:
+            player_id = user_ids.get(move.username)
+            if player_id is None or move.session_id not in session_ids:
+                continue
+            rows.append(
+                GameMove(
+                    session_id=move.session_id,
+                    player_id=player_id,
+                    created_at=move.created_at,
+                )
+            )
+            card_ids.append(move.card_ids)
+
+        Through = GameMove.cards.through
+        with transaction.atomic():
+            GameMove.objects.bulk_create(rows)
+            Through.objects.bulk_create(
+                Through(gamemove_id=row.pk, card_id=card_id)
+                for row, cards in zip(rows, card_ids)
+                for card_id in cards
+            )
+
+
+move_log = MoveLogWriter()
+atexit.register(move_log.stop)
@@ -0,0 +1,87 @@
+"""Per-view and per-handler SQL query budgets.
+
+Views and GameConsumer handlers declare the most queries they may make with
+``@query_budget(n)``. What happens when one goes over depends on
+``QUERY_BUDGET_MODE``:
+
+    off    queries are not counted (the default)
+    log    a warning lists each query and the project frames that made it
+    raise  QueryBudgetExceeded is raised, failing the request or test
+
+Views are checked by QueryBudgetMiddleware; consumer handlers by the
+decorator itself, with queries made through sync_to_async or the game executor
+counted as well.
+"""
+
+import asyncio
+import functools
+import logging
+from typing import Any, Callable, TypeVar, cast
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from .db import QueryRecorder, track_queries
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def check_budget(name: str, limit: int, recorder: QueryRecorder) -> None:
+    """Raise or log, per QUERY_BUDGET_MODE, if ``recorder`` is over ``limit``."""
+    if recorder.count <= limit:
+        return
+    message = f"{name} made {recorder.count} queries, over its budget of {limit}"
+    queries = []
+    for number, (sql, stack) in enumerate(recorder.queries, 1):
+        queries.append(f"{number}. {sql}")
+        queries += [f"       {frame}" for frame in stack]
+    details = "\n".join(queries)
+    if settings.QUERY_BUDGET_MODE == "raise":
+        raise QueryBudgetExceeded(f"{message}:\n{details}")
+    logger.warning("%s:\n%s", message, details)
+
+
+def query_budget(limit: int) -> Callable[[F], F]:
+    """Declare the most queries a view or consumer handler may make."""
+
+    def decorator(func: F) -> F:
+        setattr(func, "query_budget", limit)
+        if not asyncio.iscoroutinefunction(func):
+            return func  # views are checked by QueryBudgetMiddleware
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            mode = settings.QUERY_BUDGET_MODE
+            if mode == "off":
+                return await func(*args, **kwargs)
+            with track_queries(details=True, stacks=mode == "log") as recorder:
+                result = await func(*args, **kwargs)
+            check_budget(func.__qualname__, limit, recorder)
+            return result
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    """Hold each view with a @query_budget to it."""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        mode = settings.QUERY_BUDGET_MODE
+        if mode == "off":
+            return self.get_response(request)
+        with track_queries(details=True, stacks=mode == "log") as recorder:
+            response = self.get_response(request)
+        match = request.resolver_match
+        limit = getattr(match.func, "query_budget", None) if match else None
+        if match is not None and limit is not None:
+            check_budget(match.view_name, limit, recorder)
+        return response
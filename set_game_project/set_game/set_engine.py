@@ -0,0 +1,159 @@
+"""Set detection over base-3 card codes.
+
+Every card is a 4-digit base-3 code (see ``catalog.encode_card``). For any two
+cards exactly one third card completes a set: in each attribute its digit is
+``(-a - b) % 3``. Looking that card up in a hash of the board turns the
+C(n, 3) triple scan into an O(n²) pair scan.
+"""
+
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+from .catalog import CARD_ATTRIBUTES, NO_CARD_CODES, CardCatalog, get_card_catalog
+
+CardTriple = Tuple[Any, Any, Any]
+
+
+def _third_code(first: int, second: int) -> int:
+    code = 0
+    for place in reversed(range(len(CARD_ATTRIBUTES))):
+        weight = 3**place
+        digit = (-(first // weight % 3) - (second // weight % 3)) % 3
+        code += digit * weight
+    return code
+
+
+# THIRD_CARD[a][b] is the code of the card that completes a set with a and b.
+THIRD_CARD: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(_third_code(first, second) for second in range(NO_CARD_CODES))
+    for first in range(NO_CARD_CODES)
+)
+
+
+def is_set_codes(first: int, second: int, third: int) -> bool:
+    """Return True if three card codes form a set."""
+    return THIRD_CARD[first][second] == third
+
+
+def _board_codes(
+    card_ids: Sequence[Any], catalog: Optional[CardCatalog]
+) -> Tuple[List[Tuple[Any, int]], Dict[int, int]]:
+    """Resolve board ids to codes, skipping cards unknown to the catalog.
+
+    Returns the (card_id, code) pairs in board order and a code -> index map.
+    """
+    catalog = catalog or get_card_catalog()
+    board: List[Tuple[Any, int]] = []
+    index_by_code: Dict[int, int] = {}
+    for card_id in card_ids:
+        code = catalog.code(card_id)
+        if code is None or code in index_by_code:
+            continue
+        index_by_code[code] = len(board)
+        board.append((card_id, code))
+    return board, index_by_code
+
+
+def _iter_sets(
+    card_ids: Sequence[Any], catalog: Optional[CardCatalog]
+) -> Iterator[CardTriple]:
+    board, index_by_code = _board_codes(card_ids, catalog)
+    for i, (first_id, first) in enumerate(board):
+        for j in range(i + 1, len(board)):
+            second_id, second = board[j]
+            k = index_by_code.get(THIRD_CARD[first][second])
+            # Only report each set once, from its two lowest positions.
+            if k is not None and k > j:
+                yield first_id, second_id, board[k][0]
+
+
+def find_any_set(
+    card_ids: Sequence[Any], catalog: Optional[CardCatalog] = None
+) -> Optional[CardTriple]:
+    """Return one set on the board as a triple of card ids, or None."""
+    return next(_iter_sets(card_ids, catalog), None)
+
+
+def find_all_sets(
+    card_ids: Sequence[Any], catalog: Optional[CardCatalog] = None
+) -> List[CardTriple]:
+    """Return every set on the board, each as a triple of card ids."""
+    return list(_iter_sets(card_ids, catalog))
+
+
+def count_sets(card_ids: Sequence[Any], catalog: Optional[CardCatalog] = None) -> int:
+    """Return the number of distinct sets on the board."""
+    return sum(1 for _ in _iter_sets(card_ids, catalog))
+
+
+class SetIndex:
+    """Every set among the cards on a board, kept current as cards come and go.
+
+    Adding a card pairs it with each indexed card and looks up the third card
+    of each pair, so it costs O(n); removing a card drops only the sets that
+    held it. Counting sets and picking one are then O(1). Cards unknown to the
+    catalog are ignored, as by find_all_sets().
+    """
+
+    def __init__(
+        self, card_ids: Iterable[Any] = (), catalog: Optional[CardCatalog] = None
+    ) -> None:
+        self.catalog = catalog or get_card_catalog()
+        self._ids_by_code: Dict[int, Any] = {}
+        # Insertion ordered, so hints are stable between calls.
+        self._sets: Dict[FrozenSet[int], None] = {}
+        self._sets_by_code: Dict[int, Set[FrozenSet[int]]] = {}
+        for card_id in card_ids:
+            self.add(card_id)
+
+    def __len__(self) -> int:
+        return len(self._sets)
+
+    def add(self, card_id: Any) -> None:
+        code = self.catalog.code(card_id)
+        if code is None or code in self._ids_by_code:
+            return
+        third_cards = THIRD_CARD[code]
+        self._sets_by_code[code] = set()
+        for other in self._ids_by_code:
+            third = third_cards[other]
+            # Each set is seen from both of its other cards; keep one.
+            if third > other and third in self._ids_by_code:
+                card_set = frozenset((code, other, third))
+                self._sets[card_set] = None
+                for member in card_set:
+                    self._sets_by_code[member].add(card_set)
+        self._ids_by_code[code] = card_id
+
+    def remove(self, card_id: Any) -> None:
+        code = self.catalog.code(card_id)
+        if code is None or code not in self._ids_by_code:
+            return
+        del self._ids_by_code[code]
+        for card_set in self._sets_by_code.pop(code):
+            del self._sets[card_set]
+            for member in card_set:
+                if member != code:
+                    self._sets_by_code[member].discard(card_set)
+
+    def _triple(self, card_set: FrozenSet[int]) -> CardTriple:
+        first, second, third = sorted(card_set)
+        ids = self._ids_by_code
+        return ids[first], ids[second], ids[third]
+
+    def any_set(self) -> Optional[CardTriple]:
+        """Return one set as a triple of card ids, or None."""
+        card_set = next(iter(self._sets), None)
+        return None if card_set is None else self._triple(card_set)
+
+    def all_sets(self) -> List[CardTriple]:
+        return [self._triple(card_set) for card_set in self._sets]
@@ -0,0 +1,163 @@
+"""Headless games for regression and throughput testing of the game engine.
+
+``simulate_game()`` deals a seeded game and plays it to the end through
+``GameSession.apply_move()``, with scripted players taking turns, and checks
+the rules after every move. The same seed and options always replay the same
+game, so a run's digest can be compared between engine changes.
+"""
+
+import hashlib
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from random import Random
+from typing import Any, Counter as CounterType, List, Sequence
+from django.core.exceptions import ValidationError
+from .catalog import CardCatalog, get_card_catalog
+from .models import DEFAULT_BOARD_SIZE, NO_CARDS_IN_SET, GameSession
+from .set_engine import count_sets, find_all_sets
+
+STRATEGIES = ("hint", "random")
+
+# Among 21 cards there is always a set, so the board never grows past that.
+MAX_BOARD_SIZE = 21
+
+
+@dataclass
+class GameReport:
+    seed: int
+    moves: int = 0
+    rejected: int = 0  # invalid moves the engine refused, as it should
+    seconds: float = 0.0  # spent in the engine's move path
+    board_sizes: CounterType[int] = field(default_factory=Counter)
+    violations: List[str] = field(default_factory=list)
+    digest: str = ""
+
+    @property
+    def max_board_size(self) -> int:
+        return max(self.board_sizes, default=0)
+
+
+def rule_violations(session: GameSession, catalog: CardCatalog) -> List[str]:
+    """Describe every way the session's state breaks the rules of the game."""
+    state = session.state
+    board = list(state["board"].values())
+    deck = state["deck"]
+    problems = []
+    if len(set(board)) != len(board) or set(board) & set(deck):
+        problems.append("a card is dealt twice")
+    dealt = len(board) + len(deck) + NO_CARDS_IN_SET * sum(state["scores"].values())
+    if dealt != len(catalog):
+        problems.append(f"{dealt} cards accounted for, not {len(catalog)}")
+    if len(board) > MAX_BOARD_SIZE:
+        problems.append(f"board grew to {len(board)} cards")
+    if deck and len(board) < DEFAULT_BOARD_SIZE:
+        problems.append(f"board has {len(board)} cards while the deck is not empty")
+    if deck and set(state["board"]) != {str(pos) for pos in range(len(board))}:
+        problems.append("board positions are not contiguous")
+
+    sets = count_sets(board, catalog)
+    if len(session.board_sets()) != sets:
+        problems.append(f"set index holds {len(session.board_sets())} sets, not {sets}")
+    game_over = state.get("game_over", False)
+    if not sets and not game_over:
+        problems.append("no set on the board but the game is not over")
+    if game_over and (sets or deck):
+        problems.append("game ended with sets or cards left")
+    return problems
+
+
+def _invalid_move(board: Sequence[Any], rng: Random, catalog: CardCatalog) -> List[Any]:
+    """Three board cards that are not a set, or a set with a card not on it."""
+    for _ in range(10):
+        cards = rng.sample(list(board), NO_CARDS_IN_SET)
+        if not count_sets(cards, catalog):
+            return cards
+    off_board = next(card.id for card in catalog.all() if card.id not in board)
+    return [board[0], board[1], off_board]
+
+
+def simulate_game(
+    seed: int,
+    players: int = 2,
+    strategy: str = "hint",
+    mistake_rate: float = 0.0,
+    persist: bool = False,
+) -> GameReport:
+    """Play one seeded game to the end and report on it.
+
+    ``strategy`` is "hint" (take the set index's hint) or "random" (pick any
+    set on the board). With ``mistake_rate`` players sometimes try an invalid
+    move first, which must be rejected without changing the state. With
+    ``persist`` the game is saved to the database after every move.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}")
+    catalog = get_card_catalog()
+    rng = Random(seed)
+    usernames = [f"player{number}" for number in range(1, players + 1)]
+    report = GameReport(seed=seed)
+    digest = hashlib.sha256(f"{seed}:{players}:{strategy}".encode())
+
+    session = GameSession(name=f"Simulation {seed}")
+    session.reset_state(usernames, seed=seed)
+    if persist:
+        session.save()
+    report.board_sizes[len(session.state["board"])] += 1
+    report.violations += rule_violations(session, catalog)
+
+    while not session.state.get("game_over") and not report.violations:
+        board = list(session.state["board"].values())
+        username = rng.choice(usernames)
+        if mistake_rate and rng.random() < mistake_rate:
+            version = session.state_version
+            try:
+                session.apply_move(username, _invalid_move(board, rng, catalog))
+            except ValidationError:
+                report.rejected += 1
+            else:
+                report.violations.append("an invalid move was accepted")
+            if session.state_version != version:
+                report.violations.append("a rejected move changed the state")
+
+        if strategy == "hint":
+            move = session.hint()
+        else:
+            sets = find_all_sets(board, catalog)
+            move = rng.choice(sets) if sets else None
+        if move is None:
+            break  # reported by rule_violations()
+
+        start = time.perf_counter()
+        session.apply_move(username, list(move))
+        if persist:
+            session.save_state()
+        report.seconds += time.perf_counter() - start
+        report.moves += 1
+        report.board_sizes[len(session.state["board"])] += 1
+        report.violations += rule_violations(session, catalog)
+        codes = sorted(catalog.code(card_id) or 0 for card_id in move)
+        digest.update(f"{username}:{codes}".encode())
+
+    report.violations = [
+        f"seed {seed}, move {report.moves}: {problem}" for problem in report.violations
+    ]
+    digest.update(repr(sorted(session.state["scores"].items())).encode())
+    report.digest = digest.hexdigest()
+    return report
+
+
+def run_digest(reports: Sequence[GameReport]) -> str:
+    """Digest of a whole run, equal only for runs that played identically."""
+    digest = hashlib.sha256()
+    for report in reports:
+        digest.update(report.digest.encode())
+    return digest.hexdigest()[:16]
+
+
+def board_size_distribution(reports: Sequence[GameReport]) -> CounterType[int]:
+    """Total count of each board size seen after deals and moves."""
+    sizes: CounterType[int] = Counter()
+    for report in reports:
+        sizes.update(report.board_sizes)
+    return sizes
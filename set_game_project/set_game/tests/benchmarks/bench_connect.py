@@ -0,0 +1,91 @@
+"""Connection-open latency: a game socket connecting and starting its game.
+
+Compares the two ways start_game reads the lobby, session and players
+(``GAME_ASYNC_ORM_READS``): Django's async ORM, or the game executor. Each
+round opens ``sockets`` games at once, from connect to the game_started reply,
+on an event loop run in this thread as daphne runs it, so async ORM queries go
+to asgiref's shared thread rather than back to the test's.
+"""
+
+import asyncio
+from typing import Any, Iterator, List
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from set_game import metrics
+from set_game.consumers import GameConsumer
+from set_game.loadtest import IN_MEMORY_CHANNEL_LAYERS, game_communicator
+from set_game.models import Lobby, LobbyPlayer
+
+pytest.importorskip("pytest_benchmark")
+
+# Executor and asgiref threads need to see the test's rows.
+pytestmark = pytest.mark.django_db(transaction=True)
+
+# Far above any one round, which takes milliseconds, so a slow round is
+# reported in the timings rather than failing the benchmark.
+TIMEOUT = 10
+
+
+@pytest.fixture(autouse=True)
+def in_memory_channel_layer() -> Iterator[None]:
+    """Time the consumer rather than whichever channel layer is configured."""
+    with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS):
+        yield
+
+
+@pytest.fixture
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def create_games(count: int) -> List[int]:
+    """Lobbies of two players, each with its game already created."""
+    call_command("populate_cards", verbosity=0)
+    lobby_ids = []
+    for game in range(count):
+        lobby = Lobby.objects.create()
+        for seat in (1, 2):
+            player = User.objects.create_user(username=f"g{game}p{seat}")
+            LobbyPlayer.objects.create(lobby=lobby, player=player)
+        GameConsumer().create_game_session(lobby)
+        lobby_ids.append(lobby.id)
+    return lobby_ids
+
+
+async def open_game(lobby_id: int) -> None:
+    communicator = game_communicator(lobby_id)
+    connected, _ = await communicator.connect(TIMEOUT)
+    assert connected
+    await communicator.send_json_to({"type": "start_game", "lobby_id": lobby_id})
+    response = await communicator.receive_json_from(TIMEOUT)
+    assert response["type"] == "game_started", response
+    await communicator.disconnect(timeout=TIMEOUT)
+
+
+async def open_games(lobby_ids: List[int]) -> None:
+    await asyncio.gather(*(open_game(lobby_id) for lobby_id in lobby_ids))
+
+
+@pytest.mark.parametrize("sockets", [1, 16])
+@pytest.mark.parametrize("reads", ["async_orm", "executor"])
+def test_open_game(benchmark: Any, loop: Any, reads: str, sockets: int) -> None:
+    lobby_ids = create_games(sockets)
+    with override_settings(GAME_ASYNC_ORM_READS=reads == "async_orm"):
+        # Counted inside the consumer, as the test communicator runs it in a
+        # context of its own: the lobby, its session, the session's players
+        # (loading the game's actor) and their ids. The state is serialized
+        # from the actor.
+        with override_settings(METRICS_ENABLED=True):
+            loop.run_until_complete(open_game(lobby_ids[0]))
+        sample = 'set_game_message_queries_sum{type="start_game"} 4\n'
+        assert sample in metrics.render()
+        benchmark.extra_info["queries"] = 4
+        benchmark.pedantic(
+            lambda: loop.run_until_complete(open_games(lobby_ids)),
+            rounds=50,
+            warmup_rounds=1,
+        )
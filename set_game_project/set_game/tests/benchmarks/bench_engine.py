@@ -0,0 +1,158 @@
+"""Microbenchmarks of the game engine's hot paths (see ``make bench``).
+
+Each benchmark also checks how many queries one call makes and records it in
+the benchmark's extra_info, so a change that adds queries fails here even when
+it is fast on a local SQLite database.
+"""
+
+import copy
+from random import Random
+from typing import Any, Callable, List
+import pytest
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from set_game.catalog import get_card_catalog
+from set_game.consumers import GameConsumer
+from set_game.models import GameSession, Lobby, LobbyPlayer
+from set_game.move_log import move_log
+from set_game.set_engine import THIRD_CARD
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.django_db
+
+
+def board_without_sets(size: int) -> List[int]:
+    """Card ids of a board with no set on it, the slowest case to search."""
+    catalog = get_card_catalog()
+    cards = [card.id for card in catalog.all()]
+    for seed in range(10_000):
+        Random(seed).shuffle(cards)
+        board: List[int] = []
+        codes: List[int] = []
+        for card_id in cards:
+            code = catalog.code_map()[card_id]
+            if all(THIRD_CARD[code][other] not in codes for other in codes):
+                board.append(card_id)
+                codes.append(code)
+                if len(board) == size:
+                    return board
+    raise ValueError(f"No set-free board of {size} cards found")
+
+
+@pytest.fixture
+def cards() -> None:
+    call_command("populate_cards", verbosity=0)
+    get_card_catalog()
+
+
+@pytest.fixture
+def players(cards: None) -> List[User]:
+    return [User.objects.create_user(username=f"player{i}") for i in (1, 2)]
+
+
+@pytest.fixture
+def session(players: List[User]) -> GameSession:
+    session = GameSession.objects.create(name="Benchmark")
+    session.players.set(players)
+    session.reset_state([player.username for player in players], seed=1)
+    session.save()
+    return session
+
+
+@pytest.fixture
+def record_queries(benchmark: Any) -> Callable[..., int]:
+    """Run a call once and record its query count with the benchmark."""
+
+    def record(func: Callable[..., Any], *args: Any, **kwargs: Any) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            func(*args, **kwargs)
+        benchmark.extra_info["queries"] = len(queries)
+        return len(queries)
+
+    return record
+
+
+@pytest.mark.parametrize("size", [12, 15, 18])
+def test_is_set_available_scan(benchmark, record_queries, session, size):
+    """Pair scan over explicit card ids, as when dealing."""
+    board = board_without_sets(size)
+    assert record_queries(session.is_set_available, board) == 0
+    assert benchmark(session.is_set_available, board) is False
+
+
+@pytest.mark.parametrize("size", [12, 15, 18])
+def test_is_set_available_new_board(benchmark, record_queries, session, size):
+    """Building the set index for a board that was just loaded."""
+    board = {str(pos): card_id for pos, card_id in enumerate(board_without_sets(size))}
+
+    def check() -> bool:
+        session.state["board"] = dict(board)
+        return session.is_set_available()
+
+    assert record_queries(check) == 0
+    assert benchmark(check) is False
+
+
+@pytest.mark.parametrize("size", [12, 15, 18])
+def test_is_set_available_indexed(benchmark, record_queries, session, size):
+    """The check made after every move, against the maintained index."""
+    session.state["board"] = {
+        str(pos): card_id for pos, card_id in enumerate(board_without_sets(size))
+    }
+    assert record_queries(session.is_set_available) == 0
+    assert benchmark(session.is_set_available) is False
+
+
+def test_validate_set(benchmark, record_queries, session):
+    move = list(session.hint())
+    assert record_queries(session.validate_set, move) == 0
+    assert benchmark(session.validate_set, move) is True
+
+
+def test_process_set(benchmark, record_queries, session, players):
+    dealt = copy.deepcopy(session.state)
+
+    def deal() -> Any:
+        session.state = copy.deepcopy(dealt)
+        return (players[0], list(session.hint())), {}
+
+    args, _ = deal()
+    assert record_queries(session.process_set, *args) == 1
+    benchmark.pedantic(session.process_set, setup=deal, rounds=500)
+    move_log.clear()
+
+
+def test_initialize_game(benchmark, record_queries, session):
+    assert record_queries(session.initialize_game) == 2
+    benchmark(session.initialize_game)
+
+
+def test_serialize_game_state(benchmark, record_queries, session):
+    consumer = GameConsumer()
+    assert record_queries(consumer.serialize_game_state, session) == 1
+    benchmark(consumer.serialize_game_state, session)
+
+
+@pytest.fixture
+def lobby_url(players: List[User]) -> str:
+    lobby = Lobby.objects.create()
+    for player in players:
+        LobbyPlayer.objects.create(lobby=lobby, player=player)
+    return reverse("lobby_status", args=[lobby.id])
+
+
+def test_lobby_status(benchmark, record_queries, client, lobby_url):
+    assert record_queries(client.get, lobby_url) == 2
+    response = benchmark(client.get, lobby_url)
+    assert response.status_code == 200
+
+
+def test_lobby_status_not_modified(benchmark, record_queries, client, lobby_url):
+    etag = client.get(lobby_url)["ETag"]
+    assert record_queries(client.get, lobby_url, HTTP_IF_NONE_MATCH=etag) == 1
+    response = benchmark(client.get, lobby_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
@@ -3,10 +3,16 @@ import os
 import sys
 from importlib import reload
 import asyncio
-from typing import cast
+from typing import Any, cast
 import uvloop
 from channels.testing import WebsocketCommunicator
-from set_game.consumers import GameConsumer
+from set_game.catalog import invalidate_card_catalog
+from set_game.executor import game_executor
+from set_game.game_actor import game_actors
+from set_game import metrics
+from set_game.loadtest import game_communicator
+from set_game.matchmaking import get_matchmaking_queue
+from set_game.move_log import move_log
 
 # Docker-specific source code workaround
 if os.getenv("RUNNING_IN_DOCKER"):
@@ -43,10 +49,54 @@ def event_loop_policy() -> None:
         pass
 
 
+@pytest.fixture(autouse=True)
+def reset_card_catalog() -> None:
+    """Drop the process-wide card catalog so each test sees its own cards."""
+    invalidate_card_catalog()
+
+
+@pytest.fixture(autouse=True)
+def reset_game_actors() -> None:
+    """Forget in-memory games left over from earlier tests."""
+    game_actors.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_game_executor() -> None:
+    """Restart the game executor so it is sized from each test's settings."""
+    game_executor.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def reset_matchmaking() -> None:
+    """Empty the matchmaking queue so it is reseeded from each test's lobbies."""
+    get_matchmaking_queue().clear()
+
+
+@pytest.fixture(autouse=True)
+def synchronous_move_log() -> None:
+    """Keep moves queued until a test flushes them from its own transaction."""
+    move_log.stop()
+    move_log.background = False
+    move_log.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Start every test with no recorded metrics."""
+    metrics.clear()
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings: Any) -> None:
+    """Fail any view or consumer handler that goes over its query budget."""
+    settings.QUERY_BUDGET_MODE = "raise"
+
+
 @pytest.fixture
 async def websocket_communicator() -> WebsocketCommunicator:
     """Create a new WebSocket communicator for each test."""
-    communicator = WebsocketCommunicator(GameConsumer.as_asgi(), "/ws/game/")
+    communicator = game_communicator()
     connected, _ = await communicator.connect()
     assert connected
     yield communicator
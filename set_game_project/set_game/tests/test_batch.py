@@ -0,0 +1,73 @@
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from set_game.set_engine import count_sets, find_all_sets
+from set_game.tests.test_set_engine import build_catalog
+
+np = pytest.importorskip("numpy")
+
+from set_game.batch import (  # noqa: E402
+    BYTES_PER_TRIPLE,
+    CHUNK_MEMORY,
+    PAD_CODE,
+    chunk_size_for,
+    count_sets_batch,
+    deal_boards,
+    encode_boards,
+    find_sets_batch,
+)
+
+
+class BatchEvaluatorTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.catalog = build_catalog()
+
+    def test_matches_set_engine(self):
+        codes = deal_boards(500, 15, seed=7)
+        # Card ids are code + 1 in a freshly populated catalog.
+        boards = [[int(code) + 1 for code in board] for board in codes]
+        counts = count_sets_batch(codes)
+        result = find_sets_batch(codes, chunk_size=64)
+
+        self.assertEqual(
+            counts.tolist(), [count_sets(board, self.catalog) for board in boards]
+        )
+        self.assertEqual(result.counts.tolist(), counts.tolist())
+        for index, board in enumerate(boards):
+            found = sorted(
+                tuple(sorted(board[position] for position in triple))
+                for triple in result.triples[result.board_index == index]
+            )
+            expected = sorted(
+                tuple(sorted(triple)) for triple in find_all_sets(board, self.catalog)
+            )
+            self.assertEqual(found, expected)
+
+    def test_encode_boards_pads_short_boards(self):
+        codes = encode_boards([[1, 41, 81], [1, 2]], self.catalog)
+        self.assertEqual(codes.shape, (2, 3))
+        self.assertEqual(codes[1, 2], PAD_CODE)
+        self.assertEqual(count_sets_batch(codes).tolist(), [1, 0])
+
+    def test_deal_boards_is_seeded(self):
+        first = deal_boards(10, 12, seed=1)
+        self.assertTrue(np.array_equal(first, deal_boards(10, 12, seed=1)))
+        self.assertTrue(all(len(set(board.tolist())) == 12 for board in first))
+
+    def test_large_boards_are_chunked_by_memory(self):
+        # A full deck holds every one of the 1080 sets.
+        self.assertEqual(count_sets_batch(deal_boards(100, 81)).tolist(), [1080] * 100)
+        triples_81 = 81 * 80 * 79 // 6
+        self.assertLessEqual(
+            chunk_size_for(81) * triples_81 * BYTES_PER_TRIPLE, CHUNK_MEMORY
+        )
+        self.assertGreater(chunk_size_for(12), chunk_size_for(81))
+
+    def test_simulate_deals_command(self):
+        out = StringIO()
+        call_command("simulate_deals", boards=1000, seed=1, stdout=out)
+        self.assertIn("Dealt 1000 boards of 12 cards", out.getvalue())
@@ -1,12 +1,29 @@
 import pytest
 import pytest_asyncio
 import asyncio
+import threading
+import time
+from channels.routing import URLRouter  # type: ignore
 from channels.testing import WebsocketCommunicator
-from set_game.consumers import GameConsumer
-from set_game.models import GameSession, Lobby, User, Card
+from set_game import metrics
+from set_game.executor import game_executor, game_key
+from set_game.models import GameMove, GameSession, Lobby, LobbyPlayer, User, Card
+from set_game.move_log import move_log
+from set_game.query_budget import QueryBudgetExceeded, check_budget, query_budget
+from set_game.routing import websocket_urlpatterns
+from set_game.set_engine import find_all_sets
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
 from django.core.management import call_command
+from django.test import override_settings
+from set_game.game_actor import game_actors
+from set_game.loadtest import game_communicator, game_socket_path, run_load_test
+from set_game.consumers import LobbyConsumer, broadcast_lobby_status
 from asgiref.sync import sync_to_async
 from typing import Dict, List, Optional, Any
+from unittest.mock import patch
 
 # Constants for board states
 INITIAL_BOARD: Dict[str, str] = {
@@ -62,6 +79,17 @@ INITIAL_BOARD_MULTIPLE_PLAYERS: Dict[str, str] = {
 DECK: List[str] = ["55", "17", "39", "46", "41", "52"]
 
 
+def apply_delta(state: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply a game_delta to a board/scores snapshot, as game.js does."""
+    board = {
+        pos: card_id
+        for pos, card_id in state["board"].items()
+        if pos not in delta["removed"]
+    }
+    board.update(delta["board"])
+    return {"board": board, "scores": {**state["scores"], **delta["scores"]}}
+
+
 @pytest.fixture
 def event_loop():
     """The most compatible version"""
@@ -116,9 +144,7 @@ async def game_data() -> Dict[str, Any]:
 
 async def create_websocket_communicator() -> WebsocketCommunicator:
     """Helper function to create and connect a WebSocket communicator."""
-    communicator: WebsocketCommunicator = WebsocketCommunicator(
-        GameConsumer.as_asgi(), "/ws/game/"
-    )
+    communicator: WebsocketCommunicator = game_communicator()
     connected, _ = await communicator.connect()
     assert connected
     return communicator
@@ -157,6 +183,18 @@ async def setup_game_state(
     await sync_to_async(game_session.save)()
 
 
+async def assert_move_logged(game_session: GameSession, player: User) -> None:
+    """Check the move log recorded exactly one move, with the set's cards."""
+    await sync_to_async(move_log.flush)()
+    moves = await sync_to_async(
+        lambda: [
+            (move.player_id, sorted(move.cards.values_list("id", flat=True)))
+            for move in GameMove.objects.filter(session=game_session)
+        ]
+    )()
+    assert moves == [(player.id, [13, 46, 61])]
+
+
 @pytest.mark.asyncio
 @pytest.mark.django_db(transaction=True, reset_sequences=True)
 async def test_valid_move(
@@ -178,9 +216,13 @@ async def test_valid_move(
     )
 
     response: Dict[str, Any] = await websocket_communicator.receive_json_from()
-    assert response["type"] == "game_state"
-    assert player.username in response["state"]["scores"]
-    assert response["state"]["board"] == EXPECTED_BOARD_AFTER_SET
+    assert response["type"] == "game_delta"
+    state = apply_delta(
+        {"board": INITIAL_BOARD, "scores": {player.username: 0}}, response["delta"]
+    )
+    assert player.username in state["scores"]
+    assert state["board"] == EXPECTED_BOARD_AFTER_SET
+    await assert_move_logged(game_session, player)
 
 
 @pytest.mark.asyncio
@@ -252,8 +294,9 @@ async def test_game_over(
     )
 
     response: Dict[str, Any] = await websocket_communicator.receive_json_from()
-    assert response["type"] == "game_state"
-    assert player.username in response["state"]["scores"]
+    assert response["type"] == "game_delta"
+    assert response["delta"]["scores"] == {player.username: 6}
+    assert response["delta"]["game_over"]
 
     response = await websocket_communicator.receive_json_from()
     assert response["type"] == "game_over"
@@ -371,7 +414,7 @@ async def test_board_update_no_set(
     )
 
     response: Dict[str, Any] = await websocket_communicator.receive_json_from()
-    assert response["type"] == "game_state"
+    assert response["type"] == "game_delta"
 
     expected_board: Dict[str, str] = {
         "0": "42",
@@ -387,7 +430,11 @@ async def test_board_update_no_set(
         "10": "39",
         "11": "45",
     }
-    assert response["state"]["board"] == expected_board
+    state = apply_delta(
+        {"board": INITIAL_BOARD_MULTIPLE_PLAYERS, "scores": {player.username: 0}},
+        response["delta"],
+    )
+    assert state["board"] == expected_board
 
 
 @pytest.mark.asyncio
@@ -412,8 +459,11 @@ async def test_board_update_after_set(
     )
 
     response: Dict[str, Any] = await websocket_communicator.receive_json_from()
-    assert response["type"] == "game_state"
-    assert response["state"]["board"] == EXPECTED_BOARD_AFTER_SET
+    assert response["type"] == "game_delta"
+    state = apply_delta(
+        {"board": INITIAL_BOARD, "scores": {player.username: 0}}, response["delta"]
+    )
+    assert state["board"] == EXPECTED_BOARD_AFTER_SET
 
 
 @pytest.mark.asyncio
@@ -446,9 +496,16 @@ async def test_score_updates_multiple_players(
     )
 
     response: Dict[str, Any] = await websocket_communicator.receive_json_from()
-    assert response["type"] == "game_state"
-    assert response["state"]["scores"][player1.username] == 1
-    assert response["state"]["scores"][player2.username] == 0
+    assert response["type"] == "game_delta"
+    state = apply_delta(
+        {
+            "board": INITIAL_BOARD_MULTIPLE_PLAYERS,
+            "scores": {player1.username: 0, player2.username: 0},
+        },
+        response["delta"],
+    )
+    assert state["scores"][player1.username] == 1
+    assert state["scores"][player2.username] == 0
 
     valid_set_p2: List[str] = ["45", "39", "42"]
     await websocket_communicator.send_json_to(
@@ -460,7 +517,644 @@ async def test_score_updates_multiple_players(
         }
     )
 
+    response = await websocket_communicator.receive_json_from()
+    assert response["type"] == "game_delta"
+    state = apply_delta(state, response["delta"])
+    assert state["scores"][player1.username] == 1
+    assert state["scores"][player2.username] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_broadcasts_are_scoped_to_one_game(
+    game_data: Dict[str, Any], websocket_communicator: WebsocketCommunicator
+) -> None:
+    """Ensure moves in one game are not broadcast to sockets in another game."""
+    game_session: GameSession = game_data["game_session"]
+    player: User = game_data["player"]
+    other_session: GameSession = await sync_to_async(GameSession.objects.create)(
+        name="Other Game"
+    )
+    await sync_to_async(other_session.players.add)(player)
+
+    await setup_game_state(game_session, INITIAL_BOARD, scores={player.username: 0})
+    await setup_game_state(other_session, INITIAL_BOARD, scores={player.username: 0})
+
+    other_communicator = await create_websocket_communicator()
+    await other_communicator.send_json_to(
+        {
+            "type": "make_move",
+            "session_id": other_session.id,
+            "username": player.username,
+            "card_ids": ["13", "46", "61"],
+        }
+    )
+    response: Dict[str, Any] = await other_communicator.receive_json_from()
+    assert response["type"] == "game_delta"
+
+    await websocket_communicator.send_json_to(
+        {
+            "type": "make_move",
+            "session_id": game_session.id,
+            "username": player.username,
+            "card_ids": ["13", "46", "61"],
+        }
+    )
+    response = await websocket_communicator.receive_json_from()
+    assert response["type"] == "game_delta"
+    assert await other_communicator.receive_nothing()
+
+    await other_communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_start_game_joins_game_group(
+    websocket_communicator: WebsocketCommunicator,
+) -> None:
+    """Ensure every player who starts the same lobby receives its broadcasts."""
+    await sync_to_async(call_command)("populate_cards")
+    lobby: Lobby = await sync_to_async(Lobby.objects.create)()
+    player1: User = await sync_to_async(User.objects.create_user)(username="player1")
+    player2: User = await sync_to_async(User.objects.create_user)(username="player2")
+    await sync_to_async(lobby.players.add)(player1, player2)
+
+    second_communicator = await create_websocket_communicator()
+    for communicator in (websocket_communicator, second_communicator):
+        await communicator.send_json_to({"type": "start_game", "lobby_id": lobby.id})
+        response: Dict[str, Any] = await communicator.receive_json_from()
+        assert response["type"] == "game_started"
+    session_id = response["session_id"]
+
+    await websocket_communicator.send_json_to(
+        {
+            "type": "request_rematch",
+            "session_id": session_id,
+            "username": player1.username,
+        }
+    )
+    response = await second_communicator.receive_json_from()
+    assert response["type"] == "rematch_status"
+    assert response["rematch_status"] == {player1.username: True}
+
+    await second_communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.parametrize("actors_enabled", [True, False])
+async def test_start_game_with_async_orm_reads(
+    websocket_communicator: WebsocketCommunicator, actors_enabled: bool
+) -> None:
+    """Ensure start_game reads through the async ORM give the same game."""
+    await sync_to_async(call_command)("populate_cards")
+    lobby: Lobby = await sync_to_async(Lobby.objects.create)()
+    player1: User = await sync_to_async(User.objects.create_user)(username="player1")
+    player2: User = await sync_to_async(User.objects.create_user)(username="player2")
+    await sync_to_async(lobby.players.add)(player1, player2)
+
+    with override_settings(
+        GAME_ASYNC_ORM_READS=True, GAME_ACTORS_ENABLED=actors_enabled
+    ):
+        await websocket_communicator.send_json_to(
+            {"type": "start_game", "lobby_id": lobby.id + 1}
+        )
+        response: Dict[str, Any] = await websocket_communicator.receive_json_from()
+        assert response == {"type": "error", "message": "Lobby not found"}
+
+        for _ in range(2):  # creating the game, then finding it
+            await websocket_communicator.send_json_to(
+                {"type": "start_game", "lobby_id": lobby.id}
+            )
+            response = await websocket_communicator.receive_json_from()
+            assert response["type"] == "game_started"
+            assert sorted(response["player_ids"]) == [player1.id, player2.id]
+            assert sorted(response["state"]["players"]) == ["player1", "player2"]
+
+    assert await GameSession.objects.acount() == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.parametrize("async_reads", [True, False])
+async def test_simultaneous_starts_share_one_game(async_reads: bool) -> None:
+    """Ensure two sockets starting one lobby at once get the same session."""
+    await sync_to_async(call_command)("populate_cards")
+    lobby: Lobby = await sync_to_async(Lobby.objects.create)()
+    player1: User = await sync_to_async(User.objects.create_user)(username="player1")
+    player2: User = await sync_to_async(User.objects.create_user)(username="player2")
+    await sync_to_async(lobby.players.add)(player1, player2)
+    communicators = [await create_websocket_communicator() for _ in range(2)]
+
+    async def start(communicator: WebsocketCommunicator) -> Dict[str, Any]:
+        await communicator.send_json_to({"type": "start_game", "lobby_id": lobby.id})
+        return await communicator.receive_json_from()
+
+    with override_settings(GAME_ASYNC_ORM_READS=async_reads):
+        responses = await asyncio.gather(*map(start, communicators))
+
+    assert responses[0]["session_id"] == responses[1]["session_id"]
+    assert await GameSession.objects.acount() == 1
+    for communicator in communicators:
+        await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_rematch_without_game_actors(
+    game_data: Dict[str, Any], websocket_communicator: WebsocketCommunicator
+) -> None:
+    """Ensure a rematch deals a new game through the database within budget."""
+    game_session: GameSession = game_data["game_session"]
+    player: User = game_data["player"]
+    version = game_session.state_version
+
+    with override_settings(GAME_ACTORS_ENABLED=False):
+        await websocket_communicator.send_json_to(
+            {
+                "type": "request_rematch",
+                "session_id": game_session.id,
+                "username": player.username,
+            }
+        )
+        response: Dict[str, Any] = await websocket_communicator.receive_json_from()
+        assert response == {"type": "rematch_status", "rematch_status": {}}
+        response = await websocket_communicator.receive_json_from()
+
+    assert response["type"] == "game_state"
+    assert response["state"]["version"] == version + 1
+    assert response["state"]["players"] == [player.username]
+    await sync_to_async(game_session.refresh_from_db)()
+    assert game_session.state["scores"] == {player.username: 0}
+    assert game_session.state["rematch_status"] == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_handler_over_query_budget(game_data: Dict[str, Any]) -> None:
+    """Ensure a handler going over its query budget fails, or logs in staging."""
+
+    @query_budget(1)
+    async def handler() -> None:
+        await sync_to_async(lambda: list(User.objects.all()))()
+        await sync_to_async(lambda: list(Lobby.objects.all()))()
+
+    with pytest.raises(QueryBudgetExceeded, match="made 2 queries, over its budget"):
+        await handler()
+
+    with override_settings(QUERY_BUDGET_MODE="log"):
+        with patch("set_game.query_budget.logger") as logger:
+            await handler()
+    message = logger.warning.call_args[0][2]
+    assert 'FROM "auth_user"' in message
+    assert "test_consumers.py" in message  # where the query was made
+
+    with override_settings(QUERY_BUDGET_MODE="off"):
+        await handler()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_moves_are_written_behind(
+    game_data: Dict[str, Any], websocket_communicator: WebsocketCommunicator
+) -> None:
+    """Ensure moves update the in-memory game and reach the database on disconnect."""
+    game_session: GameSession = game_data["game_session"]
+    player: User = game_data["player"]
+
+    await setup_game_state(game_session, INITIAL_BOARD, scores={player.username: 0})
+
+    with override_settings(GAME_ACTOR_FLUSH_INTERVAL=60):
+        await websocket_communicator.send_json_to(
+            {
+                "type": "make_move",
+                "session_id": game_session.id,
+                "username": player.username,
+                "card_ids": ["13", "46", "61"],
+            }
+        )
+        response: Dict[str, Any] = await websocket_communicator.receive_json_from()
+        assert response["delta"]["scores"][player.username] == 1
+
+        actor = game_actors.get(game_session.id)
+        assert actor is not None and actor.dirty
+        await sync_to_async(game_session.refresh_from_db)()
+        assert game_session.state["scores"][player.username] == 0
+
+        await websocket_communicator.disconnect()
+
+    assert game_actors.get(game_session.id) is None
+    await sync_to_async(game_session.refresh_from_db)()
+    assert game_session.state["scores"][player.username] == 1
+    assert game_session.state["board"] == EXPECTED_BOARD_AFTER_SET
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_disconnect_query_budget(
+    game_data: Dict[str, Any], websocket_communicator: WebsocketCommunicator
+) -> None:
+    """Ensure the write-behind flush on disconnect counts against its budget."""
+    game_session: GameSession = game_data["game_session"]
+    player: User = game_data["player"]
+    await setup_game_state(game_session, INITIAL_BOARD, scores={player.username: 0})
+
+    with override_settings(GAME_ACTOR_FLUSH_INTERVAL=60):
+        await websocket_communicator.send_json_to(
+            {
+                "type": "make_move",
+                "session_id": game_session.id,
+                "username": player.username,
+                "card_ids": ["13", "46", "61"],
+            }
+        )
+        await websocket_communicator.receive_json_from()
+        with patch("set_game.query_budget.check_budget", wraps=check_budget) as check:
+            await websocket_communicator.disconnect()
+
+    name, limit, recorder = check.call_args[0]
+    assert name == "GameConsumer.disconnect"
+    assert recorder.count == limit == 1
+    assert 'UPDATE "set_game_gamesession"' in recorder.queries[0][0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_game_actor_serialises_moves(game_data: Dict[str, Any]) -> None:
+    """Ensure two simultaneous claims of the same set only score once."""
+    game_session: GameSession = game_data["game_session"]
+    player: User = game_data["player"]
+
+    await setup_game_state(game_session, INITIAL_BOARD, scores={player.username: 0})
+
+    actor = await game_actors.acquire(game_session.id)
+    results = await asyncio.gather(
+        actor.make_move(player.username, ["13", "46", "61"]),
+        actor.make_move(player.username, ["13", "46", "61"]),
+    )
+    assert [result["success"] for result in results] == [True, False]
+    assert results[1]["error"] == "Cards not on board"
+    assert actor.session.state["scores"][player.username] == 1
+
+    await game_actors.release(actor)
+    await sync_to_async(game_session.refresh_from_db)()
+    assert game_session.state["scores"][player.username] == 1
+
+
+@pytest.mark.asyncio
+async def test_game_executor_orders_calls_per_key() -> None:
+    """Ensure calls for one game run in order without holding up other games."""
+    finished: List[str] = []
+
+    def work(name: str, seconds: float = 0) -> str:
+        time.sleep(seconds)
+        finished.append(name)
+        return name
+
+    with override_settings(GAME_EXECUTOR_THREADS=2, METRICS_ENABLED=True):
+        results = await asyncio.gather(
+            game_executor.run(work, "slow", 0.2, key=game_key(1)),
+            game_executor.run(work, "after slow", key=game_key(1)),
+            game_executor.run(work, "other game", key=game_key(2)),
+        )
+
+    assert results == ["slow", "after slow", "other game"]
+    assert finished == ["other game", "slow", "after slow"]
+    assert metrics.executor_wait_seconds.count() == 3
+    assert "set_game_executor_queued 0\n" in metrics.render()
+    assert game_executor.pending == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_game_executor_recycles_stale_connections() -> None:
+    """Ensure executor threads drop connections past their CONN_MAX_AGE."""
+    closed: List[str] = []
+
+    def close(wrapper: Any) -> None:
+        closed.append(threading.current_thread().name)
+        wrapper.connection = None
+
+    def make_stale() -> Any:
+        connection.ensure_connection()
+        connection.close_at = time.monotonic() - 1
+        return connection.connection
+
+    def connect() -> Any:
+        connection.ensure_connection()
+        return connection.connection
+
+    wrapper_class = type(connections["default"])
+    with patch.object(wrapper_class, "close", autospec=True, side_effect=close):
+        stale = await game_executor.run(make_stale)
+        assert closed and closed[0].startswith("game-db")
+        assert await game_executor.run(connect) is not stale
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_saturated_executor_sends_busy_error(
+    game_data: Dict[str, Any], websocket_communicator: WebsocketCommunicator
+) -> None:
+    """Ensure clients are told to retry when the executor is full."""
+    game_session: GameSession = game_data["game_session"]
+
+    with override_settings(GAME_EXECUTOR_MAX_PENDING=0, METRICS_ENABLED=True):
+        await websocket_communicator.send_json_to(
+            {"type": "resync", "session_id": game_session.id}
+        )
+        response: Dict[str, Any] = await websocket_communicator.receive_json_from()
+        # Persisting a game is never refused.
+        assert await game_executor.run(lambda: "saved", wait=True) == "saved"
+
+    assert response == {"type": "error", "message": "Server is busy; try again shortly"}
+    assert metrics.executor_rejections.value() == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_valid_move_without_game_actors(
+    game_data: Dict[str, Any], websocket_communicator: WebsocketCommunicator
+) -> None:
+    """Ensure moves still work through the database when actors are disabled."""
+    game_session: GameSession = game_data["game_session"]
+    player: User = game_data["player"]
+
+    await setup_game_state(game_session, INITIAL_BOARD, scores={player.username: 0})
+
+    with override_settings(GAME_ACTORS_ENABLED=False):
+        await websocket_communicator.send_json_to(
+            {
+                "type": "make_move",
+                "session_id": game_session.id,
+                "username": player.username,
+                "card_ids": ["13", "46", "61"],
+            }
+        )
+        response: Dict[str, Any] = await websocket_communicator.receive_json_from()
+
+    assert response["type"] == "game_delta"
+    state = apply_delta(
+        {"board": INITIAL_BOARD, "scores": {player.username: 0}}, response["delta"]
+    )
+    assert state["board"] == EXPECTED_BOARD_AFTER_SET
+    assert game_actors.get(game_session.id) is None
+    await sync_to_async(game_session.refresh_from_db)()
+    assert game_session.state["scores"][player.username] == 1
+    await assert_move_logged(game_session, player)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+@pytest.mark.parametrize("actors_enabled", [True, False])
+async def test_move_metrics(game_data: Dict[str, Any], actors_enabled: bool) -> None:
+    """Ensure a move records its message, lock, query and group_send metrics."""
+    game_session: GameSession = game_data["game_session"]
+    player: User = game_data["player"]
+    await setup_game_state(game_session, INITIAL_BOARD, scores={player.username: 0})
+    path = "actor" if actors_enabled else "database"
+
+    with override_settings(METRICS_ENABLED=True, GAME_ACTORS_ENABLED=actors_enabled):
+        communicator = await create_websocket_communicator()
+        assert metrics.websocket_connections.value(consumer="game") == 1
+        await communicator.send_json_to(
+            {
+                "type": "make_move",
+                "session_id": game_session.id,
+                "username": player.username,
+                "card_ids": ["13", "46", "61"],
+            }
+        )
+        response: Dict[str, Any] = await communicator.receive_json_from()
+        assert response["type"] == "game_delta"
+        assert "set_game_active_games 1" in metrics.render()
+        await communicator.disconnect()
+
+    assert metrics.websocket_connections.value(consumer="game") == 0
+    assert metrics.message_seconds.count(type="make_move") == 1
+    assert metrics.message_queries.count(type="make_move") == 1
+    assert metrics.move_lock_wait_seconds.count(path=path) == 1
+    assert metrics.move_transaction_seconds.count(path=path) == 1
+    assert metrics.group_send_seconds.count(type="game_delta") == 1
+    # Loading the actor; or the locked session, the player and the update.
+    queries = 2 if actors_enabled else 3
+    sample = f'set_game_message_queries_sum{{type="make_move"}} {queries}\n'
+    assert sample in metrics.render()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_unknown_message_types_share_one_label() -> None:
+    """Ensure client-chosen message types cannot add metric label values."""
+    with override_settings(METRICS_ENABLED=True):
+        communicator = await create_websocket_communicator()
+        for message_type in ["made_up_1", "made_up_2", ["start_game"]]:
+            await communicator.send_json_to({"type": message_type})
+        await communicator.send_json_to({"type": "resync", "session_id": 0})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+
+    assert metrics.message_seconds.count(type="other") == 3
+    assert metrics.message_seconds.count(type="made_up_1") == 0
+    assert metrics.message_seconds.count(type="resync") == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_delta_versions_and_resync(
+    game_data: Dict[str, Any], websocket_communicator: WebsocketCommunicator
+) -> None:
+    """Ensure deltas carry versions and card ids only, and resync sends a snapshot."""
+    game_session: GameSession = game_data["game_session"]
+    player: User = game_data["player"]
+
+    await setup_game_state(
+        game_session,
+        INITIAL_BOARD_MULTIPLE_PLAYERS,
+        deck=DECK,
+        scores={player.username: 0},
+    )
+
+    await websocket_communicator.send_json_to(
+        {
+            "type": "make_move",
+            "session_id": game_session.id,
+            "username": player.username,
+            "card_ids": ["67", "57", "80"],
+        }
+    )
+    response: Dict[str, Any] = await websocket_communicator.receive_json_from()
+    delta = response["delta"]
+    assert delta["version"] == 1
+    assert delta["board"] == {"2": "55", "5": "17", "10": "39"}
+    assert delta["removed"] == []
+    assert set(delta) == {"version", "board", "removed", "scores", "game_over"}
+
+    await websocket_communicator.send_json_to(
+        {"type": "resync", "session_id": game_session.id}
+    )
     response = await websocket_communicator.receive_json_from()
     assert response["type"] == "game_state"
-    assert response["state"]["scores"][player1.username] == 1
-    assert response["state"]["scores"][player2.username] == 1
+    assert response["state"]["version"] == 1
+    assert (
+        response["state"]["board"]
+        == apply_delta({"board": INITIAL_BOARD_MULTIPLE_PLAYERS, "scores": {}}, delta)[
+            "board"
+        ]
+    )
+    assert "cards" not in response["state"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_request_hint(
+    game_data: Dict[str, Any], websocket_communicator: WebsocketCommunicator
+) -> None:
+    """Ensure a hint is a set on the current board, or one card of it."""
+    game_session: GameSession = game_data["game_session"]
+    player: User = game_data["player"]
+
+    await setup_game_state(game_session, INITIAL_BOARD, scores={player.username: 0})
+    board_sets = await sync_to_async(find_all_sets)(list(INITIAL_BOARD.values()))
+
+    for actors_enabled in (True, False):
+        with override_settings(GAME_ACTORS_ENABLED=actors_enabled):
+            await websocket_communicator.send_json_to(
+                {"type": "request_hint", "session_id": game_session.id}
+            )
+            response: Dict[str, Any] = await websocket_communicator.receive_json_from()
+            assert response["type"] == "hint"
+            assert set(response["card_ids"]) in [
+                set(card_set) for card_set in board_sets
+            ]
+
+            await websocket_communicator.send_json_to(
+                {
+                    "type": "request_hint",
+                    "session_id": game_session.id,
+                    "reveal": "card",
+                }
+            )
+            response = await websocket_communicator.receive_json_from()
+            assert len(response["card_ids"]) == 1
+
+
+async def create_lobby_communicator(user: Any, lobby_id: int) -> WebsocketCommunicator:
+    """Connect to a lobby's socket as the given user."""
+    communicator = WebsocketCommunicator(
+        URLRouter(websocket_urlpatterns), f"/ws/lobby/{lobby_id}/"
+    )
+    communicator.scope["user"] = user
+    return communicator
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_lobby_socket_pushes_join_ready_and_start() -> None:
+    """Ensure lobby changes made over HTTP are pushed to waiting players."""
+    first = await sync_to_async(User.objects.create_user)(username="first")
+    second = await sync_to_async(User.objects.create_user)(username="second")
+    lobby: Lobby = await sync_to_async(Lobby.objects.create)()
+    await sync_to_async(LobbyPlayer.objects.create)(lobby=lobby, player=first)
+
+    communicator = await create_lobby_communicator(first, lobby.id)
+    connected, _ = await communicator.connect()
+    assert connected
+    response: Dict[str, Any] = await communicator.receive_json_from()
+    assert response["event"] == "connected"
+    assert response["status"]["players"] == [{"username": "first", "ready": False}]
+
+    def join_and_ready(user: User) -> None:
+        client = Client()
+        client.force_login(user)
+        client.cookies["csrftoken"] = "token"
+        client.get(reverse("lobby"))
+        client.post(reverse("lobby"))
+
+    await sync_to_async(join_and_ready)(second)
+    response = await communicator.receive_json_from()
+    assert response["event"] == "join"
+    assert response["status"]["is_full"]
+    response = await communicator.receive_json_from()
+    assert response["event"] == "ready"
+    assert {"username": "second", "ready": True} in response["status"]["players"]
+
+    await sync_to_async(join_and_ready)(first)
+    response = await communicator.receive_json_from()
+    assert response["event"] == "start"
+    assert response["status"]["all_ready"]
+    assert response["status"]["game_state_id"] is not None
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_lobby_socket_receives_changes_made_while_connecting() -> None:
+    """Ensure a broadcast sent while the socket reads its status still arrives."""
+    player = await sync_to_async(User.objects.create_user)(username="player")
+    lobby: Lobby = await sync_to_async(Lobby.objects.create)()
+    await sync_to_async(LobbyPlayer.objects.create)(lobby=lobby, player=player)
+    get_lobby_status = LobbyConsumer.get_lobby_status
+
+    def status_then_start(consumer: LobbyConsumer, lobby_id: Any) -> Any:
+        status = get_lobby_status(consumer, lobby_id)
+        broadcast_lobby_status(lobby, "start")
+        return status
+
+    communicator = await create_lobby_communicator(player, lobby.id)
+    with (
+        override_settings(QUERY_BUDGET_MODE="off"),
+        patch.object(LobbyConsumer, "get_lobby_status", status_then_start),
+    ):
+        connected, _ = await communicator.connect()
+    assert connected
+    response: Dict[str, Any] = await communicator.receive_json_from()
+    assert response["event"] == "connected"
+    response = await communicator.receive_json_from()
+    assert response["event"] == "start"
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_lobby_socket_rejects_outsiders() -> None:
+    """Ensure only players of a lobby can subscribe to it."""
+    player = await sync_to_async(User.objects.create_user)(username="player")
+    outsider = await sync_to_async(User.objects.create_user)(username="outsider")
+    lobby: Lobby = await sync_to_async(Lobby.objects.create)()
+    await sync_to_async(LobbyPlayer.objects.create)(lobby=lobby, player=player)
+
+    for user in (outsider, AnonymousUser()):
+        communicator = await create_lobby_communicator(user, lobby.id)
+        connected, _ = await communicator.connect()
+        assert not connected
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_game_socket_carries_lobby_routing_key(game_data: Dict[str, Any]) -> None:
+    """Ensure game sockets opened with the lobby id nginx routes by are served."""
+    application = URLRouter(websocket_urlpatterns)
+    path = game_socket_path(game_data["lobby"].id)
+    assert path == f"/ws/game/?lobby={game_data['lobby'].id}"
+    communicator = WebsocketCommunicator(application, path)
+    connected, _ = await communicator.connect()
+    assert connected
+    await communicator.send_json_to(
+        {"type": "request_hint", "session_id": game_data["game_session"].id}
+    )
+    response = await communicator.receive_json_from()
+    assert response["type"] == "hint"
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+async def test_load_harness_plays_concurrent_games() -> None:
+    """Ensure the load generator plays whole games and times every move."""
+    await sync_to_async(call_command)("populate_cards")
+    result = await run_load_test(3, players_per_game=2, timeout=5)
+    assert result.games == 3
+    assert not result.errors
+    assert result.moves >= 3 * 20
+    assert len(result.round_trips) == len(result.fan_outs) == result.moves
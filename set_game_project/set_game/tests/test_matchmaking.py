@@ -0,0 +1,136 @@
+import threading
+import unittest
+from typing import Any, List, Optional
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from set_game.matchmaking import (
+    InMemoryMatchmakingQueue,
+    MatchmakingQueue,
+    RedisMatchmakingQueue,
+    get_matchmaking_queue,
+    join_lobby,
+)
+from set_game.models import GameState, Lobby, LobbyPlayer
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover - fakeredis is optional
+    fakeredis = None  # type: ignore[assignment]
+
+
+class JoinLobbyTest(TestCase):
+    def users(self, count: int) -> List[User]:
+        return [User.objects.create_user(username=f"player{i}") for i in range(count)]
+
+    def test_pairs_players_in_order(self):
+        results = [join_lobby(user) for user in self.users(5)]
+        lobbies = [lobby.id for lobby, _ in results]
+        self.assertEqual(lobbies[0], lobbies[1])
+        self.assertEqual(lobbies[2], lobbies[3])
+        self.assertEqual(len(set(lobbies)), 3)
+        self.assertEqual([joined for _, joined in results], [False, True] * 2 + [False])
+        self.assertTrue(Lobby.objects.get(id=lobbies[0]).is_full())
+
+    def test_cost_does_not_grow_with_lobbies(self):
+        for i in range(100):
+            lobby = Lobby.objects.create()
+            player = User.objects.create_user(username=f"waiting{i}")
+            LobbyPlayer.objects.create(lobby=lobby, player=player)
+            GameState.objects.create(lobby=lobby)
+        first, second = self.users(2)
+        join_lobby(first)  # seeds the queue from the database
+        with self.assertNumQueries(5):
+            lobby, joined = join_lobby(second)
+        self.assertTrue(joined)
+
+    def test_skips_deleted_and_started_lobbies(self):
+        first, second, third = self.users(3)
+        deleted, _ = join_lobby(first)
+        deleted.delete()
+        started, _ = join_lobby(second)
+        GameState.objects.create(lobby=started)
+
+        lobby, joined = join_lobby(third)
+        self.assertFalse(joined)
+        self.assertNotIn(lobby.id, (deleted.id, started.id))
+
+    def test_seeds_existing_open_lobbies(self):
+        waiting = Lobby.objects.create()
+        lobby, joined = join_lobby(self.users(1)[0])
+        self.assertEqual(lobby, waiting)
+        self.assertTrue(joined)
+
+    @override_settings(MAX_PLAYERS=3)
+    def test_configurable_lobby_size(self):
+        users = self.users(4)
+        lobbies = [join_lobby(user)[0] for user in users[:3]]
+        self.assertEqual(len({lobby.id for lobby in lobbies}), 1)
+        self.assertEqual(lobbies[0].max_players, 3)
+        self.assertTrue(Lobby.objects.get(id=lobbies[0].id).is_full())
+
+        # Lobbies of different sizes never share seats.
+        lobby, joined = join_lobby(users[3], max_players=2)
+        self.assertFalse(joined)
+        self.assertEqual(lobby.max_players, 2)
+
+
+class MatchmakingQueueTest(TestCase):
+    def check_queue(self, queue: Any) -> None:
+        queue.push_seats(1, 2, 1)
+        queue.push_seats(2, 3, 2)
+        queue.push_seats(3, 2, 1)
+        self.assertEqual(queue.pop_seat(2), 1)
+        self.assertEqual(queue.pop_seat(3), 2)
+        self.assertEqual(queue.pop_seat(2), 3)
+        self.assertIsNone(queue.pop_seat(2))
+        queue.clear()
+        self.assertIsNone(queue.pop_seat(3))
+
+    def test_in_memory_queue(self):
+        self.check_queue(InMemoryMatchmakingQueue())
+
+    def test_incomplete_backend_cannot_be_created(self):
+        class WithoutSeed(MatchmakingQueue):
+            def pop_seat(self, max_players: int) -> Optional[int]:
+                return None
+
+            def push_seats(self, lobby_id: int, max_players: int, seats: int) -> None:
+                pass
+
+            def clear(self) -> None:
+                pass
+
+        with self.assertRaisesRegex(TypeError, "seed"):
+            WithoutSeed()  # type: ignore[abstract]
+
+    def test_each_seat_is_taken_once(self):
+        queue = get_matchmaking_queue()
+        for lobby_id in range(500):
+            queue.push_seats(lobby_id, 2, 1)
+        taken: List[int] = []
+
+        def take() -> None:
+            while (lobby_id := queue.pop_seat(2)) is not None:
+                taken.append(lobby_id)
+
+        threads = [threading.Thread(target=take) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(taken), list(range(500)))
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_redis_queue(self):
+        queue = RedisMatchmakingQueue("localhost", 6379)
+        queue.redis = fakeredis.FakeRedis()
+        self.check_queue(queue)
+
+        queue.seed([(5, 2, 1)])
+        queue.seed([(6, 2, 1)])  # already seeded
+        other_worker = RedisMatchmakingQueue("localhost", 6379)
+        other_worker.redis = queue.redis
+        other_worker.seed([(7, 2, 1)])
+        self.assertEqual(queue.pop_seat(2), 5)
+        self.assertIsNone(queue.pop_seat(2))
@@ -1,8 +1,27 @@
-from django.test import TestCase
+import json
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth.models import User
-from set_game.models import Card, GameSession, Lobby, LobbyPlayer
-
+from set_game.models import Card, GameMove, GameSession, Lobby, LobbyPlayer
+from set_game.move_log import MoveLogWriter, move_log
+from set_game.catalog import CardCatalog, get_card_catalog
+from set_game.consumers import GameConsumer
+from set_game.db import configure_sqlite_connection
+from set_game.set_engine import count_sets, find_any_set
+from set_game.simulation import run_digest, simulate_game
+from set_game.state_codec import (
+    FORMAT_COMPACT,
+    FORMAT_COMPACT_V1,
+    CatalogMismatch,
+    decode_state,
+    encode_state,
+)
+
+from django.core.exceptions import ValidationError
 from django.core.management import call_command
+from unittest.mock import patch
 
 
 class CardModelTest(TestCase):
@@ -124,16 +143,162 @@ class GameSessionModelTest(TestCase):
     def test_process_set(self):
         self.session.initialize_game()
         selected_cards = [str(card.id) for card in self.cards[:3]]
-        self.session.process_set(self.player1, selected_cards)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.process_set(self.player1, selected_cards)
 
-        self.assertIn(selected_cards, self.session.state["selected_sets"])
+        self.assertNotIn("selected_sets", self.session.state)
         self.assertEqual(self.session.state["scores"][self.player1.username], 1)
+        move_log.flush()
+        move = GameMove.objects.get(session=self.session)
+        self.assertEqual(move.player, self.player1)
+        self.assertEqual(
+            sorted(move.cards.values_list("id", flat=True)),
+            sorted(map(int, selected_cards)),
+        )
 
     def test_end_game(self):
         self.session.end_game()
         self.assertTrue(self.session.state["game_over"])
 
 
+class CardCatalogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_cards")
+        cls.session = GameSession.objects.create(name="Catalog Game")
+
+    def test_catalog_matches_card_table(self):
+        catalog = get_card_catalog()
+        self.assertEqual(len(catalog), 81)
+        card = Card.objects.first()
+        self.assertEqual(catalog.get(card.id).symbol, card.symbol)
+        self.assertEqual(catalog.get(str(card.id)), catalog.get(card.id))
+        self.assertIsNone(catalog.get("not-a-card"))
+
+    def test_set_checks_do_not_query_cards(self):
+        get_card_catalog()
+        board = list(Card.objects.values_list("id", flat=True)[:15])
+        with self.assertNumQueries(0):
+            self.session.is_set_available(board)
+            self.session.validate_set(board[:3])
+
+    def test_catalog_reloaded_after_commands(self):
+        self.assertEqual(len(get_card_catalog()), 81)
+        call_command("delete_cards")
+        self.assertEqual(len(get_card_catalog()), 0)
+        call_command("populate_cards")
+        self.assertEqual(len(get_card_catalog()), 81)
+
+    def test_validate_set_rejects_unknown_and_repeated_cards(self):
+        card_id = Card.objects.first().id
+        self.assertFalse(self.session.validate_set([card_id, card_id, card_id]))
+        self.assertFalse(self.session.validate_set([card_id, card_id, 99999]))
+
+    def test_validate_set_rejects_one_card_spelled_three_ways(self):
+        card_id = Card.objects.first().id
+        for spellings in (
+            [card_id, float(card_id), str(card_id)],
+            [1, 1.0, True],
+            [card_id, f"{card_id}.0", f"0{card_id}"],
+        ):
+            self.assertFalse(self.session.validate_set(spellings))
+
+
+class MoveTransactionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_cards")
+        cls.player = User.objects.create_user(username="player1")
+        cls.session = GameSession.objects.create(name="Move Game")
+        cls.session.players.set([cls.player])
+
+    def setUp(self):
+        card_ids = list(Card.objects.values_list("id", flat=True))
+        self.session.state = {
+            "deck": card_ids[15:],
+            "board": {str(i): card_id for i, card_id in enumerate(card_ids[:15])},
+            "selected_sets": [],
+            "scores": {self.player.username: 0},
+        }
+        self.session.save()
+        self.move = list(find_any_set(card_ids[:15]))
+        get_card_catalog()
+
+    def test_move_is_flushed_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.session.apply_move(self.player.username, self.move)
+            self.session.save_state()
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.state["scores"][self.player.username], 1)
+        self.assertEqual(len(self.session.state["board"]), 12)
+
+    def test_consumer_move_query_count(self):
+        """select_for_update, player lookup and one UPDATE, inside a savepoint."""
+        with self.assertNumQueries(5):
+            result = GameConsumer()._process_move(
+                {
+                    "session_id": self.session.id,
+                    "username": self.player.username,
+                    "card_ids": self.move,
+                }
+            )
+        self.assertTrue(result["success"])
+
+    def test_invalid_move_is_not_applied(self):
+        with self.assertNumQueries(0):
+            with self.assertRaises(ValidationError):
+                self.session.apply_move(self.player.username, self.move[:2])
+        self.assertEqual(self.session.state["scores"][self.player.username], 0)
+
+    def test_rolled_back_move_is_not_logged(self):
+        """The move log is only written once the move's transaction commits."""
+        for process in (
+            self.session.validate_and_process_move,
+            self.session.process_set,
+        ):
+            with patch.object(move_log, "record") as record:
+                with self.assertRaises(DatabaseError):
+                    with transaction.atomic():
+                        process(self.player, self.move)
+                        raise DatabaseError("rolled back")
+                record.assert_not_called()
+
+                self.session.refresh_from_db()
+                with self.captureOnCommitCallbacks(execute=True):
+                    process(self.player, self.move)
+                record.assert_called_once_with(
+                    self.session.id, self.player.username, self.move
+                )
+            self.setUp()
+
+    def test_mixed_type_duplicates_are_not_a_set(self):
+        card_id = self.move[0]
+        with self.assertRaises(ValidationError):
+            self.session.apply_move(
+                self.player.username, [card_id, float(card_id), str(card_id)]
+            )
+        with self.assertRaises(ValidationError):
+            self.session.apply_move(self.player.username, [1, 1.0, True])
+        self.assertEqual(self.session.state["scores"][self.player.username], 0)
+        self.assertEqual(len(self.session.state["board"]), 15)
+
+    def test_set_index_is_updated_by_moves(self):
+        index = self.session.board_sets()
+        while not self.session.state.get("game_over"):
+            hint = self.session.hint()
+            board = list(self.session.state["board"].values())
+            self.assertEqual(len(index), count_sets(board))
+            self.assertEqual(hint is not None, find_any_set(board) is not None)
+            if hint is None:
+                break
+            self.session.apply_move(self.player.username, list(hint))
+            self.assertIs(self.session.board_sets(), index)
+
+        self.session.refresh_from_db()
+        self.assertIsNot(self.session.board_sets(), index)
+
+
 class LobbyModelTest(TestCase):
     def setUp(self):
         self.user1 = User.objects.create(username="player1")
@@ -176,3 +341,158 @@ class GameEndTest(TestCase):
         self.assertFalse(self.session.is_set_available())
         self.session.handle_no_set_available()
         self.assertTrue(self.session.state["game_over"])
+
+
+class SimulationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_cards")
+
+    def test_seeded_deal_is_reproducible(self):
+        first, second = GameSession(), GameSession()
+        first.reset_state(["player1"], seed=42)
+        second.reset_state(["player1"], seed=42)
+        self.assertEqual(first.state, second.state)
+        self.assertEqual(first.state["seed"], 42)
+        second.reset_state(["player1"])
+        self.assertNotEqual(first.state["deck"], second.state["deck"])
+
+    def test_simulated_games_follow_the_rules(self):
+        reports = [
+            simulate_game(seed, strategy="random", mistake_rate=0.2)
+            for seed in range(20)
+        ]
+        self.assertEqual(
+            [problem for report in reports for problem in report.violations], []
+        )
+        self.assertTrue(all(report.rejected for report in reports))
+        replay = [
+            simulate_game(seed, strategy="random", mistake_rate=0.2)
+            for seed in range(20)
+        ]
+        self.assertEqual(run_digest(reports), run_digest(replay))
+
+    def test_eighteen_card_board_shrinks_without_losing_cards(self):
+        # Seed 805 once dealt onto an occupied position after an 18-card board.
+        report = simulate_game(805, strategy="random", mistake_rate=0.1)
+        self.assertEqual(report.violations, [])
+        self.assertEqual(report.max_board_size, 18)
+
+
+class SQLitePragmaTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_new_connections(self):
+        original = self.pragma("cache_size")
+        with override_settings(SQLITE_PRAGMAS={"cache_size": -4321}):
+            configure_sqlite_connection(sender=None, connection=connection)
+            self.assertEqual(self.pragma("cache_size"), -4321)
+        connection.cursor().execute(f"PRAGMA cache_size = {original}")
+
+    def test_no_pragmas_by_default(self):
+        original = self.pragma("cache_size")
+        with override_settings(SQLITE_PRAGMAS={}):
+            configure_sqlite_connection(sender=None, connection=connection)
+        self.assertEqual(self.pragma("cache_size"), original)
+
+
+class StateCodecTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_cards")
+        cls.card_ids = list(Card.objects.values_list("id", flat=True))
+
+    def dealt_state(self):
+        return {
+            "version": 7,
+            "seed": 2**32 - 1,
+            "deck": self.card_ids[12:],
+            "board": {str(pos): self.card_ids[pos] for pos in range(12) if pos != 4},
+            "scores": {"player1": 3, "Zoë#0001": 0},
+            "game_over": False,
+            "rematch_status": {"player1": True},
+        }
+
+    def test_round_trip(self):
+        state = self.dealt_state()
+        data = encode_state(state)
+        self.assertEqual(data[0], FORMAT_COMPACT)
+        self.assertEqual(decode_state(data), state)
+        self.assertLess(len(data), len(json.dumps(state)) / 3)
+
+    def test_other_catalog_is_refused(self):
+        data = encode_state(self.dealt_state())
+        catalog = get_card_catalog()
+        other = CardCatalog(catalog.all()[1:])
+        self.assertNotEqual(other.version, catalog.version)
+        with self.assertRaisesMessage(CatalogMismatch, other.version):
+            decode_state(data, other)
+
+    def test_format_1_is_still_read(self):
+        """States written before the header held the catalog version."""
+        state = self.dealt_state()
+        data = encode_state(state)
+        legacy = bytes([FORMAT_COMPACT_V1]) + data[1:2] + data[8:]
+        self.assertEqual(decode_state(legacy), state)
+
+    def test_string_card_ids(self):
+        state = {"deck": ["5", "6"], "board": {"0": "13"}, "scores": {}}
+        self.assertEqual(decode_state(encode_state(state)), state)
+
+    def test_falls_back_to_json(self):
+        mixed = {"deck": [self.card_ids[0], "6"], "board": {}, "scores": {}}
+        unknown = {"deck": [999999], "board": {}, "scores": {"player1": 1}}
+        for state in (mixed, unknown, {}):
+            data = encode_state(state)
+            self.assertEqual(data, json.dumps(state, separators=(",", ":")).encode())
+            self.assertEqual(decode_state(data), state)
+
+    @override_settings(GAME_STATE_CODEC="json")
+    def test_json_codec_setting(self):
+        state = self.dealt_state()
+        self.assertEqual(json.loads(encode_state(state)), state)
+
+    def test_stored_compactly(self):
+        session = GameSession.objects.create(name="Compact", state=self.dealt_state())
+        session.refresh_from_db()
+        self.assertEqual(session.state, self.dealt_state())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT state FROM set_game_gamesession WHERE id = %s", [session.id]
+            )
+            self.assertEqual(bytes(cursor.fetchone()[0])[0], FORMAT_COMPACT)
+
+
+class MoveLogTest(TransactionTestCase):
+    def setUp(self):
+        call_command("populate_cards")
+        self.player = User.objects.create_user(username="player1")
+        self.session = GameSession.objects.create(name="Logged Game")
+        self.card_ids = list(Card.objects.values_list("id", flat=True)[:3])
+
+    def test_moves_are_written_in_one_batch(self):
+        for _ in range(10):
+            move_log.record(self.session.id, self.player.username, self.card_ids)
+        move_log.record(self.session.id, "unknown", self.card_ids)
+        move_log.record(self.session.id + 1, self.player.username, self.card_ids)
+        with CaptureQueriesContext(connection) as queries:
+            move_log.flush()
+        statements = [
+            query for query in queries if query["sql"] not in ("BEGIN", "COMMIT")
+        ]
+        self.assertEqual(len(statements), 4)
+        self.assertEqual(GameMove.objects.count(), 10)
+        self.assertEqual(GameMove.cards.through.objects.count(), 30)
+
+    def test_background_writer(self):
+        writer = MoveLogWriter()
+        accepted_at = timezone.now()
+        writer.record(self.session.id, self.player.username, map(str, self.card_ids))
+        writer.flush()
+        writer.stop()
+        move = GameMove.objects.get()
+        self.assertEqual(list(move.cards.values_list("id", flat=True)), self.card_ids)
+        self.assertLess(abs((move.created_at - accepted_at).total_seconds()), 1)
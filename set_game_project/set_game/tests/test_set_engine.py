@@ -0,0 +1,111 @@
+import random
+from itertools import combinations, product
+from django.test import SimpleTestCase
+
+from set_game.catalog import CARD_ATTRIBUTES, CARD_VALUES, CardCatalog, CatalogCard
+from set_game.models import Card
+from set_game.set_engine import SetIndex, count_sets, find_all_sets, find_any_set
+from set_game.utils import validate_set
+
+
+def build_catalog() -> CardCatalog:
+    """Catalog with the same ids populate_cards gives a fresh database."""
+    values = [CARD_VALUES[attribute] for attribute in CARD_ATTRIBUTES]
+    return CardCatalog(
+        CatalogCard(card_id, *attributes)
+        for card_id, attributes in enumerate(product(*values), start=1)
+    )
+
+
+def brute_force_sets(catalog, card_ids):
+    sets = []
+    for combo in combinations(card_ids, 3):
+        cards = [catalog.get(card_id) for card_id in combo]
+        if all(
+            len({getattr(card, attribute) for card in cards}) in (1, 3)
+            for attribute in CARD_ATTRIBUTES
+        ):
+            sets.append(combo)
+    return sets
+
+
+class SetEngineTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.catalog = build_catalog()
+
+    def test_matches_brute_force(self):
+        rng = random.Random(81)
+        for board_size in (3, 12, 15, 18, 21):
+            for _ in range(50):
+                board = rng.sample(range(1, 82), board_size)
+                expected = brute_force_sets(self.catalog, board)
+                found = find_all_sets(board, self.catalog)
+                self.assertEqual(
+                    sorted(map(sorted, found)), sorted(map(sorted, expected))
+                )
+                self.assertEqual(count_sets(board, self.catalog), len(expected))
+                self.assertEqual(
+                    find_any_set(board, self.catalog) is not None, bool(expected)
+                )
+
+    def test_full_deck_has_1080_sets(self):
+        self.assertEqual(count_sets(list(range(1, 82)), self.catalog), 1080)
+
+    def test_string_ids_and_unknown_cards(self):
+        self.assertEqual(
+            find_any_set(["1", "41", "81"], self.catalog), ("1", "41", "81")
+        )
+        self.assertIsNone(find_any_set([1, 41, 999], self.catalog))
+
+    def test_known_boards(self):
+        with_set = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 41, 81]
+        without_set = [16, 36, 43, 45, 33, 58, 59, 27, 23, 73, 18, 34]
+        self.assertIsNotNone(find_any_set(with_set, self.catalog))
+        self.assertIsNone(find_any_set(without_set, self.catalog))
+
+    def test_set_index_follows_board(self):
+        rng = random.Random(17)
+        deck = list(range(1, 82))
+        rng.shuffle(deck)
+        board, deck = deck[:12], deck[12:]
+        index = SetIndex(board, self.catalog)
+        while deck:
+            expected = find_all_sets(board, self.catalog)
+            self.assertEqual(
+                sorted(map(sorted, index.all_sets())), sorted(map(sorted, expected))
+            )
+            self.assertEqual(index.any_set() is not None, bool(expected))
+            for card_id in rng.sample(board, 3):
+                board.remove(card_id)
+                index.remove(card_id)
+            for card_id in deck[:3]:
+                board.append(card_id)
+                index.add(card_id)
+            deck = deck[3:]
+
+        index.add(board[0])  # already indexed
+        index.remove(999)  # unknown
+        self.assertEqual(len(index), count_sets(board, self.catalog))
+
+
+class ValidateSetUtilTest(SimpleTestCase):
+    def test_validate_set(self):
+        def card(number, symbol, shading, color):
+            return Card(number=number, symbol=symbol, shading=shading, color=color)
+
+        self.assertTrue(
+            validate_set(
+                card(1, "diamond", "solid", "red"),
+                card(2, "squiggle", "striped", "green"),
+                card(3, "oval", "open", "purple"),
+            )
+        )
+        self.assertFalse(
+            validate_set(
+                card(1, "diamond", "solid", "red"),
+                card(1, "diamond", "solid", "green"),
+                card(1, "diamond", "striped", "red"),
+            )
+        )
@@ -1,10 +1,21 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from typing import Dict, Any
+from unittest.mock import patch
 
-from set_game.models import Lobby, LobbyPlayer
+from django.core.management import call_command
+from django.db import IntegrityError
+
+from set_game import metrics
+from set_game.catalog import get_card_catalog
+from set_game.models import Card, GameState, Lobby, LobbyPlayer
+from set_game import views
+from set_game.consumers import GameConsumer, LobbyConsumer
+from set_game.query_budget import QueryBudgetExceeded
+from set_game.urls import urlpatterns
+from set_game.views import create_user_with_unique_username, generate_unique_username
 
 User = get_user_model()
 
@@ -29,6 +40,48 @@ class HomeViewTest(TestCase):
         self.assertContains(response, "This field is required.")
 
 
+class UniqueUsernameTest(TestCase):
+    def test_discriminators_count_up(self) -> None:
+        """Test taken names get increasing #NNNN discriminators."""
+        self.assertEqual(generate_unique_username("alice"), "alice")
+        User.objects.create(username="alice")
+        self.assertEqual(generate_unique_username("alice"), "alice#0000")
+        self.assertEqual(generate_unique_username("alice"), "alice#0001")
+
+    def test_counter_starts_after_existing_names(self) -> None:
+        """Test a new counter continues from users created before it."""
+        for username in ("bob", "bob#0041", "bob#0007", "bob#team"):
+            User.objects.create(username=username)
+        self.assertEqual(generate_unique_username("bob"), "bob#0042")
+        with self.assertNumQueries(5):
+            self.assertEqual(generate_unique_username("bob"), "bob#0043")
+
+    def test_same_name_creates_distinct_users(self) -> None:
+        """Test logging in twice with one name creates two users."""
+        User.objects.create(username="carol#0000")
+        for _ in range(3):
+            self.client.post(reverse("home"), {"username": "carol"})
+        self.assertEqual(
+            sorted(User.objects.values_list("username", flat=True)),
+            ["carol", "carol#0000", "carol#0001", "carol#0002"],
+        )
+
+    def test_skips_literally_taken_discriminator(self) -> None:
+        """Test a user named like the next discriminator does not stall creation."""
+        User.objects.create(username="dave")
+        self.assertEqual(generate_unique_username("dave"), "dave#0000")
+        User.objects.create(username="dave#0001")
+        user = create_user_with_unique_username("dave")
+        self.assertEqual(user.username, "dave#0002")
+
+    def test_gives_up_after_bounded_attempts(self) -> None:
+        """Test creation fails rather than retrying forever."""
+        User.objects.create(username="erin")
+        with patch.object(views, "generate_unique_username", return_value="erin"):
+            with self.assertRaises(IntegrityError):
+                create_user_with_unique_username("erin")
+
+
 class LobbyViewTest(TestCase):
     def setUp(self) -> None:
         self.user: Any = User.objects.create_user(
@@ -66,3 +119,178 @@ class LobbyStatusViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         data: Dict[str, Any] = response.json()
         self.assertEqual(data["players"][0]["username"], "testuser")
+
+    def test_lobby_status_queries_and_etag(self) -> None:
+        """Test the status costs two queries, and one for an unchanged lobby."""
+        url = reverse("lobby_status", args=[self.lobby.id])
+        with self.assertNumQueries(2):
+            response: Any = self.client.get(url)
+        self.assertEqual(response.json()["players"][0]["ready"], False)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_lobby_status_etag_changes(self) -> None:
+        """Test joining, getting ready and starting each change the ETag."""
+        url = reverse("lobby_status", args=[self.lobby.id])
+        etags = [self.client.get(url)["ETag"]]
+
+        other: Any = User.objects.create_user(username="other")
+        LobbyPlayer.objects.create(lobby=self.lobby, player=other)
+        etags.append(self.client.get(url)["ETag"])
+
+        LobbyPlayer.objects.filter(lobby=self.lobby).update(ready=True)
+        response: Any = self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["all_ready"])
+        etags.append(response["ETag"])
+
+        GameState.objects.create(lobby=self.lobby)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()["game_state_id"])
+        etags.append(response["ETag"])
+        self.assertEqual(len(set(etags)), 4)
+
+
+class MetricsViewTest(TestCase):
+    def test_disabled_metrics_are_not_found(self) -> None:
+        """Test /metrics is a 404 and nothing is recorded while disabled."""
+        lobby: Lobby = Lobby.objects.create()
+        self.client.get(reverse("lobby_status", args=[lobby.id]))
+        self.assertEqual(metrics.lobby_status_requests.value(status=200), 0)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_metrics_count_lobby_status_requests(self) -> None:
+        """Test lobby_status requests are counted by status and exposed."""
+        lobby: Lobby = Lobby.objects.create()
+        url = reverse("lobby_status", args=[lobby.id])
+        etag = self.client.get(url)["ETag"]
+        self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.client.get(reverse("lobby_status", args=[lobby.id + 1]))
+
+        response: Any = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn("# TYPE set_game_lobby_status_requests_total counter", body)
+        for status in (200, 304, 404):
+            self.assertIn(
+                f'set_game_lobby_status_requests_total{{status="{status}"}} 1', body
+            )
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_metrics_are_local_only(self) -> None:
+        """Test addresses outside METRICS_ALLOWED_IPS are refused."""
+        response: Any = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.5")
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_histogram_exposition(self) -> None:
+        """Test histogram buckets are cumulative and end with +Inf."""
+        histogram = metrics.message_seconds
+        for seconds in (0.0001, 0.003, 20):
+            histogram.observe(seconds, type="resync")
+        lines = [line for line in histogram.render() if 'type="resync"' in line]
+        self.assertIn(
+            'set_game_message_seconds_bucket{type="resync",le="0.0005"} 1', lines
+        )
+        self.assertIn(
+            'set_game_message_seconds_bucket{type="resync",le="0.005"} 2', lines
+        )
+        self.assertIn('set_game_message_seconds_bucket{type="resync",le="10"} 2', lines)
+        self.assertIn(
+            'set_game_message_seconds_bucket{type="resync",le="+Inf"} 3', lines
+        )
+        self.assertIn('set_game_message_seconds_count{type="resync"} 3', lines)
+
+
+class QueryBudgetTest(TestCase):
+    def test_every_view_and_handler_has_a_budget(self) -> None:
+        """Test each set_game view and consumer handler declares a query budget."""
+        for pattern in urlpatterns:
+            self.assertIsInstance(
+                getattr(pattern.callback, "query_budget", None), int, pattern.name
+            )
+        handlers = [
+            GameConsumer.connect,
+            GameConsumer.disconnect,
+            GameConsumer.start_game,
+            GameConsumer.make_move,
+            GameConsumer.request_rematch,
+            GameConsumer.resync_game,
+            GameConsumer.request_hint,
+            LobbyConsumer.connect,
+        ]
+        for handler in handlers:
+            self.assertIsInstance(
+                getattr(handler, "query_budget", None), int, handler.__qualname__
+            )
+
+    def test_view_over_budget_fails(self) -> None:
+        """Test a view making more queries than its budget raises."""
+        lobby: Lobby = Lobby.objects.create()
+        with patch.object(views.lobby_status, "query_budget", 1):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "lobby_status made 2"):
+                self.client.get(reverse("lobby_status", args=[lobby.id]))
+
+
+class HealthViewTest(TestCase):
+    @override_settings(WORKER_ID=3)
+    def test_healthy_worker(self) -> None:
+        """Test /health checks the database and channel layer of this worker."""
+        response: Any = self.client.get(reverse("health"))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["worker"], 3)
+        self.assertEqual(data["checks"], {"database": True, "channel_layer": True})
+        self.assertEqual(data["games"], 0)
+
+    def test_failing_check_is_unavailable(self) -> None:
+        """Test a failing check turns /health into a 503."""
+        with patch("set_game.views.channel_layer_ok", return_value=False):
+            response: Any = self.client.get(reverse("health"))
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()["checks"]["channel_layer"])
+
+
+class CardManifestViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        call_command("populate_cards")
+
+    def test_manifest_is_versioned_and_cacheable(self) -> None:
+        """Test the manifest lists every card and can be cached forever."""
+        version = get_card_catalog().version
+        with self.assertNumQueries(0):
+            response: Any = self.client.get(reverse("card_manifest", args=[version]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        data: Dict[str, Any] = response.json()
+        self.assertEqual(data["version"], version)
+        self.assertEqual(len(data["cards"]), 81)
+        card: Card = Card.objects.all()[0]
+        self.assertEqual(data["cards"][str(card.id)]["color"], card.color)
+
+    def test_stale_version_redirects(self) -> None:
+        """Test an old manifest version redirects to the current one."""
+        response: Any = self.client.get(reverse("card_manifest", args=["stale"]))
+        self.assertRedirects(
+            response, reverse("card_manifest", args=[get_card_catalog().version])
+        )
+
+    def test_game_board_links_manifest(self) -> None:
+        """Test the game board page points at the current manifest."""
+        user: Any = User.objects.create_user(username="testuser")
+        lobby: Lobby = Lobby.objects.create()
+        LobbyPlayer.objects.create(lobby=lobby, player=user)
+        game_state: GameState = GameState.objects.create(lobby=lobby)
+        self.client.force_login(user)
+        response: Any = self.client.get(reverse("game_board", args=[game_state.id]))
+        self.assertContains(
+            response, reverse("card_manifest", args=[get_card_catalog().version])
+        )
@@ -6,4 +6,7 @@ urlpatterns = [
     path("lobby/", views.lobby, name="lobby"),
     path("game/<int:game_state_id>/", views.game_board, name="game_board"),
     path("api/lobby_status/<int:lobby_id>/", views.lobby_status, name="lobby_status"),
+    path("api/cards/<str:version>/", views.card_manifest, name="card_manifest"),
+    path("metrics", views.metrics_view, name="metrics"),
+    path("health", views.health, name="health"),
 ]
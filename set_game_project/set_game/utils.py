@@ -1,13 +1,13 @@
-from typing import List
+from set_game.catalog import encode_card
 from set_game.models import Card
+from set_game.set_engine import is_set_codes
 
 
 def validate_set(card1: Card, card2: Card, card3: Card) -> bool:
     """
     Validate if three cards form a set according to SET game rules.
     """
-    attributes: List[str] = ["number", "symbol", "shading", "color"]
-    for attr in attributes:
-        if len({getattr(card1, attr), getattr(card2, attr), getattr(card3, attr)}) == 2:
-            return False
-    return True
+    first, second, third = (encode_card(card) for card in (card1, card2, card3))
+    if first is None or second is None or third is None:
+        return False
+    return is_set_codes(first, second, third)
@@ -1,14 +1,36 @@
+import asyncio
+import os
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer  # type: ignore
 from django.shortcuts import render
-from .models import Lobby, GameState, LobbyPlayer
+from .models import Lobby, GameState, LobbyPlayer, UsernameCounter
 from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib.auth import login
+from django.db import DatabaseError, IntegrityError, connection, transaction
 from django.http import JsonResponse, HttpRequest, HttpResponse, Http404
-from django.db.models import Count
+from django.http import HttpResponseForbidden
 from typing import cast
-
-MAX_PLAYERS = 2
+from django.conf import settings
+from . import metrics
+from .catalog import get_card_catalog
+from .game_actor import game_actors
+from .matchmaking import join_lobby
+from .query_budget import query_budget
+from .consumers import (
+    broadcast_lobby_status,
+    game_group_sockets,
+    lobby_etag,
+    lobby_status_queryset,
+    serialize_lobby,
+)
+
+CARD_MANIFEST_MAX_AGE = 60 * 60 * 24 * 365
+USERNAME_ATTEMPTS = 10
 
 
 def generate_unique_username(base_username: str) -> str:
@@ -17,21 +39,31 @@ def generate_unique_username(base_username: str) -> str:
     if not User.objects.filter(username=base_username).exists():
         return base_username
 
-    # Find the highest number used with this base username
-    pattern = f"{base_username}#"
-    existing_users = User.objects.filter(username__startswith=pattern)
+    # Then the next discriminator for it, formatted with leading zeros
+    return f"{base_username}#{UsernameCounter.next_discriminator(base_username):04d}"
 
-    if not existing_users.exists():
-        return f"{base_username}#0000"
 
-    # Get the highest number used
-    numbers = [int(user.username.split("#")[1]) for user in existing_users]
-    next_number = max(numbers) + 1
+def create_user_with_unique_username(base_username: str) -> User:
+    """Create a user named after base_username, retrying if a name is taken.
 
-    # Format with leading zeros
-    return f"{base_username}#{next_number:04d}"
+    Each name is reserved before its insert, so a failed insert cannot roll
+    the discriminator back and hand out the same name again.
+    """
+    for _ in range(USERNAME_ATTEMPTS):
+        username = generate_unique_username(base_username)
+        try:
+            with transaction.atomic():
+                return User.objects.create(username=username)
+        except IntegrityError:
+            # Taken concurrently, or a user literally named "base#NNNN";
+            # the next attempt takes a fresh discriminator.
+            continue
+    raise IntegrityError(
+        f"No free username for {base_username!r} in {USERNAME_ATTEMPTS} attempts"
+    )
 
 
+@query_budget(10)
 def home(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
         username = request.POST.get("username")
@@ -40,34 +72,20 @@ def home(request: HttpRequest) -> HttpResponse:
                 request, "set_game/home.html", {"error": "This field is required."}
             )
 
-        # Generate a unique username
-        unique_username = generate_unique_username(username)
-        user, _ = User.objects.get_or_create(username=unique_username)
+        user = create_user_with_unique_username(username)
         login(request, user, "django.contrib.auth.backends.ModelBackend")
         return redirect("lobby")
     return render(request, "set_game/home.html")
 
 
+@query_budget(10)
 @login_required
 def lobby(request: HttpRequest) -> HttpResponse:
     lobby = Lobby.objects.filter(players=cast(User, request.user)).first()
     if not lobby:
-        open_lobby = (
-            Lobby.objects.annotate(player_count=Count("players"))
-            .filter(
-                player_count__lt=MAX_PLAYERS,
-                game_state__isnull=True,
-            )
-            .first()
-        )
-        if open_lobby:
-            LobbyPlayer.objects.create(
-                lobby=open_lobby, player=cast(User, request.user)
-            )
-            lobby = open_lobby
-        else:
-            lobby = Lobby.objects.create()
-            LobbyPlayer.objects.create(lobby=lobby, player=cast(User, request.user))
+        lobby, joined = join_lobby(cast(User, request.user))
+        if joined:
+            broadcast_lobby_status(lobby, "join")
 
     if request.method == "POST":
         lobby_player = LobbyPlayer.objects.get(
@@ -80,22 +98,17 @@ def lobby(request: HttpRequest) -> HttpResponse:
             game_state = GameState.objects.create(lobby=lobby)
             lobby.game_state = game_state
             lobby.save()
+            data = broadcast_lobby_status(lobby, "start")
+        else:
+            data = broadcast_lobby_status(lobby, "ready")
 
-        return JsonResponse(
-            {
-                "is_full": lobby.is_full(),
-                "all_ready": lobby.all_ready(),
-                "players": [
-                    {"username": lp.player.username, "ready": lp.ready}
-                    for lp in lobby.lobbyplayer_set.all()
-                ],
-                "csrf_token": request.COOKIES["csrftoken"],
-            }
-        )
+        data["csrf_token"] = request.COOKIES["csrftoken"]
+        return JsonResponse(data)
 
     return render(request, "set_game/lobby.html", {"lobby": lobby})
 
 
+@query_budget(6)
 @login_required
 def game_board(request: HttpRequest, game_state_id: int) -> HttpResponse:
     """View for the game board."""
@@ -114,33 +127,113 @@ def game_board(request: HttpRequest, game_state_id: int) -> HttpResponse:
                 "game_state": game_state,
                 "lobby_id": lobby.id,
                 "current_username": request.user.username,
+                "card_manifest_url": reverse(
+                    "card_manifest", args=[get_card_catalog().version]
+                ),
             },
         )
     except GameState.DoesNotExist:
         raise Http404("Game not found")
 
 
-def lobby_status(request: HttpRequest, lobby_id: int) -> JsonResponse:
+@query_budget(2)
+def lobby_status(request: HttpRequest, lobby_id: int) -> HttpResponse:
+    response = _lobby_status(request, lobby_id)
+    metrics.lobby_status_requests.inc(status=response.status_code)
+    return response
+
+
+def _lobby_status(request: HttpRequest, lobby_id: int) -> HttpResponse:
     try:
-        lobby = Lobby.objects.get(id=lobby_id)
-        lobby.refresh_from_db()
-        lobby_players = lobby.lobbyplayer_set.all()
-        players = [
-            {"username": lp.player.username, "ready": lp.ready} for lp in lobby_players
-        ]
-
-        data = {
-            "players": players,
-            "is_full": lobby.is_full(),
-            "all_ready": lobby.all_ready(),
-            "csrf_token": request.META.get("CSRF_COOKIE"),
-            "game_state_id": lobby.game_state.id
-            if hasattr(lobby, "game_state") and lobby.game_state
-            else None,
-            "lobby_id": lobby_id,
-        }
-        return JsonResponse(data)
+        lobby = lobby_status_queryset().get(id=lobby_id)
+        etag = quote_etag(lobby_etag(lobby))
+        # Unchanged lobbies cost one query and skip serialization entirely.
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        data = serialize_lobby(lobby)
+        data["csrf_token"] = request.META.get("CSRF_COOKIE")
+        response = JsonResponse(data)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
     except Lobby.DoesNotExist:
         return JsonResponse({"error": "Lobby not found"}, status=404)
     except Exception:
         return JsonResponse({"error": "An unexpected error occurred."}, status=500)
+
+
+@query_budget(1)
+def card_manifest(request: HttpRequest, version: str) -> HttpResponse:
+    """Attributes of all cards; each version's URL is cacheable forever."""
+    catalog = get_card_catalog()
+    if version != catalog.version:
+        return redirect("card_manifest", version=catalog.version)
+
+    response = JsonResponse({"version": catalog.version, "cards": catalog.manifest()})
+    patch_cache_control(
+        response, public=True, max_age=CARD_MANIFEST_MAX_AGE, immutable=True
+    )
+    return response
+
+
+@query_budget(0)
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """This worker's metrics, for a Prometheus scraper on METRICS_ALLOWED_IPS."""
+    if not settings.METRICS_ENABLED:
+        raise Http404("Metrics are disabled")
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def database_ok() -> bool:
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return True
+    except DatabaseError:
+        return False
+
+
+def channel_layer_ok(timeout: float = 1.0) -> bool:
+    """Whether a message sent through the channel layer comes back in time."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return False
+
+    async def round_trip() -> bool:
+        channel = await channel_layer.new_channel()
+        await channel_layer.send(channel, {"type": "health.ping"})
+        message = await asyncio.wait_for(channel_layer.receive(channel), timeout)
+        return message["type"] == "health.ping"
+
+    try:
+        return async_to_sync(round_trip)()
+    except Exception:
+        return False
+
+
+@query_budget(1)
+def health(request: HttpRequest) -> HttpResponse:
+    """Whether this worker can reach the database and the channel layer.
+
+    A 503 when either check fails. Also reports the worker's id and the games
+    it is serving, to check that sticky routing spreads games over workers.
+    """
+    checks = {"database": database_ok(), "channel_layer": channel_layer_ok()}
+    response = JsonResponse(
+        {
+            "worker": settings.WORKER_ID,
+            "pid": os.getpid(),
+            "checks": checks,
+            "games": len(game_group_sockets),
+            "game_actors": len(game_actors),
+        },
+        status=200 if all(checks.values()) else 503,
+    )
+    patch_cache_control(response, no_store=True)
+    return response
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import os
+from django import VERSION as DJANGO_VERSION
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -55,6 +56,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Last, so budgets cover the view rather than the middleware around it.
+    "set_game.query_budget.QueryBudgetMiddleware",
 ]
 
 ROOT_URLCONF = "set_game_project.urls"
@@ -82,6 +85,12 @@ ASGI_APPLICATION = "set_game_project.asgi.application"
 REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
 
+# Players per lobby, and where open lobby seats are queued (see
+# set_game/matchmaking.py): "memory" for a single process, "redis" to share
+# the queue between workers.
+MAX_PLAYERS = int(os.environ.get("MAX_PLAYERS", 2))
+MATCHMAKING_BACKEND = os.environ.get("MATCHMAKING_BACKEND", "memory")
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -91,16 +100,133 @@ CHANNEL_LAYERS = {
     },
 }
 
+# In-memory game state (see set_game/game_actor.py). When enabled, live games
+# are owned by the consumer process and written back to the database at most
+# GAME_ACTOR_FLUSH_INTERVAL seconds after each change and when a game ends.
+GAME_ACTORS_ENABLED = os.environ.get("GAME_ACTORS_ENABLED", "1") == "1"
+GAME_ACTOR_FLUSH_INTERVAL = float(os.environ.get("GAME_ACTOR_FLUSH_INTERVAL", 5))
+
+# Accepted moves are written to GameMove by a background thread (see
+# set_game/move_log.py) in batches of up to MOVE_LOG_BATCH_SIZE, at most
+# MOVE_LOG_FLUSH_INTERVAL seconds after they were made. Moves beyond
+# MOVE_LOG_MAX_PENDING waiting to be written are dropped.
+MOVE_LOG_BATCH_SIZE = int(os.environ.get("MOVE_LOG_BATCH_SIZE", 100))
+MOVE_LOG_FLUSH_INTERVAL = float(os.environ.get("MOVE_LOG_FLUSH_INTERVAL", 1))
+MOVE_LOG_MAX_PENDING = int(os.environ.get("MOVE_LOG_MAX_PENDING", 10000))
+
+# GameSession.state is stored in the compact binary layout described in
+# set_game/state_codec.py; "json" stores it as JSON bytes instead. Either
+# format is read back whatever this is set to.
+GAME_STATE_CODEC = os.environ.get("GAME_STATE_CODEC", "compact")
+
+# Prometheus-style metrics (see set_game/metrics.py), served on /metrics to
+# requests from METRICS_ALLOWED_IPS. When disabled nothing is recorded and
+# /metrics is a 404.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+
+# start_daphne.sh runs WEB_WORKERS daphne processes; worker i listens on port
+# 8000 + i with WORKER_ID=i, which /health reports. nginx.conf sends every
+# socket of a game to the same worker.
+WORKER_ID = int(os.environ.get("WORKER_ID", 0))
+
+# Views and consumer handlers declare the most SQL queries they may make (see
+# set_game/query_budget.py). "raise" fails whatever goes over, for development
+# and CI; "log" logs the queries and where they were made, for staging; "off"
+# does not count queries.
+QUERY_BUDGET_MODE = os.environ.get("QUERY_BUDGET_MODE", "off")
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+# "sqlite" (default) or "postgresql". PostgreSQL needs the psycopg driver, the
+# "postgres" extra in pyproject.toml.
+DATABASE_ENGINE = os.environ.get("DATABASE_ENGINE", "sqlite")
+
+# Opt-in SQLite profile for small deployments (SQLITE_TUNING=1). WAL lets lobby
+# polling read while a move is being written, and busy_timeout makes writers
+# queue for the lock rather than fail. Applied to each new connection by
+# set_game.db.configure_sqlite_connection.
+SQLITE_TUNING = os.environ.get("SQLITE_TUNING") == "1"
+SQLITE_TUNED_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000)),
+    "mmap_size": 128 * 1024 * 1024,
+    "cache_size": -20000,  # KiB
 }
+SQLITE_PRAGMAS = SQLITE_TUNED_PRAGMAS if SQLITE_TUNING else {}
+# Take the write lock when a transaction starts (Django 5.1+), so read-then-
+# write transactions wait on busy_timeout instead of failing to upgrade their
+# lock with "database is locked".
+SQLITE_IMMEDIATE = SQLITE_TUNING and DJANGO_VERSION >= (5, 1)
+
+# GameConsumer's database work runs on GAME_EXECUTOR_THREADS threads (see
+# set_game/executor.py), one call at a time per game. Beyond
+# GAME_EXECUTOR_MAX_PENDING calls queued or running, clients are told the
+# server is busy. SQLite gets one thread unless it takes its write lock up
+# front, as concurrent writers would otherwise fail.
+GAME_EXECUTOR_THREADS = int(
+    os.environ.get(
+        "GAME_EXECUTOR_THREADS",
+        8 if DATABASE_ENGINE == "postgresql" or SQLITE_IMMEDIATE else 1,
+    )
+)
+GAME_EXECUTOR_MAX_PENDING = int(os.environ.get("GAME_EXECUTOR_MAX_PENDING", 200))
+
+# Reads made when a game socket starts a game (the lobby, its session and the
+# player list) use Django's async ORM (aget, afirst, async for) rather than the
+# game executor. Django still runs each such query on asgiref's one shared
+# thread; set_game/tests/benchmarks/bench_connect.py compares the two.
+GAME_ASYNC_ORM_READS = os.environ.get("GAME_ASYNC_ORM_READS", "0") == "1"
+
+if DATABASE_ENGINE == "postgresql":
+    # Django 5.1+ can share a psycopg pool between threads (DATABASE_POOL=1).
+    # Size it for the ASGI thread executor (ASGI_THREADS), the game executor
+    # and the single thread-sensitive thread.
+    DATABASE_POOL = DJANGO_VERSION >= (5, 1) and os.environ.get("DATABASE_POOL") == "1"
+    ASGI_THREADS = int(
+        os.environ.get("ASGI_THREADS", min(32, (os.cpu_count() or 1) + 4))
+    )
+    DATABASE_POOL_MAX_SIZE = int(
+        os.environ.get(
+            "DATABASE_POOL_MAX_SIZE", ASGI_THREADS + GAME_EXECUTOR_THREADS + 1
+        )
+    )
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "set_game"),
+            "USER": os.environ.get("POSTGRES_USER", "set_game"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": int(os.environ.get("POSTGRES_PORT", 5432)),
+            # Without a pool each worker thread keeps its own connection open
+            # for reuse; health checks drop connections the server has closed.
+            "CONN_MAX_AGE": 0
+            if DATABASE_POOL
+            else int(os.environ.get("DATABASE_CONN_MAX_AGE", 60)),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "pool": {
+                    "min_size": 2,
+                    "max_size": DATABASE_POOL_MAX_SIZE,
+                    "timeout": 10,
+                }
+            }
+            if DATABASE_POOL
+            else {},
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {"transaction_mode": "IMMEDIATE"} if SQLITE_IMMEDIATE else {},
+        }
+    }
 
 
 # Password validation
@@ -1,4 +1,25 @@
 #!/bin/bash
 
 export DJANGO_SETTINGS_MODULE=set_game_project.settings
-exec daphne -b 0.0.0.0 -p 8000 set_game_project.asgi:application > daphne.log 2>&1
\ No newline at end of file
+# The image is migrated against SQLite at build time; an external database
+# such as PostgreSQL is only reachable once the container is running.
+python manage.py migrate --noinput
+
+# WEB_WORKERS daphne processes, worker i on port 8000 + i with WORKER_ID=i.
+# nginx.conf must list the same ports in its upstreams.
+WEB_WORKERS=${WEB_WORKERS:-1}
+if [ "$WEB_WORKERS" -le 1 ]; then
+    export WORKER_ID=0
+    exec daphne -b 0.0.0.0 -p 8000 set_game_project.asgi:application > daphne.log 2>&1
+fi
+
+trap 'kill $(jobs -p) 2>/dev/null' TERM INT
+for ((i = 0; i < WEB_WORKERS; i++)); do
+    WORKER_ID=$i daphne -b 0.0.0.0 -p $((8000 + i)) \
+        set_game_project.asgi:application > "daphne-$i.log" 2>&1 &
+done
+# Stop the container once any worker exits, so it is restarted as a whole.
+wait -n
+kill $(jobs -p) 2>/dev/null
+wait
+exit 1
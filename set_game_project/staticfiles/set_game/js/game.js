@@ -3,12 +3,16 @@ let selectedCards = [];
 let playerIds = null;
 let sessionId = null;
 let currentGameState = null;
+let stateVersion = null;
+let cardManifest = null;
 let isProcessingMove = false;
 let gameSocket = null;
 
 // Get DOM elements
 const lobbyId = document.getElementById('lobby-id').dataset.lobbyId;
 const currentUsername = document.getElementById('current-username').dataset.lobbyId;
+const cardManifestUrl = document.getElementById('card-manifest').dataset.url;
+const MANIFEST_RETRY_DELAY_MS = 3000;
 
 // ===== WebSocket Setup =====
 function setupWebSocket() {
@@ -16,7 +20,10 @@ function setupWebSocket() {
         gameSocket.close();  // Close any existing socket before opening a new one
     }
 
-    gameSocket = new WebSocket('ws://' + window.location.host + '/ws/game/');
+    // The lobby id lets nginx send every socket of this game to one worker.
+    gameSocket = new WebSocket(
+        'ws://' + window.location.host + '/ws/game/?lobby=' + encodeURIComponent(lobbyId)
+    );
 
     gameSocket.onopen = function () {
         startGame(lobbyId);
@@ -29,13 +36,19 @@ function setupWebSocket() {
         switch (data.type) {
             case 'game_state':
                 currentGameState = data.state;
+                stateVersion = data.state.version;
                 updateGameState(data.state);
                 isProcessingMove = false;
                 break;
+            case 'game_delta':
+                applyGameDelta(data.delta);
+                isProcessingMove = false;
+                break;
             case 'game_started':
                 sessionId = data.session_id;
                 playerIds = data.player_ids;
                 currentGameState = data.state;
+                stateVersion = data.state.version;
                 updateGameState(data.state);
                 isProcessingMove = false;
                 break;
@@ -57,6 +70,11 @@ function setupWebSocket() {
             case 'rematch_status':
                 updateRematchStatus(data.rematch_status);
                 break;
+            case 'hint':
+                if (data.version === stateVersion) {
+                    showHint(data.card_ids);
+                }
+                break;
         }
     };
 
@@ -65,6 +83,38 @@ function setupWebSocket() {
     };
 }
 
+// Card attributes never change, so they are fetched once per manifest version.
+// Rejects if they could not be loaded, so the game socket is never opened
+// without them.
+function loadCardManifest() {
+    return fetch(cardManifestUrl)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            cardManifest = data.cards;
+        });
+}
+
+// Load the manifest, then connect; until it loads, say so and retry
+function loadCardManifestAndConnect() {
+    loadCardManifest().then(
+        () => {
+            document.getElementById('message').innerText = '';
+            setupWebSocket();
+        },
+        error => {
+            console.error('Error loading card manifest:', error);
+            document.getElementById('message').innerText =
+                'Could not load the cards. Retrying...';
+            setTimeout(loadCardManifestAndConnect, MANIFEST_RETRY_DELAY_MS);
+        }
+    );
+}
+
 // Start a new game
 function startGame(lobbyId) {
     gameSocket.send(JSON.stringify({
@@ -139,6 +189,35 @@ function isValidSet(cards) {
 }
 
 // ===== Game State Management =====
+// Apply the changes from one move; ask for a full snapshot if we missed one
+function applyGameDelta(delta) {
+    if (stateVersion !== null && delta.version <= stateVersion) {
+        return;  // Already applied
+    }
+    if (!currentGameState || delta.version !== stateVersion + 1) {
+        requestResync();
+        return;
+    }
+
+    delta.removed.forEach(pos => delete currentGameState.board[pos]);
+    Object.assign(currentGameState.board, delta.board);
+    Object.assign(currentGameState.scores, delta.scores);
+    currentGameState.version = delta.version;
+    stateVersion = delta.version;
+    updateGameState(currentGameState);
+}
+
+function requestResync() {
+    if (!sessionId) {
+        console.error('Session ID is not set.');
+        return;
+    }
+    gameSocket.send(JSON.stringify({
+        'type': 'resync',
+        'session_id': sessionId,
+    }));
+}
+
 function updateGameState(state) {
     console.log('updateGameState called with state:', state);
 
@@ -168,7 +247,7 @@ function updateGameState(state) {
 
     // Append cards to the board
     Object.entries(state.board).forEach(([pos, cardId]) => {
-        const cardData = state.cards[cardId];
+        const cardData = cardManifest[cardId];
         if (!cardData) {
             console.error(`Card data not found for ID: ${cardId}`);
             return;
@@ -276,51 +355,29 @@ function sendMove(username, cardIds) {
 }
 
 // ===== Set Highlighting =====
+// The server keeps an index of every set on the board, so ask it for one
 function highlightSet() {
-    // Get all card elements on the board
-    const cards = Array.from(document.querySelectorAll('.card'));
-
-    // Check all combinations of 3 cards
-    for (let i = 0; i < cards.length - 2; i++) {
-        for (let j = i + 1; j < cards.length - 1; j++) {
-            for (let k = j + 1; k < cards.length; k++) {
-                const card1 = cards[i];
-                const card2 = cards[j];
-                const card3 = cards[k];
-
-                // Get the attributes of each card
-                const card1Attributes = {
-                    number: parseInt(card1.getAttribute('data-number')),
-                    symbol: card1.getAttribute('data-symbol'),
-                    shading: card1.getAttribute('data-shading'),
-                    color: card1.getAttribute('data-color'),
-                };
-                const card2Attributes = {
-                    number: parseInt(card2.getAttribute('data-number')),
-                    symbol: card2.getAttribute('data-symbol'),
-                    shading: card2.getAttribute('data-shading'),
-                    color: card2.getAttribute('data-color'),
-                };
-                const card3Attributes = {
-                    number: parseInt(card3.getAttribute('data-number')),
-                    symbol: card3.getAttribute('data-symbol'),
-                    shading: card3.getAttribute('data-shading'),
-                    color: card3.getAttribute('data-color'),
-                };
-
-                // Check if the cards form a valid set
-                if (isValidSet([card1Attributes, card2Attributes, card3Attributes])) {
-                    // Highlight the cards
-                    card1.classList.add('highlighted');
-                    card2.classList.add('highlighted');
-                    card3.classList.add('highlighted');
-                    return;
-                }
-            }
-        }
+    if (!sessionId) {
+        console.error('Session ID is not set.');
+        return;
     }
+    gameSocket.send(JSON.stringify({
+        'type': 'request_hint',
+        'session_id': sessionId,
+    }));
+}
 
-    alert('No valid set found on the board.');
+function showHint(cardIds) {
+    if (cardIds.length === 0) {
+        alert('No valid set found on the board.');
+        return;
+    }
+    cardIds.forEach(cardId => {
+        const cardElement = document.querySelector(`.card[data-card-id="${cardId}"]`);
+        if (cardElement) {
+            cardElement.classList.add('highlighted');
+        }
+    });
 }
 
 // ===== Rematch Functionality =====
@@ -379,6 +436,6 @@ document.addEventListener('DOMContentLoaded', function () {
         rematchButton.addEventListener('click', requestRematch);
     }
 
-    // Initialize WebSocket connection
-    setupWebSocket();
+    // Load card attributes once, then initialize WebSocket connection
+    loadCardManifestAndConnect();
 });
\ No newline at end of file
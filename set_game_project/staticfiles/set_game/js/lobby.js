@@ -80,23 +80,78 @@ function submitReadyStatus(csrfToken) {
         .catch(error => console.error('Error submitting ready status:', error));
 }
 
-// ===== Lobby Polling =====
+// ===== Lobby Updates =====
 // Get the lobby ID from the data attribute
 const lobbyId = document.getElementById('lobby-id').getAttribute('data-lobby-id');
 
-// Poll the server for lobby status updates
-setInterval(() => {
+const POLL_INTERVAL_MS = 3000;
+const RECONNECT_DELAY_MS = 5000;
+let pollTimer = null;
+
+// Apply a lobby status update, redirecting once the game has started
+function handleLobbyStatus(data) {
+    if (!data.csrf_token) {
+        data.csrf_token = getCsrfToken();
+    }
+    if (data.game_state_id) {
+        // Redirect to the game board
+        window.location.href = `/game/${data.game_state_id}/`;
+    } else {
+        // Update the lobby status
+        updateLobbyStatus(data);
+    }
+}
+
+function getCsrfToken() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+}
+
+// The server pushes join/ready/start events over the lobby socket
+function connectLobbySocket() {
+    const lobbySocket = new WebSocket('ws://' + window.location.host + `/ws/lobby/${lobbyId}/`);
+
+    lobbySocket.onopen = function () {
+        stopPolling();
+    };
+
+    lobbySocket.onmessage = function (e) {
+        const data = JSON.parse(e.data);
+        if (data.type === 'lobby_status') {
+            handleLobbyStatus(data.status);
+        }
+    };
+
+    lobbySocket.onclose = function () {
+        // Fall back to polling until the socket is back
+        startPolling();
+        setTimeout(connectLobbySocket, RECONNECT_DELAY_MS);
+    };
+}
+
+// ===== Lobby Polling (fallback) =====
+function pollLobbyStatus() {
     fetch(`/api/lobby_status/${lobbyId}/`)
         .then(response => response.json())
         .then(data => {
             console.log(data); // For debugging purposes
-            if (data.game_state_id) {
-                // Redirect to the game board
-                window.location.href = `/game/${data.game_state_id}/`;
-            } else {
-                // Update the lobby status
-                updateLobbyStatus(data);
-            }
+            handleLobbyStatus(data);
         })
         .catch(error => console.error('Error fetching lobby status:', error));
-}, 3000);
\ No newline at end of file
+}
+
+function startPolling() {
+    if (pollTimer === null) {
+        pollLobbyStatus();
+        pollTimer = setInterval(pollLobbyStatus, POLL_INTERVAL_MS);
+    }
+}
+
+function stopPolling() {
+    if (pollTimer !== null) {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    }
+}
+
+connectLobbySocket();